@@ -0,0 +1,971 @@
+#!/usr/bin/env python3
+"""
+bench.py
+Benchmarks sobre hotel_app.py y generador de datos sintéticos.
+Se usa una base en archivo temporal (no ':memory:') para que el costo
+de commit/fsync sea real.
+
+Uso:
+    python bench.py                              # suite "operaciones" con volúmenes por defecto
+    python bench.py operaciones bulk --reservas 50000 --json actual.json
+    python bench.py --json actual.json --compare base.json   # marca regresiones
+"""
+
+import argparse
+import asyncio
+import csv
+import json
+import os
+import platform
+import random
+import shutil
+import sqlite3
+import sys
+import tempfile
+import threading
+import time
+import tracemalloc
+from bisect import bisect_left
+from datetime import date, datetime, timedelta
+from decimal import Decimal
+from itertools import islice
+
+from hotel_api import HotelHttpServer, HotelService
+from hotel_io import export_facturas, export_reservas, import_huespedes, import_reservas
+from hotel_pos import ChargeQueue
+from hotel_app import (MIGRACIONES, Database, Habitacion, Huesped, Reserva, ServicioAdicional, calculate_totals,
+                       iter_table, find_available_rooms, generate_invoices, generate_invoices_parallel)
+from hotel_archive import archive_stays, find_reservas
+from hotel_changes import changes_since, commit_offset, compact_changes
+from hotel_folio import rebuild_folios
+from hotel_inventory import InventoryCalendar, inventory_calendar
+from hotel_rates import RateTable, add_rate, quote, rate_table, set_stay_discount
+
+
+def _db_temporal(directorio):
+    db = Database(os.path.join(directorio, "bench.db"))
+    db.create_tables()
+    return db
+
+
+def _huespedes(n, desde=0):
+    return [Huesped(f"Huesped {i}", f"DOC{i:08d}", "1990-01-01", "Chile", f"Calle {i}") for i in range(desde, desde + n)]
+
+
+def bench_bulk_write(n=300):
+    """Compara filas/seg de Huesped.save (commit por fila) contra Huesped.save_many."""
+    resultados = {}
+    with tempfile.TemporaryDirectory() as d:
+        db = _db_temporal(d)
+        t0 = time.perf_counter()
+        for h in _huespedes(n):
+            h.save(db)
+        resultados["save"] = n / (time.perf_counter() - t0)
+
+        t0 = time.perf_counter()
+        Huesped.save_many(db, _huespedes(n, desde=n))
+        resultados["save_many"] = n / (time.perf_counter() - t0)
+        db.close()
+    return resultados
+
+
+def _percentil(valores, p):
+    valores = sorted(valores)
+    return valores[min(len(valores) - 1, int(len(valores) * p / 100))]
+
+
+def bench_concurrencia(hilos=20, operaciones=200, proporcion_escritura=0.2):
+    """
+    Prueba de carga multi-hilo: cada hilo simula una terminal de recepción que
+    mezcla lecturas (Habitacion.get, find_available_rooms) y altas de huéspedes.
+    Devuelve latencias p50/p99 en milisegundos por tipo de operación.
+    """
+    with tempfile.TemporaryDirectory() as d:
+        db = _db_temporal(d)
+        habitaciones = [Habitacion(100 + i, random.choice(["simple", "doble", "suite"]), 50) for i in range(50)]
+        Habitacion.save_many(db, habitaciones)
+        latencias = {"lectura": [], "escritura": []}
+        lock = threading.Lock()
+
+        def terminal(n):
+            rnd = random.Random(n)
+            locales = {"lectura": [], "escritura": []}
+            for i in range(operaciones):
+                t0 = time.perf_counter()
+                if rnd.random() < proporcion_escritura:
+                    Huesped(f"Huesped {n}-{i}").save(db)
+                    tipo = "escritura"
+                else:
+                    if i % 2:
+                        Habitacion.get(db, rnd.choice(habitaciones).id)
+                    else:
+                        find_available_rooms(db, "doble", "2025-01-10", "2025-01-15")
+                    tipo = "lectura"
+                locales[tipo].append((time.perf_counter() - t0) * 1000)
+            with lock:
+                for k, v in locales.items():
+                    latencias[k].extend(v)
+
+        t0 = time.perf_counter()
+        threads = [threading.Thread(target=terminal, args=(n,)) for n in range(hilos)]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+        duracion = time.perf_counter() - t0
+        db.close()
+
+    resultados = {"hilos": hilos, "ops_por_seg": hilos * operaciones / duracion}
+    for k, v in latencias.items():
+        if v:
+            resultados[k] = {"p50_ms": _percentil(v, 50), "p99_ms": _percentil(v, 99), "n": len(v)}
+    return resultados
+
+
+async def _cliente_http(port, cuerpos, latencias):
+    reader, writer = await asyncio.open_connection("127.0.0.1", port)
+    for cuerpo in cuerpos:
+        payload = json.dumps(cuerpo).encode()
+        t0 = time.perf_counter()
+        writer.write(b"POST /reservas HTTP/1.1\r\nHost: bench\r\nContent-Type: application/json\r\n"
+                     b"Content-Length: " + str(len(payload)).encode() + b"\r\n\r\n" + payload)
+        await writer.drain()
+        largo = 0
+        while True:
+            linea = await reader.readline()
+            if linea in (b"\r\n", b""):
+                break
+            if linea.lower().startswith(b"content-length:"):
+                largo = int(linea.split(b":")[1])
+        await reader.readexactly(largo)
+        latencias.append((time.perf_counter() - t0) * 1000)
+    writer.close()
+
+
+def bench_async_reservas(clientes=50, peticiones=2000, habitaciones=100, workers=8):
+    """
+    Generador de carga para hotel_api: `clientes` conexiones concurrentes envían
+    POST /reservas (sin solapes) a un servidor en el mismo proceso.
+    Devuelve reservas/seg y latencias p50/p99 en ms.
+    """
+    async def correr(db):
+        service = HotelService(db, max_workers=workers)
+        server = await HotelHttpServer(service).start("127.0.0.1", 0)
+        port = server.sockets[0].getsockname()[1]
+        habs = await asyncio.to_thread(Habitacion.save_many, db, [Habitacion(i, "doble", 50) for i in range(habitaciones)])
+        h = await service.create_huesped("Bench")
+        inicio = date(2025, 1, 1)
+        cuerpos = []
+        for i in range(peticiones):
+            ingreso = inicio + timedelta(days=3 * (i // habitaciones))
+            cuerpos.append({"fecha_ingreso": ingreso.isoformat(),
+                            "fecha_salida": (ingreso + timedelta(days=2)).isoformat(),
+                            "id_huesped": h.id, "id_habitacion": habs[i % habitaciones]})
+        latencias = []
+        t0 = time.perf_counter()
+        await asyncio.gather(*(_cliente_http(port, cuerpos[c::clientes], latencias) for c in range(clientes)))
+        duracion = time.perf_counter() - t0
+        server.close()
+        await server.wait_closed()
+        service.close()
+        return duracion, latencias
+
+    with tempfile.TemporaryDirectory() as d:
+        db = _db_temporal(d)
+        duracion, latencias = asyncio.run(correr(db))
+        db.close()
+    return {"clientes": clientes, "reservas_por_seg": peticiones / duracion,
+            "p50_ms": _percentil(latencias, 50), "p99_ms": _percentil(latencias, 99)}
+
+
+_NOMBRES = ["Carlos", "Ana", "José", "María", "Bastián", "Sofía", "Matías", "Valentina", "Benjamín", "Martina"]
+_SILABAS = ["Gon", "Mu", "Ro", "Dí", "Pé", "So", "Con", "Sil", "Mar", "Vás", "Fer", "Cas", "Ber", "Al", "Ta",
+            "Ur", "Li", "Nú", "Ve", "Es"]
+_MEDIOS = ["za", "ri", "ñe", "to", "ga", "qu", "ra", "lle", "de", "bo", "lán", "ti"]
+_FINALES = ["lez", "ñoz", "jas", "az", "rez", "to", "eras", "va", "tínez", "quez", "ndo", "ria"]
+_CALLES = ["Avda Valparaíso", "Lastarria", "Libertad", "O'Higgins", "Prat", "Errázuriz"]
+_NACIONALIDADES = ["chilena", "argentina", "peruana", "brasileña", "alemana"]
+
+
+def _apellido(rnd):
+    return rnd.choice(_SILABAS) + rnd.choice(_MEDIOS) + rnd.choice(_FINALES)
+
+
+def bench_busqueda_huespedes(n=1_000_000, consultas=1000, lote=50_000):
+    """
+    Carga n huéspedes sintéticos y mide Huesped.search por documento exacto y por
+    prefijos de nombre (FTS5). Devuelve tiempo de carga y latencias p50/p99 en ms.
+    """
+    rnd = random.Random(8)
+    with tempfile.TemporaryDirectory() as d:
+        db = _db_temporal(d)
+        t0 = time.perf_counter()
+        for inicio in range(0, n, lote):
+            Huesped.save_many(db, [
+                Huesped(f"{rnd.choice(_NOMBRES)} {_apellido(rnd)} {_apellido(rnd)}",
+                        f"{10_000_000 + i}-{i % 10}", "1985-06-01", rnd.choice(_NACIONALIDADES),
+                        f"{rnd.choice(_CALLES)} {rnd.randint(1, 9999)}")
+                for i in range(inicio, min(n, inicio + lote))
+            ])
+        carga = time.perf_counter() - t0
+
+        resultados = {"huespedes": n, "carga_seg": carga}
+        casos = {
+            "documento": lambda: f"{10_000_000 + rnd.randrange(n)}-{rnd.randrange(10)}",
+            "nombre_prefijo": lambda: f"{rnd.choice(_NOMBRES)[:4]} {_apellido(rnd)[:5]}",
+        }
+        for caso, generar in casos.items():
+            latencias = []
+            for _ in range(consultas):
+                q = generar()
+                t0 = time.perf_counter()
+                Huesped.search(db, q, limit=20)
+                latencias.append((time.perf_counter() - t0) * 1000)
+            resultados[caso] = {"p50_ms": _percentil(latencias, 50), "p99_ms": _percentil(latencias, 99)}
+        db.close()
+    return resultados
+
+
+class _ReservaDict:
+    """Reserva como era antes de __slots__: atributos en __dict__ y normalización en __init__."""
+
+    def __init__(self, fecha_ingreso, fecha_salida, estado, id_huesped, id_habitacion, id_empleado=None, id_reserva=None):
+        self.id = id_reserva
+        self.fecha_ingreso = fecha_ingreso if isinstance(fecha_ingreso, str) else fecha_ingreso.isoformat()
+        self.fecha_salida = fecha_salida if isinstance(fecha_salida, str) else fecha_salida.isoformat()
+        self.estado = estado
+        self.id_huesped = id_huesped
+        self.id_habitacion = id_habitacion
+        self.id_empleado = id_empleado
+
+
+def _cargar_dict(db):
+    rows = db.conn.execute("SELECT * FROM reserva").fetchall()
+    return [_ReservaDict(row['fecha_ingreso'], row['fecha_salida'], row['estado'], row['id_huesped'],
+                         row['id_habitacion'], row['id_empleado'], row['id_reserva']) for row in rows]
+
+
+def _cargar_slots(db):
+    return list(Reserva.iter_all(db, page_size=10_000))
+
+
+def bench_modelos(n=200_000):
+    """
+    Carga una temporada de n reservas con la clase anterior (__dict__ + Row por clave)
+    y con los modelos con __slots__ + mapper de tuplas.
+    Devuelve objetos/seg y bytes por objeto de cada variante.
+    """
+    with tempfile.TemporaryDirectory() as d:
+        db = _db_temporal(d)
+        h = Huesped("Temporada")
+        h.save(db)
+        habs = Habitacion.save_many(db, [Habitacion(i, "doble", 50) for i in range(1000)])
+        inicio = date(2025, 1, 1)
+        reservas = []
+        for i in range(n):
+            ingreso = inicio + timedelta(days=2 * (i // len(habs)))
+            reservas.append(Reserva(ingreso, ingreso + timedelta(days=1), "confirmada", h.id, habs[i % len(habs)]))
+        Reserva.save_many(db, reservas)
+        del reservas
+
+        resultados = {"reservas": n}
+        for nombre, cargar in (("dict", _cargar_dict), ("slots", _cargar_slots)):
+            cargar(db)  # calentar caché de páginas
+            t0 = time.perf_counter()
+            objs = cargar(db)
+            duracion = time.perf_counter() - t0
+            del objs
+            tracemalloc.start()
+            objs = cargar(db)
+            memoria = tracemalloc.get_traced_memory()[0]
+            tracemalloc.stop()
+            del objs
+            resultados[nombre] = {"objetos_por_seg": n / duracion, "bytes_por_objeto": memoria / n}
+        db.close()
+    return resultados
+
+
+# -------------------------
+# Datos sintéticos
+# -------------------------
+_TIPOS = {"simple": (35.0, 60.0), "doble": (55.0, 95.0), "suite": (120.0, 260.0)}
+_SERVICIOS = [("Desayuno", "Buffet diario", 8.5), ("Lavandería", "Por prenda", 3.0), ("Spa", "Sesión 60 min", 45.0),
+              ("Restaurant", "Cena", 22.9), ("Bebestibles", "Minibar", 4.75), ("Estacionamiento", "Por día", 6.0)]
+# peso relativo de llegadas por mes (temporada alta en verano austral y vacaciones de invierno)
+_PESO_MES = [1.8, 2.0, 1.1, 0.8, 0.6, 0.6, 1.3, 0.9, 0.8, 0.9, 1.0, 1.6]
+# largo de estadía en noches y su peso: la mayoría 1-3 noches, cola hasta dos semanas
+_NOCHES = [1, 2, 3, 4, 5, 6, 7, 10, 14]
+_PESO_NOCHES = [22, 28, 20, 10, 7, 5, 5, 2, 1]
+
+
+def _fecha_llegada(rnd, inicio, dias):
+    # muestreo por rechazo: estacionalidad mensual y más llegadas viernes/sábado
+    while True:
+        d = inicio + timedelta(days=rnd.randrange(dias))
+        peso = _PESO_MES[d.month - 1] * (1.4 if d.weekday() in (4, 5) else 1.0)
+        if rnd.random() * 2.8 < peso:
+            return d
+
+
+def generar_datos(db: Database, huespedes=2000, habitaciones=100, reservas=5000, inicio=date(2024, 1, 1),
+                  dias=730, servicios_por_reserva=2.0, fraccion_facturada=0.8, semilla=11, lote=5000):
+    """
+    Puebla db con huéspedes, habitaciones, catálogo de servicios, reservas sin solapes
+    (con servicios) y facturas para las estadías ya terminadas.
+    Devuelve un resumen con los ids generados para usarlos en los benchmarks.
+    """
+    rnd = random.Random(semilla)
+    ids_huesped = []
+    for desde in range(0, huespedes, lote):
+        ids_huesped += Huesped.save_many(db, [
+            Huesped(f"{rnd.choice(_NOMBRES)} {_apellido(rnd)} {_apellido(rnd)}", f"{20_000_000 + i}-{i % 10}",
+                    f"{rnd.randint(1950, 2005)}-{rnd.randint(1, 12):02d}-{rnd.randint(1, 28):02d}",
+                    rnd.choice(_NACIONALIDADES), f"{rnd.choice(_CALLES)} {rnd.randint(1, 9999)}")
+            for i in range(desde, min(huespedes, desde + lote))
+        ])
+    tipos = list(_TIPOS)
+    habs = [Habitacion(100 * (1 + i // 50) + i % 50, t, round(rnd.uniform(*_TIPOS[t]), 2))
+            for i, t in enumerate(rnd.choices(tipos, weights=[5, 4, 1], k=habitaciones))]
+    Habitacion.save_many(db, habs)
+    ids_servicio = ServicioAdicional.save_many(db, [ServicioAdicional(*s) for s in _SERVICIOS])
+
+    # asignación sin solapes: intervalos ocupados por habitación, ordenados por llegada
+    ocupadas = {h.id: [] for h in habs}
+    estadias = []
+    intentos = 0
+    while len(estadias) < reservas and intentos < reservas * 20:
+        intentos += 1
+        llegada = _fecha_llegada(rnd, inicio, dias)
+        salida = llegada + timedelta(days=rnd.choices(_NOCHES, _PESO_NOCHES)[0])
+        hab = rnd.choice(habs)
+        lista = ocupadas[hab.id]
+        k = bisect_left(lista, (llegada,))
+        if (k > 0 and lista[k - 1][1] > llegada) or (k < len(lista) and lista[k][0] < salida):
+            continue
+        lista.insert(k, (llegada, salida))
+        estadias.append((llegada, salida, hab.id))
+
+    ids_reserva = []
+    for desde in range(0, len(estadias), lote):
+        ids_reserva += Reserva.save_many(db, [
+            Reserva(llegada, salida, "confirmada", rnd.choice(ids_huesped), id_hab)
+            for llegada, salida, id_hab in estadias[desde:desde + lote]
+        ])
+    with db.batch():
+        for id_reserva in ids_reserva:
+            n = min(8, int(rnd.expovariate(1 / servicios_por_reserva))) if servicios_por_reserva else 0
+            if n:
+                db.conn.executemany(
+                    "INSERT INTO reserva_servicio (id_reserva, id_servicio, cantidad) VALUES (?,?,?)",
+                    [(id_reserva, rnd.choice(ids_servicio), rnd.randint(1, 4)) for _ in range(n)]
+                )
+        # los servicios se insertan directo (sin add_service): el folio se recalcula al final
+        rebuild_folios(db, ids_reserva)
+
+    corte = inicio + timedelta(days=dias)
+    terminadas = [i for i, (_, salida, _) in zip(ids_reserva, estadias) if salida < corte]
+    facturar = terminadas[:int(len(terminadas) * fraccion_facturada)]
+    facturas = {}
+    for desde in range(0, len(facturar), lote):
+        facturas.update(generate_invoices(db, facturar[desde:desde + lote]))
+    return {"huespedes": ids_huesped, "habitaciones": [h.id for h in habs], "servicios": ids_servicio,
+            "reservas": ids_reserva, "facturas": list(facturas.values()), "fin": corte}
+
+
+def _medir(fn, repeticiones):
+    latencias = []
+    t_total = time.perf_counter()
+    for i in range(repeticiones):
+        t0 = time.perf_counter()
+        fn(i)
+        latencias.append((time.perf_counter() - t0) * 1000)
+    total = time.perf_counter() - t_total
+    return {"ops_por_seg": repeticiones / total, "p50_ms": _percentil(latencias, 50),
+            "p99_ms": _percentil(latencias, 99), "n": repeticiones}
+
+
+def bench_operaciones(huespedes=2000, habitaciones=100, reservas=5000, repeticiones=500, semilla=11):
+    """
+    Genera una base sintética y mide los caminos reales de hotel_app:
+    save de huésped y reserva, add_service, calculate_total, generate_invoice,
+    get() de cada modelo y los listados.
+    """
+    rnd = random.Random(semilla)
+    with tempfile.TemporaryDirectory() as d:
+        db = _db_temporal(d)
+        t0 = time.perf_counter()
+        datos = generar_datos(db, huespedes, habitaciones, reservas, semilla=semilla)
+        resultados = {"generacion_seg": time.perf_counter() - t0,
+                      "volumen": {k: len(v) for k, v in datos.items() if isinstance(v, list)}}
+        ids_res, ids_hab, ids_hue = datos["reservas"], datos["habitaciones"], datos["huespedes"]
+        # reservas nuevas después del período generado, una por habitación y vuelta
+        futuro = datos["fin"] + timedelta(days=30)
+
+        def nueva_reserva(i):
+            llegada = futuro + timedelta(days=3 * (i // len(ids_hab)))
+            Reserva(llegada, llegada + timedelta(days=2), "confirmada", rnd.choice(ids_hue),
+                    ids_hab[i % len(ids_hab)]).save(db)
+
+        def disponibilidad(_):
+            llegada = date(2024, 1, 1) + timedelta(days=rnd.randrange(700))
+            find_available_rooms(db, rnd.choice(list(_TIPOS)), llegada, llegada + timedelta(days=3))
+
+        def listado(_):
+            for _fila in islice(Reserva.iter_all(db, after_id=rnd.choice(ids_res), page_size=100), 100):
+                pass
+
+        operaciones = {
+            "huesped_save": lambda i: Huesped(f"Bench {i}", f"B-{i}").save(db),
+            "reserva_save": nueva_reserva,
+            "add_service": lambda i: Reserva.get(db, rnd.choice(ids_res)).add_service(db, rnd.choice(datos["servicios"])),
+            "calculate_total": lambda i: Reserva.get(db, rnd.choice(ids_res)).calculate_total(db),
+            "balance_folio": lambda i: Reserva.get(db, rnd.choice(ids_res)).balance(db),
+            "generate_invoice": lambda i: Reserva.get(db, rnd.choice(ids_res)).generate_invoice(db),
+            "huesped_get": lambda i: Huesped.get(db, rnd.choice(ids_hue)),
+            "habitacion_get": lambda i: Habitacion.get(db, rnd.choice(ids_hab)),
+            "reserva_get": lambda i: Reserva.get(db, rnd.choice(ids_res)),
+            "listado_reservas_100": listado,
+            "find_available_rooms": disponibilidad,
+        }
+        resultados["operaciones"] = {nombre: _medir(fn, repeticiones) for nombre, fn in operaciones.items()}
+        db.close()
+    return resultados
+
+
+def bench_arranque(repeticiones=30, consultas=20_000):
+    """
+    Arranque en frío (como un kiosco que se reinicia) y costo por consulta puntual:
+    - base nueva: se aplican todas las migraciones
+    - base existente: user_version al día, sin DDL
+    - base existente ejecutando todo el DDL (comportamiento anterior al versionado)
+    - Huesped.get con cursor reutilizado (db.fetchone) contra conn.execute
+    """
+    def medir(fn):
+        tiempos = []
+        for i in range(repeticiones):
+            t0 = time.perf_counter()
+            fn(i)
+            tiempos.append((time.perf_counter() - t0) * 1000)
+        return {"p50_ms": _percentil(tiempos, 50), "p99_ms": _percentil(tiempos, 99)}
+
+    with tempfile.TemporaryDirectory() as d:
+        ruta = os.path.join(d, "arranque.db")
+
+        def nueva(i):
+            db = Database(os.path.join(d, f"nueva{i}.db"))
+            db.create_tables()
+            db.close()
+
+        def existente(_):
+            db = Database(ruta)
+            db.create_tables()
+            db.close()
+
+        def existente_ddl(_):
+            db = Database(ruta)
+            with db.batch():
+                for _descripcion, sqls, _post in MIGRACIONES:
+                    for sql in sqls:
+                        db.conn.execute(sql)
+            db.close()
+
+        db = Database(ruta)
+        db.create_tables()
+        generar_datos(db, huespedes=500, habitaciones=20, reservas=200)
+        db.close()
+        resultados = {"base_nueva": medir(nueva), "base_existente": medir(existente),
+                      "base_existente_con_ddl": medir(existente_ddl)}
+
+        db = Database(ruta)
+        sql = Huesped._SQL_GET
+        t0 = time.perf_counter()
+        for i in range(consultas):
+            db.fetchone(sql, (i % 500 + 1,))
+        resultados["consulta_por_clave"] = {"us_por_consulta": (time.perf_counter() - t0) / consultas * 1e6}
+        db.close()
+    return resultados
+
+
+def bench_importacion(huespedes=50_000, reservas=20_000, habitaciones=200):
+    """
+    Exporta reservas y facturas de una base generada, las vuelve a importar en una base
+    vacía (con el mismo inventario) y mide filas/seg de cada paso. El pico de memoria de
+    import_huespedes se mide con un cuarto y con el total de filas: debe ser el mismo.
+    """
+    resultados = {"volumen": {"huespedes": huespedes, "reservas": reservas}}
+    with tempfile.TemporaryDirectory() as d:
+        origen = Database(os.path.join(d, "origen.db"))
+        origen.create_tables()
+        generar_datos(origen, huespedes=huespedes, habitaciones=habitaciones, reservas=reservas)
+        ruta_huespedes = os.path.join(d, "huespedes.csv")
+        with open(ruta_huespedes, "w", newline="", encoding="utf-8") as f:
+            escritor = csv.writer(f)
+            escritor.writerow(["nombre", "documento", "fecha_nacimiento", "nacionalidad", "direccion"])
+            escritor.writerows(origen.conn.execute(
+                "SELECT nombre, documento, fecha_nacimiento, nacionalidad, direccion FROM huesped"))
+        ruta_cuarto = os.path.join(d, "huespedes_cuarto.csv")
+        with open(ruta_huespedes, encoding="utf-8") as f, open(ruta_cuarto, "w", encoding="utf-8") as g:
+            g.writelines(islice(f, huespedes // 4 + 1))
+
+        for nombre, exportar, ruta in (("export_reservas", export_reservas, "reservas.jsonl"),
+                                       ("export_facturas", export_facturas, "facturas.csv")):
+            informe = exportar(origen, os.path.join(d, ruta))
+            resultados[nombre] = {"filas_por_seg": informe.filas_por_seg, "seg": informe.segundos}
+        habs = [Habitacion(h.numero, h.tipo, h.precio, h.estado) for h in Habitacion.iter_all(origen)]
+        origen.close()
+
+        for nombre, ruta in (("memoria_cuarto", ruta_cuarto), ("memoria_total", ruta_huespedes)):
+            db = Database(os.path.join(d, f"{nombre}.db"))
+            db.create_tables()
+            tracemalloc.start()
+            import_huespedes(db, ruta)
+            resultados[nombre] = {"pico_bytes": tracemalloc.get_traced_memory()[1]}
+            tracemalloc.stop()
+            db.close()
+
+        destino = _db_temporal(d)
+        Habitacion.save_many(destino, habs)
+        for nombre, importar, ruta in (("import_huespedes", import_huespedes, ruta_huespedes),
+                                       ("import_reservas", import_reservas, os.path.join(d, "reservas.jsonl"))):
+            informe = importar(destino, ruta)
+            resultados[nombre] = {"filas_por_seg": informe.filas_por_seg, "seg": informe.segundos,
+                                  "rechazadas": informe.rechazadas}
+        destino.close()
+    return resultados
+
+
+def bench_facturacion_paralela(reservas=50_000, workers=(1, 2, 4, 8)):
+    """
+    Cierre de mes: factura y arma el documento de todas las reservas con 1/2/4/8 procesos,
+    cada corrida sobre una copia de la misma base. "serial" es generate_invoices (sin documentos).
+    """
+    resultados = {"volumen": {"reservas": reservas, "cpus": os.cpu_count()}}
+    with tempfile.TemporaryDirectory() as d:
+        ruta = os.path.join(d, "base.db")
+        db = Database(ruta)
+        db.create_tables()
+        generar_datos(db, huespedes=5000, habitaciones=200, reservas=reservas, fraccion_facturada=0.0)
+        db.close()
+
+        def corrida(nombre, facturar):
+            copia = os.path.join(d, f"{nombre}.db")
+            shutil.copy(ruta, copia)
+            db = Database(copia)
+            t0 = time.perf_counter()
+            n = len(facturar(db))
+            segundos = time.perf_counter() - t0
+            db.close()
+            resultados[nombre] = {"seg": segundos, "reservas_por_seg": n / segundos}
+
+        corrida("serial", lambda db: generate_invoices(db, desde="2000-01-01", hasta="2100-01-01"))
+        for w in workers:
+            corrida(f"workers_{w}", lambda db: generate_invoices_parallel(
+                db, desde="2000-01-01", hasta="2100-01-01", workers=w, archivo=os.path.join(d, f"facturas_{w}.jsonl")))
+        base = resultados[f"workers_{workers[0]}"]["seg"]
+        for w in workers:
+            resultados[f"workers_{w}"]["aceleracion"] = base / resultados[f"workers_{w}"]["seg"]
+    return resultados
+
+
+def bench_inventario(habitaciones=500, reservas=40_000, dias=548, consultas=500, semilla=5):
+    """
+    Calendario de inventario en bitmaps contra SQL sobre 18 meses: reconstrucción,
+    habitaciones libres en un rango, bloque de 10 habitaciones de un tipo y
+    libres por tipo en cada noche de un mes.
+    """
+    rnd = random.Random(semilla)
+    inicio = date(2024, 1, 1)
+    with tempfile.TemporaryDirectory() as d:
+        db = _db_temporal(d)
+        generar_datos(db, huespedes=5000, habitaciones=habitaciones, reservas=reservas, inicio=inicio, dias=dias,
+                      servicios_por_reserva=0, fraccion_facturada=0.0)
+        t0 = time.perf_counter()
+        InventoryCalendar().rebuild(db)
+        resultados = {"volumen": {"habitaciones": habitaciones, "reservas": reservas, "noches": dias},
+                      "rebuild_seg": time.perf_counter() - t0}
+        cal = inventory_calendar(db)
+
+        def rango(i):
+            llegada = inicio + timedelta(days=rnd.randrange(dias - 30))
+            return rnd.choice(list(_TIPOS)), llegada, llegada + timedelta(days=rnd.randint(1, 14))
+
+        def libres_por_noche_sql(desde, hasta):
+            conteo = {}
+            dia = desde
+            while dia < hasta:
+                ocupadas = dict(db.conn.execute("""
+                    SELECT h.tipo, COUNT(*) FROM reserva r JOIN habitacion h ON h.id_habitacion = r.id_habitacion
+                    WHERE r.fecha_ingreso <= ? AND r.fecha_salida > ? AND r.estado IS NOT 'cancelada'
+                    GROUP BY h.tipo
+                """, (dia.isoformat(), dia.isoformat())).fetchall())
+                for tipo, total in db.conn.execute("SELECT tipo, COUNT(*) FROM habitacion GROUP BY tipo"):
+                    conteo.setdefault(tipo, []).append(total - ocupadas.get(tipo, 0))
+                dia += timedelta(days=1)
+            return conteo
+
+        def mes(_):
+            desde = inicio + timedelta(days=rnd.randrange(dias - 30))
+            return desde, desde + timedelta(days=30)
+
+        def libres_bitmap(i):
+            tipo, desde, hasta = rango(i)
+            return cal.free_rooms(desde, hasta, tipo)
+
+        def bloque_bitmap(i):
+            tipo, desde, hasta = rango(i)
+            return cal.find_block(tipo, 10, desde, hasta)
+
+        casos = {
+            "libres_sql": lambda i: find_available_rooms(db, *rango(i)),
+            "libres_bitmap": libres_bitmap,
+            "bloque_10_sql": lambda i: find_available_rooms(db, *rango(i))[:10],
+            "bloque_10_bitmap": bloque_bitmap,
+            "libres_por_noche_30_sql": lambda i: libres_por_noche_sql(*mes(i)),
+            "libres_por_noche_30_bitmap": lambda i: cal.free_count_by_tipo(*mes(i)),
+        }
+        for nombre, fn in casos.items():
+            n = consultas if "por_noche" not in nombre or "bitmap" in nombre else max(1, consultas // 20)
+            resultados[nombre] = _medir(fn, n)
+        db.close()
+    return resultados
+
+
+def bench_cargos_pos(cargos=20_000, hilos=8):
+    """
+    Cargos de los puntos de venta enviados desde varios hilos: add_service síncrono
+    (un commit por cargo) contra ChargeQueue con y sin fsync del journal.
+    Latencia vista por el que envía el cargo y cargos/seg hasta que todo quedó guardado.
+    """
+    resultados = {"volumen": {"cargos": cargos, "hilos": hilos}}
+    with tempfile.TemporaryDirectory() as d:
+        db = _db_temporal(d)
+        datos = generar_datos(db, huespedes=500, habitaciones=50, reservas=2000, servicios_por_reserva=0)
+        reservas = Reserva.get_many(db, datos["reservas"])
+        servicios = datos["servicios"]
+
+        def correr(nombre, enviar, terminar=lambda: None):
+            latencias = [[] for _ in range(hilos)]
+
+            def hilo(k):
+                rnd = random.Random(k)
+                for _ in range(cargos // hilos):
+                    r = rnd.choice(reservas)
+                    t0 = time.perf_counter()
+                    enviar(r, rnd.choice(servicios))
+                    latencias[k].append((time.perf_counter() - t0) * 1000)
+
+            t0 = time.perf_counter()
+            ts = [threading.Thread(target=hilo, args=(k,)) for k in range(hilos)]
+            for t in ts:
+                t.start()
+            for t in ts:
+                t.join()
+            terminar()
+            total = time.perf_counter() - t0
+            todas = [x for lista in latencias for x in lista]
+            resultados[nombre] = {"cargos_por_seg": len(todas) / total, "p50_ms": _percentil(todas, 50),
+                                  "p99_ms": _percentil(todas, 99)}
+
+        correr("add_service", lambda r, s: r.add_service(db, s))
+        for fsync in (False, True):
+            cola = ChargeQueue(db, os.path.join(d, f"pos_{fsync}.journal"), fsync=fsync)
+            nombre = "cola_fsync" if fsync else "cola"
+            correr(nombre, lambda r, s: cola.post(r.id, s), cola.flush)
+            resultados[nombre]["metricas"] = {k: v for k, v in cola.metrics().items() if k.endswith("_ms")}
+            resultados[nombre]["metricas"]["lotes"] = cola.lotes
+            cola.close()
+        db.close()
+    return resultados
+
+
+def bench_tarifas(consultas=5000, anios=2, feriados=25, semilla=3):
+    """
+    Cotización por tipo con tarifas de temporada (mensual), fin de semana, feriados y
+    descuento por duración: tabla de sumas prefijas contra recorrer las noches
+    resolviendo la regla de cada una. Estadías de 1 a 28 noches, los tres tipos a la vez.
+    """
+    rnd = random.Random(semilla)
+    inicio = date(2025, 1, 1)
+    dias = 365 * anios
+    with tempfile.TemporaryDirectory() as d:
+        db = _db_temporal(d)
+        generar_datos(db, huespedes=200, habitaciones=60, reservas=500, servicios_por_reserva=1)
+        reglas = {}
+        for tipo, (minimo, maximo) in _TIPOS.items():
+            lista = reglas[tipo] = []
+            for mes in range(12 * anios):
+                desde = date(inicio.year + mes // 12, mes % 12 + 1, 1)
+                hasta = date(desde.year + (desde.month == 12), desde.month % 12 + 1, 1)
+                lista.append((0, desde, hasta, round(rnd.uniform(minimo, maximo), 2), None))
+            lista.append((1, inicio, inicio + timedelta(days=dias), round(maximo * 1.1, 2), "45"))
+            for _ in range(feriados):
+                desde = inicio + timedelta(days=rnd.randrange(dias - 5))
+                lista.append((2, desde, desde + timedelta(days=rnd.randint(1, 4)), round(maximo * 1.5, 2), None))
+            for prioridad, desde, hasta, precio, dias_semana in lista:
+                add_rate(db, tipo, desde, hasta, precio, dias_semana, prioridad)
+            set_stay_discount(db, tipo, 7, 10)
+            set_stay_discount(db, tipo, 14, 15)
+
+        t0 = time.perf_counter()
+        RateTable().rebuild(db)
+        resultados = {"volumen": {"reglas": sum(len(v) for v in reglas.values()), "dias": dias},
+                      "rebuild_ms": (time.perf_counter() - t0) * 1000}
+        tabla = rate_table(db)
+        precio_base = {t: tabla._precio_base.get(t) for t in _TIPOS}
+        # reglas de mayor a menor prioridad (a igual prioridad, la última agregada)
+        ordenadas = {t: sorted(((p, i, desde, hasta, Decimal(str(precio)), dias_semana)
+                                for i, (p, desde, hasta, precio, dias_semana) in enumerate(lista)), reverse=True)
+                     for t, lista in reglas.items()}
+
+        def por_noche(tipos, desde, hasta):
+            cotizacion = {}
+            noches = (hasta - desde).days
+            for tipo in tipos:
+                total = Decimal(0)
+                for k in range(noches):
+                    dia = desde + timedelta(days=k)
+                    for _p, _i, r_desde, r_hasta, precio, dias_semana in ordenadas[tipo]:
+                        if r_desde <= dia < r_hasta and (dias_semana is None or str(dia.weekday()) in dias_semana):
+                            total += precio
+                            break
+                    else:
+                        total += Decimal(str(precio_base[tipo]))
+                descuento = 15 if noches >= 14 else 10 if noches >= 7 else 0
+                if descuento:
+                    total = (total * (100 - descuento) / 100).quantize(Decimal("0.01"))
+                cotizacion[tipo] = float(total)
+            return cotizacion
+
+        estadias = []
+        for _ in range(consultas):
+            llegada = inicio + timedelta(days=rnd.randrange(dias - 30))
+            estadias.append((llegada, llegada + timedelta(days=rnd.randint(1, 28))))
+        tipos = list(_TIPOS)
+        for desde, hasta in estadias[:200]:
+            assert quote(db, tipos, desde, hasta) == por_noche(tipos, desde, hasta), (desde, hasta)
+
+        resultados["quote_tabla"] = _medir(lambda i: quote(db, tipos, *estadias[i]), consultas)
+        resultados["quote_por_noche"] = _medir(lambda i: por_noche(tipos, *estadias[i]), consultas)
+        reservas = Reserva.get_many(db, rnd.sample(range(1, 501), 200))
+        resultados["calculate_total_plano"] = _medir(lambda i: reservas[i].calculate_total(db), len(reservas))
+        resultados["calculate_total_tarifas"] = _medir(
+            lambda i: reservas[i].calculate_total(db, usar_tarifas=True), len(reservas))
+        db.close()
+    return resultados
+
+
+def bench_archivo(reservas=40_000, habitaciones=150, anios=3, consultas=300, semilla=9):
+    """
+    Base con varios años de estadías antes y después de archivar todo lo anterior al
+    último año: tamaño del archivo caliente, listado completo de reservas, totales del
+    último mes, disponibilidad y lectura de una reserva archivada (archivo=True).
+    """
+    rnd = random.Random(semilla)
+    dias = 365 * anios
+    inicio = date.today() - timedelta(days=dias)
+    corte = date.today() - timedelta(days=365)
+    with tempfile.TemporaryDirectory() as d:
+        db = _db_temporal(d)
+        datos = generar_datos(db, huespedes=5000, habitaciones=habitaciones, reservas=reservas, inicio=inicio,
+                              dias=dias, fraccion_facturada=0.95)
+        mes = (date.today() - timedelta(days=60), date.today() - timedelta(days=30))
+
+        def medir_base(prefijo):
+            with db.pool.write_lock:
+                db.pool.writer.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+            resultados[f"{prefijo}_bytes"] = os.path.getsize(db.pool.path)
+            t0 = time.perf_counter()
+            n = sum(1 for _ in iter_table(db, "reserva", "id_reserva"))
+            resultados[f"{prefijo}_listado_reservas_ms"] = (time.perf_counter() - t0) * 1000
+            t0 = time.perf_counter()
+            calculate_totals(db, desde=mes[0], hasta=mes[1])
+            resultados[f"{prefijo}_totales_mes_ms"] = (time.perf_counter() - t0) * 1000
+
+            def disponibles(i):
+                llegada = corte + timedelta(days=rnd.randrange(300))
+                return find_available_rooms(db, rnd.choice(list(_TIPOS)), llegada, llegada + timedelta(days=3))
+
+            resultados[f"{prefijo}_disponibles"] = _medir(disponibles, consultas)
+            return n
+
+        resultados = {"volumen": {"reservas": len(datos["reservas"]), "anios": anios}}
+        resultados["volumen"]["reservas_calientes_antes"] = medir_base("antes")
+        t0 = time.perf_counter()
+        movidas = archive_stays(db, corte, vacuum=True)
+        resultados["archivar_seg"] = time.perf_counter() - t0
+        resultados["volumen"]["archivadas"] = sum(movidas.values())
+        resultados["volumen"]["reservas_calientes_despues"] = medir_base("despues")
+
+        # hasta `consultas` reservas archivadas, en orden aleatorio (sirve con cualquier volumen)
+        candidatas = rnd.sample(datos["reservas"], len(datos["reservas"]))
+        archivadas = list(islice((i for i in candidatas if Reserva.get(db, i) is None), consultas))
+        resultados["get_archivada"] = _medir(lambda i: Reserva.get(db, archivadas[i], archivo=True), len(archivadas))
+        huespedes = rnd.sample(datos["huespedes"], min(consultas, len(datos["huespedes"])))
+        resultados["reservas_huesped_caliente"] = _medir(lambda i: find_reservas(db, huespedes[i]), len(huespedes))
+        resultados["reservas_huesped_con_archivo"] = _medir(
+            lambda i: find_reservas(db, huespedes[i], archivo=True), len(huespedes))
+        db.close()
+    return resultados
+
+
+def bench_cambios(huespedes=20_000, reservas=20_000, rondas=30, cambios_por_ronda=200, semilla=4):
+    """
+    Consumidor externo que se pone al día tras cada ronda de escrituras (actualizaciones de
+    huéspedes y reservas, servicios): releer las tablas completas y compararlas con la copia
+    anterior contra leer changes_since desde su último seq. Además, compactación del registro.
+    """
+    rnd = random.Random(semilla)
+    with tempfile.TemporaryDirectory() as d:
+        db = _db_temporal(d)
+        datos = generar_datos(db, huespedes=huespedes, habitaciones=200, reservas=reservas)
+        tablas = ("huesped", "reserva", "reserva_servicio", "factura")
+
+        def foto():
+            return {t: {tuple(r) for r in db.fetchall(f"SELECT * FROM {t}")} for t in tablas}
+
+        anterior = foto()
+        ultimo = db.fetchone("SELECT COALESCE(MAX(seq), 0) FROM cambio")[0]
+        releer, deltas, escribir = [], [], []
+        for _ in range(rondas):
+            t0 = time.perf_counter()
+            for k in range(cambios_por_ronda):
+                if k % 3 == 0:
+                    h = Huesped.get(db, rnd.choice(datos["huespedes"]))
+                    h.direccion = f"{rnd.choice(_CALLES)} {rnd.randint(1, 9999)}"
+                    h.save(db)
+                elif k % 3 == 1:
+                    Reserva.get(db, rnd.choice(datos["reservas"])).add_service(db, rnd.choice(datos["servicios"]))
+                else:
+                    r = Reserva.get(db, rnd.choice(datos["reservas"]))
+                    r.id_empleado = None
+                    r.save(db)
+            escribir.append((time.perf_counter() - t0) * 1000 / cambios_por_ronda)
+
+            t0 = time.perf_counter()
+            actual = foto()
+            cambiadas = sum(len(actual[t] - anterior[t]) for t in tablas)
+            releer.append((time.perf_counter() - t0) * 1000)
+            anterior = actual
+
+            t0 = time.perf_counter()
+            leidos = 0
+            while True:
+                lote = changes_since(db, ultimo, 1000)
+                if not lote:
+                    break
+                leidos += len(lote)
+                ultimo = lote[-1]["seq"]
+            deltas.append((time.perf_counter() - t0) * 1000)
+        commit_offset(db, "bench", ultimo)
+
+        filas = db.fetchone("SELECT COUNT(*) FROM cambio")[0]
+        t0 = time.perf_counter()
+        borrados = compact_changes(db)
+        resultados = {
+            "volumen": {"huespedes": huespedes, "reservas": reservas, "cambios_por_ronda": cambios_por_ronda,
+                        "filas_cambiadas_ultima_ronda": cambiadas, "cambios_leidos_ultima_ronda": leidos,
+                        "registro_antes_compactar": filas, "registro_despues_compactar": filas - borrados},
+            "escritura_por_cambio_ms": _percentil(escribir, 50),
+            "releer_tablas_ms": _percentil(releer, 50),
+            "changes_since_ms": _percentil(deltas, 50),
+            "compactar_ms": (time.perf_counter() - t0) * 1000,
+        }
+        db.close()
+    return resultados
+
+
+# -------------------------
+# Entrada de línea de comandos
+# -------------------------
+SUITES = {
+    "operaciones": lambda a: bench_operaciones(a.huespedes, a.habitaciones, a.reservas, a.repeticiones),
+    "bulk": lambda a: bench_bulk_write(),
+    "concurrencia": lambda a: bench_concurrencia(),
+    "api": lambda a: bench_async_reservas(),
+    "busqueda": lambda a: bench_busqueda_huespedes(a.huespedes_busqueda),
+    "modelos": lambda a: bench_modelos(),
+    "arranque": lambda a: bench_arranque(),
+    "importacion": lambda a: bench_importacion(),
+    "facturacion": lambda a: bench_facturacion_paralela(),
+    "inventario": lambda a: bench_inventario(),
+    "pos": lambda a: bench_cargos_pos(),
+    "tarifas": lambda a: bench_tarifas(),
+    "archivo": lambda a: bench_archivo(),
+    "cambios": lambda a: bench_cambios(),
+}
+
+
+def _aplanar(datos, prefijo=""):
+    for k, v in datos.items():
+        clave = f"{prefijo}{k}"
+        if isinstance(v, dict):
+            yield from _aplanar(v, clave + ".")
+        elif isinstance(v, (int, float)):
+            yield clave, v
+
+
+def comparar(actual, base, tolerancia=0.15):
+    """
+    Compara dos resultados JSON métrica a métrica. Latencias (*_ms), duraciones (*_seg)
+    y bytes son "menor es mejor"; las tasas (*_por_seg, filas/s) "mayor es mejor".
+    Devuelve las métricas que empeoraron más que la tolerancia.
+    """
+    base_plana = dict(_aplanar(base.get("resultados", {})))
+    regresiones = []
+    for clave, valor in _aplanar(actual.get("resultados", {})):
+        anterior = base_plana.get(clave)
+        if not anterior or clave.endswith(".n") or ".volumen." in clave:
+            continue
+        menor_mejor = not clave.endswith("_por_seg") and clave.endswith(("_ms", "_seg", "bytes_por_objeto",
+                                                                          "_bytes", "us_por_consulta"))
+        cambio = (valor - anterior) / anterior
+        if (cambio > tolerancia) if menor_mejor else (cambio < -tolerancia):
+            regresiones.append((clave, anterior, valor, cambio))
+    return regresiones
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmarks del sistema hotelero")
+    parser.add_argument("suites", nargs="*", default=["operaciones"],
+                        help=f"suites a ejecutar: {', '.join(SUITES)} (por defecto: operaciones)")
+    parser.add_argument("--huespedes", type=int, default=2000)
+    parser.add_argument("--habitaciones", type=int, default=100)
+    parser.add_argument("--reservas", type=int, default=5000)
+    parser.add_argument("--repeticiones", type=int, default=500)
+    parser.add_argument("--huespedes-busqueda", type=int, default=1_000_000)
+    parser.add_argument("--json", help="archivo donde guardar los resultados")
+    parser.add_argument("--compare", help="resultados anteriores (JSON) para detectar regresiones")
+    parser.add_argument("--tolerancia", type=float, default=0.15)
+    args = parser.parse_args(argv)
+    desconocidas = [s for s in args.suites if s not in SUITES]
+    if desconocidas:
+        parser.error(f"suite desconocida: {', '.join(desconocidas)}")
+
+    salida = {
+        "meta": {"fecha": datetime.now().isoformat(timespec="seconds"), "python": platform.python_version(),
+                 "sqlite": sqlite3.sqlite_version, "plataforma": platform.platform(),
+                 "parametros": {k: v for k, v in vars(args).items() if k not in ("json", "compare")}},
+        "resultados": {},
+    }
+    for suite in args.suites:
+        print(f"== {suite}", file=sys.stderr)
+        salida["resultados"][suite] = SUITES[suite](args)
+
+    texto = json.dumps(salida, indent=2, ensure_ascii=False, default=str)
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            f.write(texto + "\n")
+    else:
+        print(texto)
+
+    if args.compare:
+        with open(args.compare, encoding="utf-8") as f:
+            regresiones = comparar(salida, json.load(f), args.tolerancia)
+        for clave, antes, ahora, cambio in regresiones:
+            print(f"REGRESIÓN {clave}: {antes:.4g} -> {ahora:.4g} ({cambio:+.0%})", file=sys.stderr)
+        return 1 if regresiones else 0
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,41 @@
+#!/usr/bin/env python3
+"""
+check_plans.py
+Verifica con EXPLAIN QUERY PLAN que ninguna consulta caliente de hotel_app.py y
+hotel_io.py (sentencias registradas en SQL y plantillas de los caminos masivos, las
+búsquedas y los reportes) recorra una tabla completa. Sale con código 1 si alguna lo hace, para usarlo antes de un commit
+o en CI.
+
+Uso:
+    python check_plans.py                 # esquema actual en una base temporal
+    python check_plans.py --db hotel.db   # planes sobre una base existente (con sus estadísticas)
+"""
+
+import argparse
+import os
+import sys
+import tempfile
+
+import hotel_io  # noqa: F401  (registra en SQL las consultas de exportación)
+from hotel_app import Database, query_plan_scans
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Detecta consultas calientes que recorren tablas completas")
+    parser.add_argument("--db", help="base a revisar (por defecto, una base nueva con el esquema actual)")
+    args = parser.parse_args(argv)
+
+    with tempfile.TemporaryDirectory() as d:
+        db = Database(args.db or os.path.join(d, "planes.db"))
+        db.create_tables()
+        problemas = query_plan_scans(db)
+        db.close()
+
+    for nombre, detalle in problemas:
+        print(f"{nombre}: {detalle}")
+    print(f"{len(problemas)} consultas con SCAN de tabla completa" if problemas else "OK: sin SCAN de tablas")
+    return 1 if problemas else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,99 @@
+#!/usr/bin/env python3
+"""
+check_totals.py
+Verifica que los caminos masivos de facturación (calculate_totals y
+generate_invoices_parallel) y el saldo del folio (Reserva.balance) den, al centavo, el mismo total que
+Reserva.calculate_total reserva por reserva. Sale con código 1 si alguna reserva
+difiere, para usarlo antes de un commit o en CI.
+
+Uso:
+    python check_totals.py                 # datos sintéticos (incluye cantidades NULL y 0)
+    python check_totals.py --db hotel.db   # sobre una copia de una base existente
+"""
+
+import argparse
+import os
+import random
+import sqlite3
+import sys
+import tempfile
+from datetime import date, timedelta
+
+from hotel_app import (Database, Habitacion, Huesped, Reserva, ServicioAdicional, calculate_totals,
+                       generate_invoices_parallel)
+from hotel_folio import add_services, rebuild_folios
+
+
+def _dia(n):
+    return (date(2025, 1, 1) + timedelta(days=n)).isoformat()
+
+
+def _datos_sinteticos(db: Database, reservas=2000, semilla=7):
+    rnd = random.Random(semilla)
+    huespedes = Huesped.save_many(db, [Huesped(f"Huésped {i}", f"{i}-0") for i in range(200)])
+    habitaciones = Habitacion.save_many(db, [Habitacion(100 + i, rnd.choice(["simple", "doble", "suite"]),
+                                                        round(rnd.uniform(30, 250), 2)) for i in range(50)])
+    servicios = ServicioAdicional.save_many(db, [ServicioAdicional(f"Servicio {i}", None, round(rnd.uniform(0.5, 80), 2))
+                                                 for i in range(12)])
+    ocupadas = {h: 0 for h in habitaciones}
+    nuevas = []
+    for _ in range(reservas):
+        hab = rnd.choice(habitaciones)
+        inicio = ocupadas[hab] + rnd.randint(0, 3)
+        noches = rnd.randint(1, 7)
+        ocupadas[hab] = inicio + noches
+        nuevas.append(Reserva(_dia(inicio), _dia(inicio + noches), "confirmada", rnd.choice(huespedes), hab))
+    ids = Reserva.save_many(db, nuevas)
+    with db.batch():
+        # líneas directas, con cantidades NULL y 0 (ambas cuentan como 1)
+        db.conn.executemany("INSERT INTO reserva_servicio (id_reserva, id_servicio, cantidad) VALUES (?,?,?)",
+                            [(i, rnd.choice(servicios), rnd.choice([None, 0, 1, 1, 2, 3]))
+                             for i in ids for _ in range(rnd.randint(0, 4))])
+        rebuild_folios(db, ids)
+    # y otras por add_services, que actualiza el folio de forma incremental
+    add_services(db, [(i, rnd.choice(servicios), rnd.choice([None, 0, 1, 2])) for i in rnd.sample(ids, len(ids) // 2)])
+
+
+def diferencias(db: Database):
+    """[(camino, id_reserva, total por reserva, total del camino)] de las reservas que no coinciden."""
+    ids = [r[0] for r in db.fetchall("SELECT id_reserva FROM reserva ORDER BY id_reserva")]
+    por_reserva = {r.id: r.calculate_total(db) for r in Reserva.get_many(db, ids)}
+    caminos = {"calculate_totals": calculate_totals(db, ids),
+               "folio": {r.id: r.balance(db) for r in Reserva.get_many(db, ids)}}
+    # la base es una copia temporal: las facturas emitidas aquí se descartan
+    facturas = generate_invoices_parallel(db, ids, workers=2)
+    montos = dict(db.fetchall("SELECT id_factura, monto_total FROM factura"))
+    caminos["generate_invoices_parallel"] = {i: montos[f] for i, f in facturas.items()}
+    problemas = []
+    for camino, totales in caminos.items():
+        for id_reserva, esperado in por_reserva.items():
+            if totales.get(id_reserva) != esperado:
+                problemas.append((camino, id_reserva, esperado, totales.get(id_reserva)))
+    return problemas
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Paridad de totales: calculate_total contra los caminos masivos")
+    parser.add_argument("--db", help="base a revisar (se trabaja sobre una copia)")
+    args = parser.parse_args(argv)
+
+    with tempfile.TemporaryDirectory() as d:
+        ruta = os.path.join(d, "totales.db")
+        if args.db:
+            with sqlite3.connect(args.db) as origen, sqlite3.connect(ruta) as copia:
+                origen.backup(copia)
+        db = Database(ruta)
+        db.create_tables()
+        if not args.db:
+            _datos_sinteticos(db)
+        problemas = diferencias(db)
+        db.close()
+
+    for camino, id_reserva, esperado, obtenido in problemas[:50]:
+        print(f"{camino}: reserva {id_reserva} calculate_total={esperado} masivo={obtenido}")
+    print(f"{len(problemas)} totales distintos" if problemas else "OK: totales idénticos")
+    return 1 if problemas else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,311 @@
+#!/usr/bin/env python3
+"""
+hotel_analytics.py
+Analítica: ocupación, ADR y RevPAR por día y tipo de habitación, sobre el resumen
+ocupacion_diaria que los modelos mantienen al guardar estadías y facturas.
+"""
+
+import json
+from array import array
+from datetime import date, timedelta
+from itertools import accumulate
+
+import hotel_archive
+from hotel_app import ESTADO_CANCELADA, SQL, Database, Reserva, _fecha, _fecha_iso, _tipo_precio
+
+try:
+    import numpy as np  # opcional: recálculo vectorizado de la analítica
+except ImportError:
+    np = None
+
+# ocupacion_diaria guarda, por noche y tipo de habitación, noches vendidas e ingreso por
+# habitación y lo facturado ese día. Cada estadía cuenta con la tarifa (tipo y precio de la
+# habitación) que tenía al guardarse, registrada en tarifa_reserva. Ambas se mantienen en
+# la misma transacción de cada Reserva.save / generate_invoice. Un cambio de tipo o precio de una
+# habitación solo mueve las estadías que todavía no empezaron (y sus facturas); las noches
+# ya vendidas conservan su tarifa, así el ADR y el RevPAR pasados no cambian.
+# rebuild_daily_summary lo recalcula con las mismas reglas.
+_SQL_UPSERT_RESUMEN = SQL.add("ocupacion_diaria.upsert", """
+    INSERT INTO ocupacion_diaria (fecha, tipo, noches_vendidas, ingreso_habitacion, facturado)
+    VALUES (?,?,?,?,?)
+    ON CONFLICT(fecha, tipo) DO UPDATE SET
+        noches_vendidas = noches_vendidas + excluded.noches_vendidas,
+        ingreso_habitacion = ingreso_habitacion + excluded.ingreso_habitacion,
+        facturado = facturado + excluded.facturado
+""")
+# una fila que queda en cero (se movieron o cancelaron todas sus estadías y facturas) se
+# borra, igual que si se recalculara; el margen absorbe el redondeo de las sumas en REAL
+_SQL_BORRAR_VACIA = SQL.add("ocupacion_diaria.borrar_vacia", """
+    DELETE FROM ocupacion_diaria
+    WHERE fecha = ? AND tipo = ? AND noches_vendidas = 0
+      AND abs(ingreso_habitacion) < 1e-6 AND abs(facturado) < 1e-6
+""")
+SQL.add("tarifa_reserva.get",
+        "SELECT id_reserva, tipo, precio FROM tarifa_reserva WHERE id_reserva IN (SELECT value FROM json_each(?))")
+_SQL_GUARDAR_TARIFA = SQL.add("tarifa_reserva.guardar",
+                              "INSERT OR REPLACE INTO tarifa_reserva (id_reserva, tipo, precio) VALUES (?,?,?)")
+SQL.add("reserva.por_iniciar", """
+    SELECT id_reserva FROM reserva
+    WHERE id_habitacion IN (SELECT value FROM json_each(?)) AND fecha_ingreso >= ?
+""")
+SQL.add("factura.montos_reserva",
+        "SELECT fecha_emision, SUM(monto_total) FROM factura WHERE id_reserva = ? GROUP BY fecha_emision")
+
+
+def _tarifas(db: Database, estadias):
+    """
+    {id_reserva: (tipo, precio)} de las estadías [(id_reserva, id_habitacion)]: la tarifa
+    registrada o, si no la hay, la vigente de la habitación (None si la habitación no existe).
+    """
+    estadias = [(i, h) for i, h in estadias if i is not None]
+    if not estadias:
+        return {}
+    registradas = {r[0]: (r[1], r[2]) for r in db.fetchall(SQL["tarifa_reserva.get"],
+                                                            (json.dumps([i for i, _h in estadias]),))}
+    faltan = [h for i, h in estadias if i not in registradas]
+    vigentes = _tipo_precio(db, faltan) if faltan else {}
+    return {i: registradas.get(i) or vigentes.get(h) for i, h in estadias}
+
+
+def _guardar_tarifas(db: Database, tarifas):
+    if tarifas:
+        db.conn.executemany(_SQL_GUARDAR_TARIFA, [(i, t, p) for i, (t, p) in tarifas.items()])
+
+
+def _acumular_estadias(reservas, signo, deltas, tarifas):
+    # tarifas: {id_reserva: (tipo, precio)}, ver _tarifas
+    for r in reservas:
+        tarifa = tarifas.get(r.id)
+        if r.estado == ESTADO_CANCELADA or tarifa is None:
+            continue
+        tipo, precio = tarifa
+        dia, fin = _fecha(r.fecha_ingreso), _fecha(r.fecha_salida)
+        while dia < fin:
+            d = deltas.setdefault((dia.isoformat(), tipo), [0, 0.0, 0.0])
+            d[0] += signo
+            d[1] += signo * precio
+            dia += timedelta(days=1)
+
+
+def _mover_facturado(deltas, montos, tipo_anterior, tipo_nuevo):
+    # facturas [(fecha_emision, monto)] que pasan de un tipo a otro (None = sin habitación)
+    if tipo_anterior == tipo_nuevo:
+        return
+    for fecha_emision, monto in montos:
+        if tipo_anterior is not None:
+            deltas.setdefault((fecha_emision, tipo_anterior), [0, 0.0, 0.0])[2] -= monto
+        if tipo_nuevo is not None:
+            deltas.setdefault((fecha_emision, tipo_nuevo), [0, 0.0, 0.0])[2] += monto
+
+
+def _aplicar_resumen(db: Database, deltas):
+    filas = [(f, t, n, i, fac) for (f, t), (n, i, fac) in deltas.items() if n or i or fac]
+    if filas:
+        with db.batch():
+            db.conn.executemany(_SQL_UPSERT_RESUMEN, filas)
+            db.conn.executemany(_SQL_BORRAR_VACIA, [(f, t) for f, t, n, i, fac in filas if n < 0 or i < 0 or fac < 0])
+
+
+def update_daily_summary(db: Database, quitar=(), agregar=(), facturas=()):
+    """
+    Actualiza ocupacion_diaria de forma incremental: resta las estadías `quitar`
+    (estado anterior), suma las de `agregar` y las facturas [(fecha_emision, id_reserva,
+    id_habitacion, monto)]. Una estadía nueva o que cambió de habitación toma la tarifa
+    vigente (y sus facturas pasan al tipo nuevo); las demás conservan la registrada.
+    """
+    anteriores = {r.id: r.id_habitacion for r in quitar if r.id is not None}
+    with db.batch():
+        deltas = {}
+        antes = _tarifas(db, anteriores.items())
+        _acumular_estadias(quitar, -1, deltas, antes)
+        conservan = {r.id for r in agregar if r.id in antes and anteriores[r.id] == r.id_habitacion}
+        vigentes = _tipo_precio(db, [r.id_habitacion for r in agregar if r.id not in conservan])
+        tarifas = {r.id: antes[r.id] if r.id in conservan else vigentes.get(r.id_habitacion) for r in agregar}
+        _acumular_estadias(agregar, 1, deltas, tarifas)
+        _guardar_tarifas(db, {i: t for i, t in tarifas.items() if i not in conservan and t is not None})
+        for r in agregar:
+            if r.id in anteriores and r.id not in conservan:
+                _mover_facturado(deltas, db.fetchall(SQL["factura.montos_reserva"], (r.id,)),
+                                 (antes.get(r.id) or (None,))[0], (tarifas[r.id] or (None,))[0])
+        tipos = _tarifas(db, [(i, h) for _f, i, h, _m in facturas])
+        for fecha_emision, id_reserva, _h, monto in facturas:
+            deltas.setdefault((fecha_emision, (tipos.get(id_reserva) or ('',))[0]), [0, 0.0, 0.0])[2] += monto
+        _aplicar_resumen(db, deltas)
+
+
+def refresh_rooms(db: Database, anteriores):
+    """
+    Pasa a la tarifa nueva las estadías que todavía no empezaron (y sus facturas) de las
+    habitaciones cuyo tipo o precio cambió; anteriores = {id_habitacion: (tipo, precio)}
+    leído antes del UPDATE. Las estadías ya empezadas conservan su tarifa.
+    """
+    actuales = _tipo_precio(db, anteriores)
+    cambiadas = [i for i, valor in anteriores.items() if actuales.get(i) != valor]
+    if not cambiadas:
+        return
+    por_iniciar = db.fetchall(SQL["reserva.por_iniciar"], (json.dumps(cambiadas), date.today().isoformat()))
+    reservas = Reserva.get_many(db, [r[0] for r in por_iniciar])
+    antes = _tarifas(db, [(r.id, r.id_habitacion) for r in reservas])
+    despues = {r.id: actuales.get(r.id_habitacion) for r in reservas}
+    deltas = {}
+    _acumular_estadias(reservas, -1, deltas, antes)
+    _acumular_estadias(reservas, 1, deltas, despues)
+    for r in reservas:
+        _mover_facturado(deltas, db.fetchall(SQL["factura.montos_reserva"], (r.id,)),
+                         (antes.get(r.id) or (None,))[0], (despues[r.id] or (None,))[0])
+    with db.batch():
+        _guardar_tarifas(db, {i: t for i, t in despues.items() if t is not None})
+        _aplicar_resumen(db, deltas)
+
+
+def _tarifas_registradas(db: Database):
+    # tarifas de todas las estadías, ver _tarifas: (registradas, vigentes por habitación)
+    registradas = {r[0]: (r[1], r[2]) for r in db.fetchall("SELECT id_reserva, tipo, precio FROM tarifa_reserva")}
+    vigentes = {r[0]: (r[1] or '', r[2] or 0.0)
+                for r in db.fetchall("SELECT id_habitacion, tipo, precio FROM habitacion")}
+    return registradas, vigentes
+
+
+def backfill_stay_rates(db: Database):
+    """Registra la tarifa vigente a las estadías (de la base y archivadas) que aún no tienen una."""
+    registradas, vigentes = _tarifas_registradas(db)
+    estadias = hotel_archive.query_partitions(db, "SELECT id_reserva, id_habitacion FROM {e}.reserva", archivo=True)
+    with db.batch():
+        _guardar_tarifas(db, {r['id_reserva']: vigentes[r['id_habitacion']] for r in estadias
+                              if r['id_reserva'] not in registradas and r['id_habitacion'] in vigentes})
+
+
+def _noches_por_dia(inicios, fines, precios, dias):
+    """
+    Vector de noches vendidas e ingreso por día a partir de estadías [inicio, fin)
+    (índices de día), con arreglos de diferencias + suma acumulada.
+    """
+    if np is not None:
+        dif_n = np.zeros(dias + 1, dtype=np.int64)
+        dif_i = np.zeros(dias + 1, dtype=np.float64)
+        ini, fin, pre = np.asarray(inicios), np.asarray(fines), np.asarray(precios, dtype=np.float64)
+        np.add.at(dif_n, ini, 1)
+        np.add.at(dif_n, fin, -1)
+        np.add.at(dif_i, ini, pre)
+        np.add.at(dif_i, fin, -pre)
+        return np.cumsum(dif_n[:-1]).tolist(), np.cumsum(dif_i[:-1]).tolist()
+    dif_n = array('l', bytes(8 * (dias + 1)))
+    dif_i = array('d', bytes(8 * (dias + 1)))
+    for a, b, p in zip(inicios, fines, precios):
+        dif_n[a] += 1
+        dif_n[b] -= 1
+        dif_i[a] += p
+        dif_i[b] -= p
+    return list(accumulate(dif_n[:-1])), list(accumulate(dif_i[:-1]))
+
+
+def rebuild_daily_summary(db: Database):
+    """
+    Recalcula ocupacion_diaria completa desde reserva, tarifa_reserva y factura,
+    incluidas las estadías archivadas (ver hotel_archive).
+    """
+    # los archivos se leen sin cruzarlos con tablas de la base (van por otra conexión, ver
+    # hotel_archive.query_partitions): la tarifa de cada estadía se busca aquí
+    registradas, vigentes = _tarifas_registradas(db)
+
+    def tarifa(r):
+        return registradas.get(r['id_reserva']) or vigentes.get(r['id_habitacion'])
+
+    estadias = {}
+    for r in hotel_archive.query_partitions(db, """
+        SELECT id_reserva, id_habitacion, fecha_ingreso, fecha_salida FROM {e}.reserva
+        WHERE estado IS NOT 'cancelada'
+    """, archivo=True):
+        ini, fin = _fecha(r['fecha_ingreso']).toordinal(), _fecha(r['fecha_salida']).toordinal()
+        t = tarifa(r)
+        if fin > ini and t is not None:
+            estadias.setdefault(t[0], []).append((ini, fin, t[1]))
+
+    filas = {}
+    if estadias:
+        base = min(e[0] for lista in estadias.values() for e in lista)
+        dias = max(e[1] for lista in estadias.values() for e in lista) - base
+        for tipo, lista in estadias.items():
+            inicios = [e[0] - base for e in lista]
+            fines = [e[1] - base for e in lista]
+            noches, ingresos = _noches_por_dia(inicios, fines, [e[2] for e in lista], dias)
+            for i, (n, ingreso) in enumerate(zip(noches, ingresos)):
+                if n:
+                    fecha = date.fromordinal(base + i).isoformat()
+                    filas[(fecha, tipo)] = [n, round(ingreso, 6), 0.0]
+    for f in hotel_archive.query_partitions(db, """
+        SELECT f.fecha_emision, r.id_reserva, r.id_habitacion, SUM(f.monto_total) AS monto
+        FROM {e}.factura f JOIN {e}.reserva r ON r.id_reserva = f.id_reserva
+        GROUP BY f.fecha_emision, r.id_reserva
+    """, archivo=True):
+        t = tarifa(f)
+        if t is not None:
+            filas.setdefault((f['fecha_emision'], t[0]), [0, 0.0, 0.0])[2] += f['monto']
+
+    with db.batch():
+        db.conn.execute("DELETE FROM ocupacion_diaria")
+        db.conn.executemany(
+            "INSERT INTO ocupacion_diaria (fecha, tipo, noches_vendidas, ingreso_habitacion, facturado) VALUES (?,?,?,?,?)",
+            [(f, t, n, i, fac) for (f, t), (n, i, fac) in filas.items() if n or abs(i) >= 1e-6 or abs(fac) >= 1e-6]
+        )
+
+
+SQL.add("ocupacion.habitaciones_por_tipo",
+        "SELECT COALESCE(tipo, '') AS tipo, COUNT(*) AS n FROM habitacion GROUP BY 1")
+SQL.add("ocupacion.dias", "SELECT * FROM ocupacion_diaria WHERE fecha >= ? AND fecha < ?")
+SQL.add("ocupacion.por_tipo", """
+    SELECT tipo, SUM(noches_vendidas) AS noches, SUM(ingreso_habitacion) AS ingreso, SUM(facturado) AS facturado
+    FROM ocupacion_diaria WHERE fecha >= ? AND fecha < ? GROUP BY tipo
+""")
+
+
+def _habitaciones_por_tipo(db: Database):
+    return {r['tipo']: r['n'] for r in db.fetchall(SQL["ocupacion.habitaciones_por_tipo"])}
+
+
+def _indicadores(noches, ingreso, capacidad):
+    return {
+        "noches_vendidas": noches,
+        "ingreso_habitacion": round(ingreso, 2),
+        "ocupacion": noches / capacidad if capacidad else 0.0,
+        "adr": round(ingreso / noches, 2) if noches else 0.0,
+        "revpar": round(ingreso / capacidad, 2) if capacidad else 0.0,
+    }
+
+
+def occupancy_report(db: Database, desde, hasta, tipo=None):
+    """
+    Ocupación, ADR y RevPAR por día y tipo para las noches en [desde, hasta).
+    Lee solo ocupacion_diaria (rango sobre su clave primaria).
+    """
+    desde, hasta = _fecha_iso(desde), _fecha_iso(hasta)
+    habitaciones = _habitaciones_por_tipo(db)
+    tipos = [tipo] if tipo is not None else sorted(habitaciones)
+    datos = {(r['fecha'], r['tipo']): r for r in db.fetchall(SQL["ocupacion.dias"], (desde, hasta))}
+    reporte = []
+    dia, fin = _fecha(desde), _fecha(hasta)
+    while dia < fin:
+        fecha = dia.isoformat()
+        for t in tipos:
+            r = datos.get((fecha, t))
+            fila = {"fecha": fecha, "tipo": t, "habitaciones": habitaciones.get(t, 0)}
+            fila.update(_indicadores(r['noches_vendidas'] if r else 0, r['ingreso_habitacion'] if r else 0.0,
+                                     habitaciones.get(t, 0)))
+            fila["facturado"] = round(r['facturado'], 2) if r else 0.0
+            reporte.append(fila)
+        dia += timedelta(days=1)
+    return reporte
+
+
+def occupancy_summary(db: Database, desde, hasta, tipo=None):
+    """Indicadores agregados del período [desde, hasta) por tipo de habitación."""
+    desde, hasta = _fecha_iso(desde), _fecha_iso(hasta)
+    dias = max(0, (_fecha(hasta) - _fecha(desde)).days)
+    habitaciones = _habitaciones_por_tipo(db)
+    sumas = {r['tipo']: r for r in db.fetchall(SQL["ocupacion.por_tipo"], (desde, hasta))}
+    resumen = {}
+    for t in ([tipo] if tipo is not None else sorted(set(habitaciones) | set(sumas))):
+        r = sumas.get(t)
+        resumen[t] = _indicadores(r['noches'] if r else 0, r['ingreso'] if r else 0.0, habitaciones.get(t, 0) * dias)
+        resumen[t]["facturado"] = round(r['facturado'], 2) if r else 0.0
+    return resumen
@@ -0,0 +1,249 @@
+#!/usr/bin/env python3
+"""
+hotel_api.py
+API asyncio sobre los modelos de hotel_app.py para el front web/móvil.
+Las llamadas a SQLite son bloqueantes, así que se ejecutan en un pool de hilos
+acotado; el event loop nunca espera a la base de datos.
+Incluye un servidor HTTP/JSON mínimo hecho solo con la librería estándar.
+"""
+
+import argparse
+import asyncio
+import json
+import sqlite3
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+from urllib.parse import parse_qs, urlsplit
+
+from hotel_app import ConflictError, Database, Habitacion, Huesped, Reserva, find_available_rooms, model_to_dict
+from hotel_changes import changes_since
+
+
+# -------------------------
+# Servicio asíncrono
+# -------------------------
+class HotelService:
+    def __init__(self, db: Database, max_workers=8):
+        self.db = db
+        self.executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="hotel-db")
+
+    async def _run(self, fn, *args, **kwargs):
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self.executor, partial(fn, *args, **kwargs))
+
+    # Huéspedes
+    async def get_huesped(self, id_huesped):
+        return await self._run(Huesped.get, self.db, id_huesped)
+
+    async def create_huesped(self, nombre, documento=None, fecha_nacimiento=None, nacionalidad=None, direccion=None):
+        h = Huesped(nombre, documento, fecha_nacimiento, nacionalidad, direccion)
+        await self._run(h.save, self.db)
+        return h
+
+    # Habitaciones
+    async def get_habitacion(self, id_habitacion):
+        return await self._run(Habitacion.get, self.db, id_habitacion)
+
+    async def find_available_rooms(self, tipo, desde, hasta):
+        return await self._run(find_available_rooms, self.db, tipo, desde, hasta)
+
+    # Reservas
+    async def get_reserva(self, id_reserva):
+        return await self._run(Reserva.get, self.db, id_reserva)
+
+    async def create_reserva(self, fecha_ingreso, fecha_salida, id_huesped, id_habitacion, id_empleado=None,
+                             estado="confirmada"):
+        r = Reserva(fecha_ingreso, fecha_salida, estado, id_huesped, id_habitacion, id_empleado)
+        await self._run(r.save, self.db)
+        return r
+
+    async def add_service(self, reserva: Reserva, id_servicio, cantidad=1):
+        await self._run(reserva.add_service, self.db, id_servicio, cantidad)
+
+    async def services(self, reserva: Reserva):
+        return await self._run(reserva.services, self.db)
+
+    async def calculate_total(self, reserva: Reserva):
+        return await self._run(reserva.calculate_total, self.db)
+
+    async def balance(self, reserva: Reserva):
+        return await self._run(reserva.balance, self.db)
+
+    async def generate_invoice(self, reserva: Reserva):
+        return await self._run(reserva.generate_invoice, self.db)
+
+    # Registro de cambios
+    async def changes_since(self, seq, limit=500, tablas=None):
+        return await self._run(changes_since, self.db, seq, limit, tablas)
+
+    def close(self):
+        self.executor.shutdown(wait=True)
+
+
+# -------------------------
+# Servidor HTTP/JSON
+# -------------------------
+class HttpError(Exception):
+    def __init__(self, status, mensaje):
+        super().__init__(mensaje)
+        self.status = status
+
+
+_REASONS = {200: "OK", 201: "Created", 400: "Bad Request", 404: "Not Found",
+            405: "Method Not Allowed", 409: "Conflict", 500: "Internal Server Error"}
+
+
+class HotelHttpServer:
+    """
+    Rutas:
+      GET  /habitaciones/disponibles?tipo=&desde=&hasta=
+      GET  /habitaciones/<id>
+      POST /huespedes                      {"nombre", "documento", ...}
+      GET  /huespedes/<id>
+      POST /reservas                       {"fecha_ingreso", "fecha_salida", "id_huesped", "id_habitacion", ...}
+      GET  /reservas/<id>                  (incluye servicios y saldo del folio)
+      POST /reservas/<id>/servicios        {"id_servicio", "cantidad"}
+      POST /reservas/<id>/factura
+      GET  /cambios?desde=&limite=&tablas=   (registro de cambios posteriores a desde)
+    """
+
+    def __init__(self, service: HotelService):
+        self.service = service
+
+    async def _reserva(self, id_reserva):
+        r = await self.service.get_reserva(int(id_reserva))
+        if r is None:
+            raise HttpError(404, "Reserva no encontrada")
+        return r
+
+    async def dispatch(self, metodo, ruta, query, body):
+        partes = [p for p in ruta.split("/") if p]
+        s = self.service
+
+        if metodo == "GET" and partes == ["habitaciones", "disponibles"]:
+            if "desde" not in query or "hasta" not in query:
+                raise HttpError(400, "Faltan desde/hasta")
+            habs = await s.find_available_rooms(query.get("tipo"), query["desde"], query["hasta"])
+            return 200, [model_to_dict(h) for h in habs]
+        if metodo == "GET" and len(partes) == 2 and partes[0] == "habitaciones":
+            hab = await s.get_habitacion(int(partes[1]))
+            if hab is None:
+                raise HttpError(404, "Habitación no encontrada")
+            return 200, model_to_dict(hab)
+
+        if partes == ["huespedes"] and metodo == "POST":
+            return 201, model_to_dict(await s.create_huesped(**body))
+        if metodo == "GET" and len(partes) == 2 and partes[0] == "huespedes":
+            h = await s.get_huesped(int(partes[1]))
+            if h is None:
+                raise HttpError(404, "Huésped no encontrado")
+            return 200, model_to_dict(h)
+
+        if partes == ["reservas"] and metodo == "POST":
+            return 201, model_to_dict(await s.create_reserva(**body))
+        if metodo == "GET" and len(partes) == 2 and partes[0] == "reservas":
+            r = await self._reserva(partes[1])
+            datos = model_to_dict(r)
+            datos["servicios"] = await s.services(r)
+            datos["total"] = await s.balance(r)
+            return 200, datos
+        if metodo == "POST" and len(partes) == 3 and partes[0] == "reservas" and partes[2] == "servicios":
+            r = await self._reserva(partes[1])
+            await s.add_service(r, body["id_servicio"], body.get("cantidad", 1))
+            return 201, {"servicios": await s.services(r)}
+        if metodo == "POST" and len(partes) == 3 and partes[0] == "reservas" and partes[2] == "factura":
+            r = await self._reserva(partes[1])
+            return 201, {"id_factura": await s.generate_invoice(r)}
+
+        if metodo == "GET" and partes == ["cambios"]:
+            tablas = query["tablas"].split(",") if query.get("tablas") else None
+            cambios = await s.changes_since(int(query.get("desde", 0)), min(int(query.get("limite", 500)), 5000),
+                                            tablas)
+            return 200, {"cambios": cambios, "ultimo": cambios[-1]["seq"] if cambios else int(query.get("desde", 0))}
+
+        raise HttpError(404, "Ruta no encontrada")
+
+    async def handle(self, reader, writer):
+        try:
+            while True:
+                linea = await reader.readline()
+                if not linea:
+                    break
+                try:
+                    metodo, objetivo, version = linea.decode("latin-1").split()
+                except ValueError:
+                    break
+                headers = {}
+                while True:
+                    h = await reader.readline()
+                    if h in (b"\r\n", b"\n", b""):
+                        break
+                    k, _, v = h.decode("latin-1").partition(":")
+                    headers[k.strip().lower()] = v.strip()
+                largo = int(headers.get("content-length", 0))
+                crudo = await reader.readexactly(largo) if largo else b""
+
+                url = urlsplit(objetivo)
+                query = {k: v[0] for k, v in parse_qs(url.query).items()}
+                try:
+                    body = json.loads(crudo) if crudo else {}
+                    status, datos = await self.dispatch(metodo.upper(), url.path, query, body)
+                except HttpError as e:
+                    status, datos = e.status, {"error": str(e)}
+                except ConflictError as e:
+                    status, datos = 409, {"error": str(e)}
+                except sqlite3.IntegrityError as e:
+                    # lo que rechaza la base por culpa del pedido: id inexistente (clave foránea),
+                    # dato faltante o repetido
+                    status = 409 if "UNIQUE" in str(e) else 400
+                    datos = {"error": f"Datos inválidos: {e}"}
+                except (ValueError, KeyError, TypeError) as e:
+                    status, datos = 400, {"error": str(e)}
+                except Exception as e:  # noqa: BLE001 - el servidor no debe caerse por una petición
+                    status, datos = 500, {"error": str(e)}
+
+                cerrar = headers.get("connection", "").lower() == "close" or version == "HTTP/1.0"
+                payload = json.dumps(datos, ensure_ascii=False).encode("utf-8")
+                writer.write(
+                    f"HTTP/1.1 {status} {_REASONS.get(status, '')}\r\n"
+                    f"Content-Type: application/json; charset=utf-8\r\n"
+                    f"Content-Length: {len(payload)}\r\n"
+                    f"Connection: {'close' if cerrar else 'keep-alive'}\r\n\r\n".encode("latin-1") + payload
+                )
+                await writer.drain()
+                if cerrar:
+                    break
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            writer.close()
+
+    async def start(self, host="127.0.0.1", port=8000):
+        return await asyncio.start_server(self.handle, host, port)
+
+
+async def serve(db_path="hotel.db", host="127.0.0.1", port=8000, max_workers=8):
+    db = Database(db_path)
+    db.create_tables()
+    service = HotelService(db, max_workers=max_workers)
+    server = await HotelHttpServer(service).start(host, port)
+    print(f"API escuchando en http://{host}:{port}")
+    try:
+        async with server:
+            await server.serve_forever()
+    finally:
+        service.close()
+        db.close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="API HTTP/JSON del sistema hotelero")
+    parser.add_argument("--db", default="hotel.db")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8000)
+    parser.add_argument("--workers", type=int, default=8)
+    args = parser.parse_args()
+    try:
+        asyncio.run(serve(args.db, args.host, args.port, args.workers))
+    except KeyboardInterrupt:
+        pass
@@ -6,112 +6,1047 @@ Huesped, Empleado, Habitacion, ServicioAdicional, Reserva, Factura,
 y tabla intermedia reserva_servicio (many-to-many).
 """
 
+import json
+import multiprocessing
+import os
+import re
 import sqlite3
+import sys
+import threading
+import time
+import weakref
+from collections import Counter, OrderedDict, deque
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import contextmanager
 from datetime import date, datetime
 from decimal import Decimal
+from functools import partial
+from itertools import repeat
 
 # -------------------------
 # Helper: conexión y tablas
 # -------------------------
+class StatementRegistry:
+    """
+    Registro central de las sentencias SQL fijas, por nombre. El caché de sentencias
+    preparadas de sqlite3 se indexa por el texto SQL, así que con el registro se dimensiona
+    cached_statements para que ninguna sentencia fija sea expulsada por el SQL dinámico
+    (listados, búsquedas, filtros).
+    """
+    MARGEN_DINAMICO = 128
+
+    def __init__(self):
+        self._sql = {}
+
+    def add(self, nombre, sql):
+        if self._sql.get(nombre, sql) != sql:
+            raise ValueError(f"Sentencia ya registrada con otro SQL: {nombre}")
+        self._sql[nombre] = sql
+        return sql
+
+    def __getitem__(self, nombre):
+        return self._sql[nombre]
+
+    def __len__(self):
+        return len(self._sql)
+
+    def items(self):
+        return self._sql.items()
+
+    def cache_size(self):
+        return len(self._sql) + self.MARGEN_DINAMICO
+
+
+SQL = StatementRegistry()
+
+
+class _LectorHilo:
+    # la conexión de lectura de un hilo, guardada en su thread-local (ver ConnectionPool.reader)
+    __slots__ = ('conn', '__weakref__')
+
+    def __init__(self, conn):
+        self.conn = conn
+
+
+class ConnectionPool:
+    """
+    Conexiones SQLite para varios hilos (terminales de recepción, web):
+    - una conexión de lectura por hilo (solo lectura, WAL permite leer en paralelo)
+    - una única conexión de escritura compartida, protegida por un lock
+    Con ':memory:' no se pueden abrir varias conexiones a la misma base, así que
+    lecturas y escrituras usan la conexión de escritura.
+    """
+    BUSY_TIMEOUT = 5.0  # segundos
+
+    def __init__(self, path='hotel.db'):
+        self.path = path
+        self.memoria = path == ':memory:'
+        self.write_lock = threading.RLock()
+        self._local = threading.local()
+        self._readers = []
+        self._readers_lock = threading.Lock()
+        self.writer = self._connect(path)
+        if not self.memoria:
+            self.writer.execute("PRAGMA journal_mode = WAL;")
+            self.writer.execute("PRAGMA synchronous = NORMAL;")
+
+    def _connect(self, path, uri=False):
+        conn = sqlite3.connect(path, timeout=self.BUSY_TIMEOUT, check_same_thread=False, uri=uri,
+                               cached_statements=SQL.cache_size())
+        conn.row_factory = sqlite3.Row
+        # activar claves foráneas en SQLite
+        conn.execute("PRAGMA foreign_keys = ON;")
+        return conn
+
+    def reader(self):
+        if self.memoria:
+            return self.writer
+        lector = getattr(self._local, 'reader', None)
+        if lector is None:
+            ruta = os.path.abspath(self.path)
+            conn = self._connect(f"file:{ruta}?mode=ro", uri=True)
+            lector = self._local.reader = _LectorHilo(conn)
+            with self._readers_lock:
+                self._readers.append(conn)
+            # cuando el hilo termina se descarta su thread-local, y con él la conexión
+            weakref.finalize(lector, self._release, conn)
+        return lector.conn
+
+    def _release(self, conn):
+        with self._readers_lock:
+            if conn in self._readers:
+                self._readers.remove(conn)
+        conn.close()
+
+    def connection(self):
+        # el hilo que está dentro de Database.batch() lee y escribe por la conexión de escritura
+        if getattr(self._local, 'writing', 0):
+            return self.writer
+        return self.reader()
+
+    def close(self):
+        with self._readers_lock:
+            for conn in self._readers:
+                conn.close()
+            self._readers.clear()
+        self.writer.close()
+
+
+class CatalogCache:
+    """
+    Caché LRU con TTL para filas del catálogo (habitaciones, servicios), que casi no cambian.
+    Guarda filas, no objetos, para que modificar un modelo devuelto no ensucie el caché.
+    Las escrituras invalidan la clave; `generacion` evita re-guardar una fila leída
+    antes de una invalidación concurrente.
+    """
+
+    def __init__(self, maxsize=1024, ttl=300.0):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self._data = OrderedDict()
+        self._generacion = 0
+        self._lock = threading.Lock()
+
+    def get(self, key, loader):
+        with self._lock:
+            item = self._data.get(key)
+            if item is not None and item[1] > time.monotonic():
+                self._data.move_to_end(key)
+                self.hits += 1
+                return item[0]
+            self.misses += 1
+            generacion = self._generacion
+        valor = loader()
+        if valor is not None:
+            with self._lock:
+                if generacion == self._generacion:
+                    self._data[key] = (valor, time.monotonic() + self.ttl)
+                    self._data.move_to_end(key)
+                    while len(self._data) > self.maxsize:
+                        self._data.popitem(last=False)
+        return valor
+
+    def invalidate(self, key):
+        with self._lock:
+            self._generacion += 1
+            self._data.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._generacion += 1
+            self._data.clear()
+
+    def stats(self):
+        with self._lock:
+            return {"hits": self.hits, "misses": self.misses, "size": len(self._data)}
+
+
+class QueryProfiler:
+    """
+    Instrumentación opcional de consultas (ver Database.enable_profiling).
+    Por sentencia: ejecuciones, filas devueltas, tiempo total y percentiles de latencia
+    (ejecución + lectura de filas) y pasos de la VM de SQLite contados con el progress handler.
+    Marca posibles N+1: una misma SELECT repetida muchas veces entre las últimas `ventana`.
+    """
+    PASOS_PROGRESS = 1000  # el progress handler se llama cada N instrucciones de la VM
+
+    def __init__(self, umbral_n_mas_1=20, ventana=100, muestras=5000):
+        self.umbral_n_mas_1 = umbral_n_mas_1
+        self.muestras = muestras
+        self.stats = {}
+        self._recientes = deque(maxlen=ventana)
+        self._conteo_recientes = Counter()
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        self._conexiones = set()
+
+    @staticmethod
+    def normalizar(sql):
+        return re.sub(r"\s+", " ", sql).strip()
+
+    def _pasos(self):
+        return getattr(self._local, 'pasos', 0)
+
+    def _progress(self):
+        self._local.pasos = self._pasos() + self.PASOS_PROGRESS
+        return 0  # 0 = seguir ejecutando
+
+    def instalar(self, conn):
+        if id(conn) not in self._conexiones:
+            conn.set_progress_handler(self._progress, self.PASOS_PROGRESS)
+            self._conexiones.add(id(conn))
+
+    def record(self, sql, segundos, filas=0, pasos=0):
+        """Registra una ejecución; devuelve la muestra de latencia para sumarle la lectura de filas."""
+        clave = self.normalizar(sql)
+        muestra = [segundos * 1000]
+        with self._lock:
+            st = self.stats.get(clave)
+            if st is None:
+                st = self.stats[clave] = {"ejecuciones": 0, "filas": 0, "total_ms": 0.0, "pasos_vm": 0,
+                                          "n_mas_1": 0, "_latencias": deque(maxlen=self.muestras)}
+            st["ejecuciones"] += 1
+            st["filas"] += filas
+            st["total_ms"] += muestra[0]
+            st["pasos_vm"] += pasos
+            st["_latencias"].append(muestra)
+            if len(self._recientes) == self._recientes.maxlen:
+                self._conteo_recientes[self._recientes[0]] -= 1
+            self._recientes.append(clave)
+            self._conteo_recientes[clave] += 1
+            repeticiones = self._conteo_recientes[clave]
+            if repeticiones >= self.umbral_n_mas_1 and clave.upper().startswith("SELECT"):
+                st["n_mas_1"] = max(st["n_mas_1"], repeticiones)
+        return st, muestra
+
+    def record_fetch(self, st, muestra, segundos, filas, pasos=0):
+        ms = segundos * 1000
+        with self._lock:
+            st["filas"] += filas
+            st["total_ms"] += ms
+            st["pasos_vm"] += pasos
+            muestra[0] += ms
+
+    def report(self):
+        """Lista de sentencias ordenada por tiempo total, con p50/p95/p99 en ms."""
+        with self._lock:
+            filas = []
+            for sql, st in self.stats.items():
+                lat = sorted(m[0] for m in st["_latencias"])
+                pct = {f"p{p}_ms": lat[min(len(lat) - 1, int(len(lat) * p / 100))] if lat else 0.0
+                       for p in (50, 95, 99)}
+                filas.append({"sql": sql, **{k: v for k, v in st.items() if not k.startswith("_")}, **pct})
+        return sorted(filas, key=lambda f: f["total_ms"], reverse=True)
+
+    def n_plus_one(self):
+        return [f for f in self.report() if f["n_mas_1"]]
+
+    def dump(self, file=None, top=20):
+        file = file or sys.stderr
+        print(f"{'ejec':>7} {'filas':>8} {'total ms':>10} {'p50':>8} {'p99':>8}  sql", file=file)
+        for f in self.report()[:top]:
+            marca = "  [N+1?]" if f["n_mas_1"] else ""
+            print(f"{f['ejecuciones']:>7} {f['filas']:>8} {f['total_ms']:>10.2f} {f['p50_ms']:>8.3f} "
+                  f"{f['p99_ms']:>8.3f}  {f['sql'][:100]}{marca}", file=file)
+
+    def reset(self):
+        with self._lock:
+            self.stats.clear()
+            self._recientes.clear()
+            self._conteo_recientes.clear()
+
+
+class _ProfiledCursor:
+    """Cursor que mide execute y la lectura de filas y lo registra en el QueryProfiler."""
+
+    def __init__(self, cursor, profiler):
+        object.__setattr__(self, '_cursor', cursor)
+        object.__setattr__(self, '_profiler', profiler)
+        object.__setattr__(self, '_actual', None)
+
+    def __getattr__(self, nombre):
+        return getattr(self._cursor, nombre)
+
+    def __setattr__(self, nombre, valor):
+        setattr(self._cursor, nombre, valor)
+
+    def _medir(self, metodo, sql, *args):
+        p = self._profiler
+        pasos0, t0 = p._pasos(), time.perf_counter()
+        getattr(self._cursor, metodo)(sql, *args)
+        filas = self._cursor.rowcount if metodo == 'executemany' else 0
+        actual = p.record(sql, time.perf_counter() - t0, max(filas, 0), p._pasos() - pasos0)
+        object.__setattr__(self, '_actual', actual)
+        return self
+
+    def execute(self, sql, params=()):
+        return self._medir('execute', sql, params)
+
+    def executemany(self, sql, seq):
+        return self._medir('executemany', sql, seq)
+
+    def _leer(self, metodo, *args):
+        p = self._profiler
+        pasos0, t0 = p._pasos(), time.perf_counter()
+        resultado = getattr(self._cursor, metodo)(*args)
+        if self._actual is not None:
+            n = (resultado is not None) if metodo == 'fetchone' else len(resultado)
+            p.record_fetch(*self._actual, time.perf_counter() - t0, n, p._pasos() - pasos0)
+        return resultado
+
+    def fetchone(self):
+        return self._leer('fetchone')
+
+    def fetchall(self):
+        return self._leer('fetchall')
+
+    def fetchmany(self, size=None):
+        return self._leer('fetchmany', size if size is not None else self._cursor.arraysize)
+
+    def __iter__(self):
+        while True:
+            fila = self.fetchone()
+            if fila is None:
+                return
+            yield fila
+
+
+class _ProfiledConnection:
+    """Envuelve una conexión para que cada execute/executemany pase por el QueryProfiler."""
+
+    def __init__(self, conn, profiler):
+        self._conn = conn
+        self._profiler = profiler
+        profiler.instalar(conn)
+
+    def __getattr__(self, nombre):
+        return getattr(self._conn, nombre)
+
+    def cursor(self):
+        return _ProfiledCursor(self._conn.cursor(), self._profiler)
+
+    def execute(self, sql, params=()):
+        return self.cursor().execute(sql, params)
+
+    def executemany(self, sql, seq):
+        return self.cursor().executemany(sql, seq)
+
+
+SQL.add("pragma.user_version", "PRAGMA user_version")
+
+
 class Database:
     def __init__(self, path='hotel.db'):
         # detect_types no obligatorio aquí; usamos strings ISO para fechas
-        self.conn = sqlite3.connect(path)
-        self.conn.row_factory = sqlite3.Row
-        # activar claves foráneas en SQLite
-        self.conn.execute("PRAGMA foreign_keys = ON;")
+        self.pool = ConnectionPool(path)
+        self.catalog = CatalogCache()
+        # profundidad de batch(): solo el hilo con el lock de escritura la modifica
+        self._batch_depth = 0
+        # callbacks a ejecutar al cerrar la transacción externa (commit o rollback)
+        self._on_commit = []
+        # callbacks a ejecutar solo si la transacción externa hizo commit
+        self._after_commit = []
+        # InventoryCalendar en memoria; se construye al primer uso (ver inventory_calendar)
+        self.inventario = None
+        # RateTable en memoria; se construye al primer uso (ver hotel_rates.rate_table)
+        self.tarifas = None
+        # None = sin verificar si existe el índice FTS de huéspedes
+        self._fts = None
+        # QueryProfiler activo (ver enable_profiling); None = sin instrumentación
+        self.profiler = None
+
+    @property
+    def conn(self):
+        conn = self.pool.connection()
+        if self.profiler is None:
+            return conn
+        return _ProfiledConnection(conn, self.profiler)
+
+    def fetchone(self, sql, params=()):
+        # las sentencias registradas en SQL quedan preparadas en la caché de la conexión
+        return self.conn.execute(sql, params).fetchone()
+
+    def fetchall(self, sql, params=()):
+        return self.conn.execute(sql, params).fetchall()
+
+    def enable_profiling(self, profiler=None):
+        """Activa la instrumentación de consultas; sin activarla, db.conn es la conexión directa."""
+        self.profiler = profiler or QueryProfiler()
+        return self.profiler
+
+    def disable_profiling(self):
+        profiler, self.profiler = self.profiler, None
+        if profiler is not None:
+            for conn in [self.pool.writer] + self.pool._readers:
+                conn.set_progress_handler(None, 0)
+            profiler._conexiones.clear()
+        return profiler
 
     def create_tables(self):
-        sqls = [
-            # Huesped
-            """
-            CREATE TABLE IF NOT EXISTS huesped (
-                id_huesped INTEGER PRIMARY KEY AUTOINCREMENT,
-                nombre TEXT NOT NULL,
-                documento TEXT,
-                fecha_nacimiento TEXT,
-                nacionalidad TEXT,
-                direccion TEXT
-            );
-            """,
-            # Empleado
-            """
-            CREATE TABLE IF NOT EXISTS empleado (
-                id_empleado INTEGER PRIMARY KEY AUTOINCREMENT,
-                nombre TEXT NOT NULL,
-                cargo TEXT,
-                area TEXT
-            );
-            """,
-            # Habitacion
-            """
-            CREATE TABLE IF NOT EXISTS habitacion (
-                id_habitacion INTEGER PRIMARY KEY AUTOINCREMENT,
-                numero INTEGER NOT NULL UNIQUE,
-                tipo TEXT,
-                precio REAL,
-                estado TEXT
-            );
-            """,
-            # Servicio adicional
-            """
-            CREATE TABLE IF NOT EXISTS servicio_adicional (
-                id_servicio INTEGER PRIMARY KEY AUTOINCREMENT,
-                nombre_servicio TEXT,
-                descripcion TEXT,
-                costo REAL
-            );
-            """,
-            # Reserva
-            """
-            CREATE TABLE IF NOT EXISTS reserva (
-                id_reserva INTEGER PRIMARY KEY AUTOINCREMENT,
-                fecha_ingreso TEXT,
-                fecha_salida TEXT,
-                estado TEXT,
-                id_huesped INTEGER,
-                id_habitacion INTEGER,
-                id_empleado INTEGER,
-                FOREIGN KEY(id_huesped) REFERENCES huesped(id_huesped),
-                FOREIGN KEY(id_habitacion) REFERENCES habitacion(id_habitacion),
-                FOREIGN KEY(id_empleado) REFERENCES empleado(id_empleado)
-            );
-            """,
-            # Tabla intermedia Reserva-Servicio (many-to-many)
-            """
-            CREATE TABLE IF NOT EXISTS reserva_servicio (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                id_reserva INTEGER,
-                id_servicio INTEGER,
-                cantidad INTEGER DEFAULT 1,
-                FOREIGN KEY(id_reserva) REFERENCES reserva(id_reserva) ON DELETE CASCADE,
-                FOREIGN KEY(id_servicio) REFERENCES servicio_adicional(id_servicio)
-            );
-            """,
-            # Factura
-            """
-            CREATE TABLE IF NOT EXISTS factura (
-                id_factura INTEGER PRIMARY KEY AUTOINCREMENT,
-                fecha_emision TEXT,
-                monto_total REAL,
-                id_reserva INTEGER,
-                FOREIGN KEY(id_reserva) REFERENCES reserva(id_reserva)
-            );
-            """
-        ]
-        cur = self.conn.cursor()
-        for s in sqls:
-            cur.execute(s)
-        self.conn.commit()
+        """
+        Aplica las migraciones pendientes (ver MIGRACIONES) según PRAGMA user_version.
+        En una base ya al día solo lee user_version: no ejecuta DDL ni hace commit.
+        """
+        if self.schema_version() >= len(MIGRACIONES):
+            return
+        with self.batch():
+            self.begin_immediate()
+            cur = self.conn.cursor()
+            # se relee con el lock tomado, por si otro proceso migró mientras tanto
+            version = cur.execute("PRAGMA user_version").fetchone()[0]
+            for numero, (_descripcion, sqls, post) in enumerate(MIGRACIONES[version:], start=version + 1):
+                for sql in sqls:
+                    cur.execute(sql)
+                if post is not None:
+                    post(self, cur)
+                cur.execute(f"PRAGMA user_version = {numero}")
+
+    def schema_version(self):
+        return self.fetchone(SQL["pragma.user_version"])[0]
+
+    def _create_documento_index(self, cur):
+        """
+        Índice por documento, único si no está vacío. Las bases anteriores no lo exigían:
+        si ya hay documentos repetidos el índice se crea sin UNIQUE (la búsqueda sigue
+        usándolo) y se avisa por stderr qué documentos hay que depurar.
+        """
+        repetidos = cur.execute("""
+            SELECT documento, COUNT(*) FROM huesped
+            WHERE documento <> '' GROUP BY documento HAVING COUNT(*) > 1
+        """).fetchall()
+        if not repetidos:
+            cur.execute("""
+                CREATE UNIQUE INDEX IF NOT EXISTS idx_huesped_documento ON huesped(documento)
+                    WHERE documento <> '';
+            """)
+            return
+        cur.execute("""
+            CREATE INDEX IF NOT EXISTS idx_huesped_documento ON huesped(documento)
+                WHERE documento <> '';
+        """)
+        detalle = ", ".join(f"{doc} ({n})" for doc, n in repetidos[:10])
+        if len(repetidos) > 10:
+            detalle += f" y {len(repetidos) - 10} más"
+        print(f"Aviso: {len(repetidos)} documentos de huésped repetidos: {detalle}. "
+              "idx_huesped_documento se creó sin UNIQUE; depure los duplicados y recréelo.",
+              file=sys.stderr)
+
+    def _create_search_index(self, cur):
+        """
+        Índice FTS5 (external content) sobre nombre/dirección del huésped, sin tildes y
+        con prefijos, sincronizado por triggers. Si SQLite no trae FTS5 se omite y
+        Huesped.search usa LIKE.
+        """
+        try:
+            cur.execute("""
+                CREATE VIRTUAL TABLE IF NOT EXISTS huesped_fts USING fts5(
+                    nombre, direccion,
+                    content='huesped', content_rowid='id_huesped',
+                    tokenize='unicode61 remove_diacritics 2', prefix='2 3'
+                );
+            """)
+        except sqlite3.OperationalError:
+            self._fts = False
+            return
+        cur.execute("""
+            CREATE TRIGGER IF NOT EXISTS huesped_fts_ai AFTER INSERT ON huesped BEGIN
+                INSERT INTO huesped_fts(rowid, nombre, direccion) VALUES (new.id_huesped, new.nombre, new.direccion);
+            END;
+        """)
+        cur.execute("""
+            CREATE TRIGGER IF NOT EXISTS huesped_fts_ad AFTER DELETE ON huesped BEGIN
+                INSERT INTO huesped_fts(huesped_fts, rowid, nombre, direccion)
+                VALUES ('delete', old.id_huesped, old.nombre, old.direccion);
+            END;
+        """)
+        cur.execute("""
+            CREATE TRIGGER IF NOT EXISTS huesped_fts_au AFTER UPDATE OF nombre, direccion ON huesped BEGIN
+                INSERT INTO huesped_fts(huesped_fts, rowid, nombre, direccion)
+                VALUES ('delete', old.id_huesped, old.nombre, old.direccion);
+                INSERT INTO huesped_fts(rowid, nombre, direccion) VALUES (new.id_huesped, new.nombre, new.direccion);
+            END;
+        """)
+        # huéspedes cargados antes de existir el índice
+        cur.execute("INSERT INTO huesped_fts(huesped_fts) VALUES ('rebuild')")
+        self._fts = True
+
+    @property
+    def has_fts(self):
+        if self._fts is None:
+            self._fts = self.conn.execute(
+                "SELECT 1 FROM sqlite_master WHERE name = 'huesped_fts'"
+            ).fetchone() is not None
+        return self._fts
+
+    @contextmanager
+    def batch(self):
+        """
+        Unidad de trabajo: todas las escrituras dentro del bloque van en una
+        sola transacción (un solo commit/fsync) por la conexión de escritura.
+        Si hay una excepción se hace rollback de todo. Se puede anidar; solo el
+        bloque externo hace commit. Las escrituras de distintos hilos se serializan.
+        """
+        pool = self.pool
+        with pool.write_lock:
+            pool._local.writing = getattr(pool._local, 'writing', 0) + 1
+            self._batch_depth += 1
+            try:
+                yield self
+            except BaseException:
+                if self._batch_depth == 1:
+                    pool.writer.rollback()
+                    self._after_commit = []
+                raise
+            else:
+                if self._batch_depth == 1:
+                    try:
+                        pool.writer.commit()
+                    except BaseException:
+                        # COMMIT puede fallar (FK diferida, disco lleno): sin rollback la transacción
+                        # quedaría abierta en la conexión compartida y la confirmaría el siguiente batch
+                        pool.writer.rollback()
+                        self._after_commit = []
+                        raise
+            finally:
+                self._batch_depth -= 1
+                pool._local.writing -= 1
+                if self._batch_depth == 0:
+                    callbacks, self._on_commit = self._on_commit + self._after_commit, []
+                    self._after_commit = []
+                    for fn in callbacks:
+                        fn()
+
+    def on_commit(self, fn):
+        """Ejecuta fn cuando termine la transacción actual (o ya, si no hay ninguna)."""
+        if self._batch_depth:
+            self._on_commit.append(fn)
+        else:
+            fn()
+
+    def after_commit(self, fn):
+        """Como on_commit, pero fn se descarta si la transacción termina en rollback."""
+        if self._batch_depth:
+            self._after_commit.append(fn)
+        else:
+            fn()
+
+    def begin_immediate(self):
+        # toma el lock de escritura ya, para que lectura + escritura sean atómicas
+        if not self.conn.in_transaction:
+            self.conn.execute("BEGIN IMMEDIATE")
 
     def close(self):
-        self.conn.close()
+        self.pool.close()
+
+
+# -------------------------
+# Planes de consulta
+# -------------------------
+# Las consultas de los caminos calientes no deben recorrer tablas completas.
+# query_plan_scans corre EXPLAIN QUERY PLAN sobre todas las sentencias de SQL y sobre
+# las plantillas de los caminos masivos, y devuelve las que hacen SCAN de una tabla
+# (un SCAN por índice o de una tabla virtual como json_each no cuenta). Ver check_plans.py.
+def _consultas_calientes(db: Database = None):
+    """
+    Plantillas dinámicas (filtros armados en tiempo de ejecución) con filtros
+    representativos. Las consultas sin filtro (exportar o buscar todo) y la búsqueda
+    por LIKE sin FTS5 recorren la tabla por diseño y no se incluyen.
+    """
+    por_ids = "r.id_reserva IN (SELECT value FROM json_each(:ids))"
+    reservas, facturas = hotel_archive.SQL_FIND_RESERVAS, hotel_archive.SQL_FIND_FACTURAS
+    consultas = {
+        "totales.por_ids": _SQL_TOTALES.format(filtro=por_ids),
+        "totales.por_salida": _SQL_TOTALES.format(filtro="r.fecha_salida BETWEEN :desde AND :hasta"),
+        "totales.pendientes": _SQL_TOTALES.format(filtro=_filtro_reservas(None, "", "", pendientes=True)[0]),
+        "disponibilidad.todas": _sql_disponibles(False),
+        "disponibilidad.por_tipo": _sql_disponibles(True),
+        "facturacion.shard_reservas": _SQL_SHARD_RESERVAS,
+        "facturacion.shard_lineas": _SQL_SHARD_LINEAS,
+        "find_reservas.huesped": reservas.format(e="main", filtro="id_huesped = ?"),
+        "find_reservas.salida": reservas.format(e="main", filtro="fecha_salida >= ? AND fecha_salida <= ?"),
+        "find_facturas.reserva": facturas.format(e="main", filtro="id_reserva = ?"),
+        "find_facturas.emision": facturas.format(e="main", filtro="fecha_emision >= ? AND fecha_emision <= ?"),
+    }
+    if db is not None and db.has_fts:
+        consultas["huesped.buscar"] = Huesped._SQL_BUSCAR_FTS.format(filtro_nac="")
+        consultas["huesped.buscar_nacionalidad"] = Huesped._SQL_BUSCAR_FTS.format(filtro_nac="AND h.nacionalidad = :nac")
+    for cls in (Huesped, Empleado, Habitacion, ServicioAdicional, Reserva):
+        consultas[f"{cls._TABLE}.get_many"] = (f"SELECT * FROM {cls._TABLE} WHERE {cls._PK} IN "
+                                               "(SELECT value FROM json_each(?))")
+        consultas[f"{cls._TABLE}.pagina"] = (f"SELECT * FROM {cls._TABLE} WHERE {cls._PK} > ? "
+                                             f"ORDER BY {cls._PK} LIMIT ?")
+    return consultas
+
+
+def _parametros_nulos(sql):
+    nombres = re.findall(r":(\w+)", sql)
+    return dict.fromkeys(nombres) if nombres else (None,) * sql.count("?")
+
+
+def query_plan_scans(db: Database, consultas=None):
+    """
+    [(nombre, detalle del plan)] de las consultas que recorren una tabla completa.
+    consultas: {nombre: sql}; por defecto las registradas en SQL (incluidas las de los
+    módulos ya importados, p. ej. hotel_io) más las de _consultas_calientes.
+    """
+    if consultas is None:
+        consultas = {**dict(SQL.items()), **_consultas_calientes(db)}
+    problemas = []
+    for nombre, sql in sorted(consultas.items()):
+        if sql.lstrip().upper().startswith("PRAGMA"):
+            continue
+        for fila in db.conn.execute("EXPLAIN QUERY PLAN " + sql, _parametros_nulos(sql)):
+            detalle = fila[3]
+            if detalle.startswith("SCAN ") and not any(
+                    marca in detalle for marca in ("USING", "VIRTUAL TABLE", "CONSTANT ROW")):
+                problemas.append((nombre, detalle))
+    return problemas
+
+
+# -------------------------
+# Esquema y migraciones
+# -------------------------
+# Cada migración es (descripción, sentencias, post) y se aplica una sola vez: su número
+# queda en PRAGMA user_version. Las sentencias usan IF NOT EXISTS para que las bases
+# creadas antes del versionado (user_version = 0) se puedan migrar sin error.
+# Para cambiar el esquema se agrega una migración al final; nunca se editan las anteriores.
+MIGRACIONES = [
+    ("esquema base", [
+        # Huesped
+        """
+        CREATE TABLE IF NOT EXISTS huesped (
+            id_huesped INTEGER PRIMARY KEY AUTOINCREMENT,
+            nombre TEXT NOT NULL,
+            documento TEXT,
+            fecha_nacimiento TEXT,
+            nacionalidad TEXT,
+            direccion TEXT
+        );
+        """,
+        # Empleado
+        """
+        CREATE TABLE IF NOT EXISTS empleado (
+            id_empleado INTEGER PRIMARY KEY AUTOINCREMENT,
+            nombre TEXT NOT NULL,
+            cargo TEXT,
+            area TEXT
+        );
+        """,
+        # Habitacion
+        """
+        CREATE TABLE IF NOT EXISTS habitacion (
+            id_habitacion INTEGER PRIMARY KEY AUTOINCREMENT,
+            numero INTEGER NOT NULL UNIQUE,
+            tipo TEXT,
+            precio REAL,
+            estado TEXT
+        );
+        """,
+        # Servicio adicional
+        """
+        CREATE TABLE IF NOT EXISTS servicio_adicional (
+            id_servicio INTEGER PRIMARY KEY AUTOINCREMENT,
+            nombre_servicio TEXT,
+            descripcion TEXT,
+            costo REAL
+        );
+        """,
+        # Reserva
+        """
+        CREATE TABLE IF NOT EXISTS reserva (
+            id_reserva INTEGER PRIMARY KEY AUTOINCREMENT,
+            fecha_ingreso TEXT,
+            fecha_salida TEXT,
+            estado TEXT,
+            id_huesped INTEGER,
+            id_habitacion INTEGER,
+            id_empleado INTEGER,
+            FOREIGN KEY(id_huesped) REFERENCES huesped(id_huesped),
+            FOREIGN KEY(id_habitacion) REFERENCES habitacion(id_habitacion),
+            FOREIGN KEY(id_empleado) REFERENCES empleado(id_empleado)
+        );
+        """,
+        # Tabla intermedia Reserva-Servicio (many-to-many)
+        """
+        CREATE TABLE IF NOT EXISTS reserva_servicio (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            id_reserva INTEGER,
+            id_servicio INTEGER,
+            cantidad INTEGER DEFAULT 1,
+            FOREIGN KEY(id_reserva) REFERENCES reserva(id_reserva) ON DELETE CASCADE,
+            FOREIGN KEY(id_servicio) REFERENCES servicio_adicional(id_servicio)
+        );
+        """,
+        # Factura
+        """
+        CREATE TABLE IF NOT EXISTS factura (
+            id_factura INTEGER PRIMARY KEY AUTOINCREMENT,
+            fecha_emision TEXT,
+            monto_total REAL,
+            id_reserva INTEGER,
+            FOREIGN KEY(id_reserva) REFERENCES reserva(id_reserva)
+        );
+        """
+    ], None),
+    ("índices de disponibilidad y facturación", [
+        # Índices de disponibilidad: búsqueda por habitación + fechas (ver find_available_rooms)
+        """
+        CREATE INDEX IF NOT EXISTS idx_reserva_habitacion_fechas
+            ON reserva(id_habitacion, fecha_ingreso, fecha_salida, estado);
+        """,
+        """
+        CREATE INDEX IF NOT EXISTS idx_reserva_fechas ON reserva(fecha_ingreso, fecha_salida);
+        """,
+        """
+        CREATE INDEX IF NOT EXISTS idx_reserva_salida ON reserva(fecha_salida);
+        """,
+        """
+        CREATE INDEX IF NOT EXISTS idx_habitacion_tipo ON habitacion(tipo, id_habitacion);
+        """
+    ], None),
+    ("búsqueda de huéspedes", [
+        # Búsqueda de huéspedes: documento exacto (ver _create_documento_index) y nacionalidad
+        """
+        CREATE INDEX IF NOT EXISTS idx_huesped_nacionalidad ON huesped(nacionalidad, id_huesped);
+        """
+    ], lambda db, cur: (db._create_documento_index(cur), db._create_search_index(cur))),
+    ("resumen diario de ocupación", [
+        # Resumen diario por tipo de habitación (ver rebuild_daily_summary)
+        """
+        CREATE TABLE IF NOT EXISTS ocupacion_diaria (
+            fecha TEXT NOT NULL,
+            tipo TEXT NOT NULL,
+            noches_vendidas INTEGER NOT NULL DEFAULT 0,
+            ingreso_habitacion REAL NOT NULL DEFAULT 0,
+            facturado REAL NOT NULL DEFAULT 0,
+            PRIMARY KEY (fecha, tipo)
+        ) WITHOUT ROWID;
+        """
+    ], None),
+    ("folio por reserva", [
+        # Saldo acumulado por reserva (ver Reserva.balance); montos en Decimal como texto
+        """
+        CREATE TABLE IF NOT EXISTS folio (
+            id_reserva INTEGER PRIMARY KEY REFERENCES reserva(id_reserva) ON DELETE CASCADE,
+            cargo_habitacion TEXT NOT NULL DEFAULT '0',
+            cargo_servicios TEXT NOT NULL DEFAULT '0'
+        );
+        """
+    ], lambda db, cur: hotel_folio.rebuild_folios(db)),
+    ("índices de claves foráneas", [
+        # Líneas de servicio por reserva: cubre Reserva.services, calculate_total, los totales
+        # masivos y el ON DELETE CASCADE desde reserva sin leer la tabla
+        """
+        CREATE INDEX IF NOT EXISTS idx_reserva_servicio_reserva
+            ON reserva_servicio(id_reserva, id_servicio, cantidad);
+        """,
+        # Reservas que usan un servicio (cambio de costo -> folios afectados)
+        """
+        CREATE INDEX IF NOT EXISTS idx_reserva_servicio_servicio ON reserva_servicio(id_servicio, id_reserva);
+        """,
+        """
+        CREATE INDEX IF NOT EXISTS idx_factura_reserva ON factura(id_reserva);
+        """,
+        # Chequeo de FK al borrar un huésped o empleado (id_habitacion ya está en
+        # idx_reserva_habitacion_fechas)
+        """
+        CREATE INDEX IF NOT EXISTS idx_reserva_huesped ON reserva(id_huesped);
+        """,
+        """
+        CREATE INDEX IF NOT EXISTS idx_reserva_empleado ON reserva(id_empleado);
+        """
+    ], None),
+    ("cola de cargos POS", [
+        # Último evento del journal de cada cola aplicado a la base (ver hotel_pos.ChargeQueue)
+        """
+        CREATE TABLE IF NOT EXISTS cola_cargos (
+            journal TEXT PRIMARY KEY,
+            ultimo_seq INTEGER NOT NULL
+        );
+        """
+    ], None),
+    ("tarifas por tipo de habitación", [
+        # Reglas de precio por noche (ver hotel_rates.RateTable): temporada = rango de fechas, fin de
+        # semana = dias_semana ('56' = sábado y domingo, lunes = 0); gana la de mayor prioridad
+        """
+        CREATE TABLE IF NOT EXISTS tarifa (
+            id_tarifa INTEGER PRIMARY KEY AUTOINCREMENT,
+            tipo TEXT NOT NULL,
+            desde TEXT NOT NULL,
+            hasta TEXT NOT NULL,
+            precio REAL NOT NULL,
+            dias_semana TEXT,
+            prioridad INTEGER NOT NULL DEFAULT 0
+        );
+        """,
+        # Descuento por duración: porcentaje sobre el cargo de habitación desde noches_minimas
+        """
+        CREATE TABLE IF NOT EXISTS tarifa_estadia (
+            tipo TEXT NOT NULL,
+            noches_minimas INTEGER NOT NULL,
+            descuento REAL NOT NULL,
+            PRIMARY KEY (tipo, noches_minimas)
+        ) WITHOUT ROWID;
+        """
+    ], None),
+    ("archivo de estadías", [
+        # Un archivo SQLite por año de check-out con las estadías archivadas (ver hotel_archive)
+        """
+        CREATE TABLE IF NOT EXISTS archivo (
+            anio INTEGER PRIMARY KEY,
+            ruta TEXT NOT NULL,
+            reservas INTEGER NOT NULL DEFAULT 0,
+            actualizado TEXT
+        );
+        """
+    ], None),
+    ("registro de cambios", [
+        # Cambios de los modelos en orden de commit, para consumidores externos (ver hotel_changes)
+        """
+        CREATE TABLE IF NOT EXISTS cambio (
+            seq INTEGER PRIMARY KEY AUTOINCREMENT,
+            tabla TEXT NOT NULL,
+            id INTEGER NOT NULL,
+            operacion TEXT NOT NULL,
+            datos TEXT,
+            fecha TEXT NOT NULL
+        );
+        """,
+        # Último seq procesado por cada consumidor (limita la compactación)
+        """
+        CREATE TABLE IF NOT EXISTS cambio_consumidor (
+            consumidor TEXT PRIMARY KEY,
+            seq INTEGER NOT NULL
+        );
+        """
+    ], None),
+    ("facturas por fecha de emisión", [
+        # Rangos de fecha_emision: export_facturas y find_facturas
+        """
+        CREATE INDEX IF NOT EXISTS idx_factura_emision ON factura(fecha_emision);
+        """
+    ], None),
+    ("tarifa por reserva", [
+        # Tarifa (tipo y precio) de cada reserva al guardarse, para la analítica (ver
+        # hotel_analytics). Sin clave foránea: se conserva para las estadías archivadas
+        """
+        CREATE TABLE IF NOT EXISTS tarifa_reserva (
+            id_reserva INTEGER PRIMARY KEY,
+            tipo TEXT NOT NULL,
+            precio REAL NOT NULL
+        );
+        """
+    ], lambda db, cur: (hotel_analytics.backfill_stay_rates(db), hotel_analytics.rebuild_daily_summary(db))),
+]
+
+
+def _insert_many(db: Database, insert_sql, rows):
+    """executemany de INSERTs en una transacción; devuelve los ids generados."""
+    rows = list(rows)
+    if not rows:
+        return []
+    with db.batch():
+        db.conn.executemany(insert_sql, rows)
+        # con AUTOINCREMENT y la transacción tomada, los ids son consecutivos
+        ultimo = db.conn.execute("SELECT last_insert_rowid()").fetchone()[0]
+    return list(range(ultimo - len(rows) + 1, ultimo + 1))
+
+
+def _save_many(db: Database, objs, insert_sql, update_sql):
+    """
+    Guarda muchos objetos con executemany dentro de una sola transacción.
+    Los objetos nuevos (id None) se insertan y reciben su id; el resto se actualiza.
+    Devuelve la lista de ids en el mismo orden que objs.
+    """
+    objs = list(objs)
+    nuevos = [o for o in objs if o.id is None]
+    existentes = [o for o in objs if o.id is not None]
+    with db.batch():
+        if nuevos:
+            for o, nuevo_id in zip(nuevos, _insert_many(db, insert_sql, [o._values() for o in nuevos])):
+                o.id = nuevo_id
+            hotel_changes.log_models(db, nuevos, 'insert')
+        if existentes:
+            db.conn.executemany(update_sql, [o._values() + (o.id,) for o in existentes])
+            hotel_changes.log_models(db, existentes, 'update')
+        _invalidate_catalog(db, objs)
+    return [o.id for o in objs]
+
+
+def _invalidate_catalog(db: Database, objs):
+    # solo los modelos de catálogo (con _CACHE_TABLE) están en db.catalog; se invalida ya
+    # (lecturas dentro de la misma transacción) y de nuevo al terminarla (lo que otro hilo
+    # haya cargado mientras tanto, o el valor sin confirmar si hubo rollback)
+    for o in objs:
+        tabla = getattr(o, '_CACHE_TABLE', None)
+        if tabla is not None:
+            db.catalog.invalidate((tabla, o.id))
+            db.on_commit(partial(db.catalog.invalidate, (tabla, o.id)))
+
+
+# -------------------------
+# Listados paginados (keyset)
+# -------------------------
+_COLUMNAS = {}
+
+
+def _columnas(db: Database, tabla):
+    columnas = _COLUMNAS.get(tabla)
+    if not columnas:
+        columnas = {r['name'] for r in db.conn.execute(f"PRAGMA table_info({tabla})")}
+        if columnas:
+            _COLUMNAS[tabla] = columnas
+    return columnas
+
+
+def _keyset(col, pk, valor, ultimo_id, descending):
+    # SQLite ordena los NULL primero en ASC y últimos en DESC
+    if descending:
+        if valor is None:
+            return f"({col} IS NULL AND {pk} < ?)", [ultimo_id]
+        return f"({col} < ? OR ({col} = ? AND {pk} < ?) OR {col} IS NULL)", [valor, valor, ultimo_id]
+    if valor is None:
+        return f"(({col} IS NULL AND {pk} > ?) OR {col} IS NOT NULL)", [ultimo_id]
+    return f"({col} > ? OR ({col} = ? AND {pk} > ?))", [valor, valor, ultimo_id]
+
+
+def iter_table(db: Database, tabla, pk, after_id=None, page_size=500, order_by=None, descending=False, filtros=None,
+               cls=None):
+    """
+    Recorre una tabla por páginas con keyset pagination (WHERE clave > última clave),
+    sin OFFSET ni fetchall: la memoria usada es la de una página.
+    filtros: {columna: valor} por igualdad. order_by: columna de orden (desempate por pk).
+    after_id: id desde donde seguir; si hay order_by, una tupla (valor, id).
+    Devuelve sqlite3.Row, o instancias de cls (modelo) si se indica.
+    """
+    columnas = _columnas(db, tabla)
+    filtros = filtros or {}
+    for col in list(filtros) + ([order_by] if order_by else []):
+        if col not in columnas:
+            raise ValueError(f"Columna desconocida en {tabla}: {col}")
+    col = order_by or pk
+    direccion = "DESC" if descending else "ASC"
+    where = [f"{c} IS ?" for c in filtros]
+    base_params = list(filtros.values())
+    orden = f"{col} {direccion}, {pk} {direccion}" if order_by else f"{pk} {direccion}"
+    ultimo = after_id
+    while True:
+        condiciones = list(where)
+        params = list(base_params)
+        if ultimo is not None:
+            if order_by:
+                cond, extra = _keyset(col, pk, ultimo[0], ultimo[1], descending)
+            else:
+                cond, extra = f"{pk} {'<' if descending else '>'} ?", [ultimo]
+            condiciones.append(cond)
+            params += extra
+        sql = f"SELECT * FROM {tabla}"
+        if condiciones:
+            sql += " WHERE " + " AND ".join(condiciones)
+        sql += f" ORDER BY {orden} LIMIT ?"
+        if cls is None:
+            rows = db.conn.execute(sql, params + [page_size]).fetchall()
+        else:
+            rows = list(_query_models(db, cls, sql, params + [page_size]))
+        yield from rows
+        if len(rows) < page_size:
+            return
+        if cls is None:
+            ultimo = (rows[-1][col], rows[-1][pk]) if order_by else rows[-1][pk]
+        else:
+            ultimo = (getattr(rows[-1], col), rows[-1].id) if order_by else rows[-1].id
+
+
+# -------------------------
+# Mapeo fila -> modelo
+# -------------------------
+# Los modelos usan __slots__; para cada (clase, columnas del cursor) se genera una
+# vez una función que crea la instancia sin pasar por __init__ y asigna cada slot
+# desde la tupla de la fila (como hace collections.namedtuple).
+_MAPPERS = {}
+
+
+def _build_mapper(cls, columnas):
+    indices = {('id' if c == cls._PK else c): i for i, c in enumerate(columnas)}
+    lineas = [f"    o.{attr} = row[{indices[attr]}]" if attr in indices else f"    o.{attr} = None"
+              for attr in cls.__slots__]
+    src = "def mapper(row):\n    o = new(cls)\n" + "\n".join(lineas) + "\n    return o\n"
+    ns = {"new": object.__new__, "cls": cls}
+    exec(src, ns)
+    return ns["mapper"]
+
+
+def _mapper(cls, columnas):
+    fn = _MAPPERS.get((cls, columnas))
+    if fn is None:
+        fn = _MAPPERS[(cls, columnas)] = _build_mapper(cls, columnas)
+    return fn
+
+
+def _query_models(db: Database, cls, sql, params=()):
+    """Ejecuta sql y devuelve un iterador de instancias de cls construidas desde tuplas."""
+    cur = db.conn.cursor()
+    cur.row_factory = None
+    cur.execute(sql, params)
+    return map(_mapper(cls, tuple(d[0] for d in cur.description)), cur)
+
+
+def _get_many(db: Database, cls, ids):
+    """Carga varios modelos en una consulta; lista alineada con ids (None si no existe)."""
+    ids = list(ids)
+    sql = f"SELECT * FROM {cls._TABLE} WHERE {cls._PK} IN (SELECT value FROM json_each(?))"
+    por_id = {o.id: o for o in _query_models(db, cls, sql, (json.dumps(ids),))}
+    return [por_id.get(i) for i in ids]
+
+
+def model_to_dict(obj):
+    return {attr: getattr(obj, attr) for attr in obj.__slots__}
 
 
 # -------------------------
 # Modelos OOP (mínimos CRUD)
 # -------------------------
+class ConflictError(ValueError):
+    """El dato es válido pero choca con lo ya guardado (reserva solapada, documento repetido)."""
+
+
 class Huesped:
+    __slots__ = ('id', 'nombre', 'documento', 'fecha_nacimiento', 'nacionalidad', 'direccion')
+    _TABLE = 'huesped'
+    _PK = 'id_huesped'
+    _SQL_INSERT = SQL.add("huesped.insert", "INSERT INTO huesped (nombre, documento, fecha_nacimiento, nacionalidad, direccion) VALUES (?,?,?,?,?)")
+    _SQL_UPDATE = SQL.add("huesped.update", "UPDATE huesped SET nombre=?, documento=?, fecha_nacimiento=?, nacionalidad=?, direccion=? WHERE id_huesped=?")
+    _SQL_GET = SQL.add("huesped.get", "SELECT * FROM huesped WHERE id_huesped = ?")
+    _SQL_GET_DOCUMENTO = SQL.add("huesped.get_documento",
+                                 "SELECT * FROM huesped WHERE documento = ? AND documento <> ''")
+    _SQL_BUSCAR_FTS = """
+        SELECT h.* FROM huesped_fts f JOIN huesped h ON h.id_huesped = f.rowid
+        WHERE huesped_fts MATCH :match AND h.id_huesped IS NOT :excluir {filtro_nac}
+        ORDER BY f.rank LIMIT :limit
+    """
+
     def __init__(self, nombre, documento=None, fecha_nacimiento=None, nacionalidad=None, direccion=None, id_huesped=None):
         self.id = id_huesped
         self.nombre = nombre
@@ -120,68 +1055,159 @@ class Huesped:
         self.nacionalidad = nacionalidad
         self.direccion = direccion
 
+    def _values(self):
+        return (self.nombre, self.documento, self.fecha_nacimiento, self.nacionalidad, self.direccion)
+
     def save(self, db: Database):
-        if self.id is None:
-            cur = db.conn.execute(
-                "INSERT INTO huesped (nombre, documento, fecha_nacimiento, nacionalidad, direccion) VALUES (?,?,?,?,?)",
-                (self.nombre, self.documento, self.fecha_nacimiento, self.nacionalidad, self.direccion)
-            )
-            db.conn.commit()
-            self.id = cur.lastrowid
-        else:
-            db.conn.execute(
-                "UPDATE huesped SET nombre=?, documento=?, fecha_nacimiento=?, nacionalidad=?, direccion=? WHERE id_huesped=?",
-                (self.nombre, self.documento, self.fecha_nacimiento, self.nacionalidad, self.direccion, self.id)
-            )
-            db.conn.commit()
+        try:
+            with db.batch():
+                if self.id is None:
+                    cur = db.conn.execute(self._SQL_INSERT, self._values())
+                    self.id = cur.lastrowid
+                    hotel_changes.log_models(db, [self], 'insert')
+                else:
+                    db.conn.execute(self._SQL_UPDATE, self._values() + (self.id,))
+                    hotel_changes.log_models(db, [self], 'update')
+        except sqlite3.IntegrityError as e:
+            # solo el índice único de documento se traduce; NOT NULL y demás se propagan
+            if "huesped.documento" not in str(e):
+                raise
+            raise ConflictError(f"Ya existe un huésped con documento {self.documento}") from e
         return self.id
 
+    @classmethod
+    def save_many(cls, db: Database, objs):
+        return _save_many(db, objs, cls._SQL_INSERT, cls._SQL_UPDATE)
+
+    @staticmethod
+    def get_by_documento(db: Database, documento):
+        if not documento:
+            return None
+        # la condición documento <> '' permite usar el índice parcial idx_huesped_documento
+        row = db.fetchone(Huesped._SQL_GET_DOCUMENTO, (documento,))
+        return Huesped._from_row(row) if row else None
+
+    @staticmethod
+    def search(db: Database, query, limit=20, nacionalidad=None):
+        """
+        Busca huéspedes por documento exacto o por prefijos de nombre/dirección
+        ('carl vasq' encuentra 'Carlos Vásquez'). Sin distinguir tildes ni mayúsculas.
+        Primero el match exacto de documento, luego por relevancia.
+        """
+        resultados = []
+        exacto = Huesped.get_by_documento(db, query.strip())
+        if exacto and (nacionalidad is None or exacto.nacionalidad == nacionalidad):
+            resultados.append(exacto)
+        palabras = query.split()
+        if not palabras or len(resultados) >= limit:
+            return resultados[:limit]
+        excluir = exacto.id if exacto else None
+        filtro_nac = "AND h.nacionalidad = :nac" if nacionalidad is not None else ""
+        params = {"excluir": excluir, "nac": nacionalidad, "limit": limit - len(resultados)}
+        if db.has_fts:
+            # cada palabra como prefijo entre comillas (evita que se interprete como sintaxis FTS)
+            params["match"] = " ".join('"' + p.replace('"', '""') + '"*' for p in palabras)
+            q = Huesped._SQL_BUSCAR_FTS.format(filtro_nac=filtro_nac)
+        else:
+            condiciones = []
+            for i, p in enumerate(palabras):
+                params[f"p{i}"] = f"%{p}%"
+                condiciones.append(f"(h.nombre LIKE :p{i} OR h.direccion LIKE :p{i})")
+            q = f"""
+                SELECT h.* FROM huesped h
+                WHERE {" AND ".join(condiciones)} AND h.id_huesped IS NOT :excluir {filtro_nac}
+                ORDER BY h.id_huesped LIMIT :limit
+            """
+        resultados.extend(_query_models(db, Huesped, q, params))
+        return resultados
+
+    @classmethod
+    def _from_row(cls, row):
+        return _mapper(cls, tuple(row.keys()))(row)
+
+    @classmethod
+    def get_many(cls, db: Database, ids):
+        return _get_many(db, cls, ids)
+
+    @classmethod
+    def iter_all(cls, db: Database, after_id=None, page_size=500, order_by=None, descending=False, **filtros):
+        return iter_table(db, cls._TABLE, cls._PK, after_id, page_size, order_by, descending, filtros, cls)
+
     @staticmethod
     def get(db: Database, id_huesped):
-        row = db.conn.execute("SELECT * FROM huesped WHERE id_huesped = ?", (id_huesped,)).fetchone()
+        row = db.fetchone(Huesped._SQL_GET, (id_huesped,))
         if not row:
             return None
-        return Huesped(row['nombre'], row['documento'], row['fecha_nacimiento'], row['nacionalidad'], row['direccion'], row['id_huesped'])
+        return Huesped._from_row(row)
 
     def __repr__(self):
         return f"<Huesped id={self.id} nombre={self.nombre}>"
 
 
 class Empleado:
+    __slots__ = ('id', 'nombre', 'cargo', 'area')
+    _TABLE = 'empleado'
+    _PK = 'id_empleado'
+    _SQL_INSERT = SQL.add("empleado.insert", "INSERT INTO empleado (nombre, cargo, area) VALUES (?,?,?)")
+    _SQL_UPDATE = SQL.add("empleado.update", "UPDATE empleado SET nombre=?, cargo=?, area=? WHERE id_empleado=?")
+    _SQL_GET = SQL.add("empleado.get", "SELECT * FROM empleado WHERE id_empleado = ?")
+
     def __init__(self, nombre, cargo=None, area=None, id_empleado=None):
         self.id = id_empleado
         self.nombre = nombre
         self.cargo = cargo
         self.area = area
 
+    def _values(self):
+        return (self.nombre, self.cargo, self.area)
+
     def save(self, db: Database):
-        if self.id is None:
-            cur = db.conn.execute(
-                "INSERT INTO empleado (nombre, cargo, area) VALUES (?,?,?)",
-                (self.nombre, self.cargo, self.area)
-            )
-            db.conn.commit()
-            self.id = cur.lastrowid
-        else:
-            db.conn.execute(
-                "UPDATE empleado SET nombre=?, cargo=?, area=? WHERE id_empleado=?",
-                (self.nombre, self.cargo, self.area, self.id)
-            )
-            db.conn.commit()
+        with db.batch():
+            if self.id is None:
+                cur = db.conn.execute(self._SQL_INSERT, self._values())
+                self.id = cur.lastrowid
+                hotel_changes.log_models(db, [self], 'insert')
+            else:
+                db.conn.execute(self._SQL_UPDATE, self._values() + (self.id,))
+                hotel_changes.log_models(db, [self], 'update')
         return self.id
 
+    @classmethod
+    def save_many(cls, db: Database, objs):
+        return _save_many(db, objs, cls._SQL_INSERT, cls._SQL_UPDATE)
+
+    @classmethod
+    def _from_row(cls, row):
+        return _mapper(cls, tuple(row.keys()))(row)
+
+    @classmethod
+    def get_many(cls, db: Database, ids):
+        return _get_many(db, cls, ids)
+
+    @classmethod
+    def iter_all(cls, db: Database, after_id=None, page_size=500, order_by=None, descending=False, **filtros):
+        return iter_table(db, cls._TABLE, cls._PK, after_id, page_size, order_by, descending, filtros, cls)
+
     @staticmethod
     def get(db: Database, id_empleado):
-        row = db.conn.execute("SELECT * FROM empleado WHERE id_empleado = ?", (id_empleado,)).fetchone()
+        row = db.fetchone(Empleado._SQL_GET, (id_empleado,))
         if not row:
             return None
-        return Empleado(row['nombre'], row['cargo'], row['area'], row['id_empleado'])
+        return Empleado._from_row(row)
 
     def __repr__(self):
         return f"<Empleado id={self.id} nombre={self.nombre}>"
 
 
 class Habitacion:
+    __slots__ = ('id', 'numero', 'tipo', 'precio', 'estado')
+    _TABLE = 'habitacion'
+    _PK = 'id_habitacion'
+    _CACHE_TABLE = 'habitacion'
+    _SQL_INSERT = SQL.add("habitacion.insert", "INSERT INTO habitacion (numero, tipo, precio, estado) VALUES (?,?,?,?)")
+    _SQL_UPDATE = SQL.add("habitacion.update", "UPDATE habitacion SET numero=?, tipo=?, precio=?, estado=? WHERE id_habitacion=?")
+    _SQL_GET = SQL.add("habitacion.get", "SELECT * FROM habitacion WHERE id_habitacion = ?")
+
     def __init__(self, numero, tipo=None, precio=0.0, estado='disponible', id_habitacion=None):
         self.id = id_habitacion
         self.numero = numero
@@ -189,68 +1215,201 @@ class Habitacion:
         self.precio = float(precio)
         self.estado = estado
 
+    def _values(self):
+        return (self.numero, self.tipo, self.precio, self.estado)
+
     def save(self, db: Database):
-        if self.id is None:
-            cur = db.conn.execute(
-                "INSERT INTO habitacion (numero, tipo, precio, estado) VALUES (?,?,?,?)",
-                (self.numero, self.tipo, self.precio, self.estado)
-            )
-            db.conn.commit()
-            self.id = cur.lastrowid
-        else:
-            db.conn.execute(
-                "UPDATE habitacion SET numero=?, tipo=?, precio=?, estado=? WHERE id_habitacion=?",
-                (self.numero, self.tipo, self.precio, self.estado, self.id)
-            )
-            db.conn.commit()
+        with db.batch():
+            if self.id is None:
+                cur = db.conn.execute(self._SQL_INSERT, self._values())
+                self.id = cur.lastrowid
+                hotel_changes.log_models(db, [self], 'insert')
+            else:
+                anteriores = _tipo_precio(db, [self.id])
+                db.conn.execute(self._SQL_UPDATE, self._values() + (self.id,))
+                hotel_changes.log_models(db, [self], 'update')
+                hotel_folio.refresh_catalog(db, self._TABLE, [self.id])
+                hotel_analytics.refresh_rooms(db, anteriores)
+            _invalidate_catalog(db, [self])
+            hotel_inventory.sync_rooms(db, [self])
+            hotel_rates.invalidate(db)
         return self.id
 
+    @classmethod
+    def save_many(cls, db: Database, objs):
+        objs = list(objs)
+        existentes = [o.id for o in objs if o.id is not None]
+        with db.batch():
+            anteriores = _tipo_precio(db, existentes) if existentes else {}
+            ids = _save_many(db, objs, cls._SQL_INSERT, cls._SQL_UPDATE)
+            hotel_folio.refresh_catalog(db, cls._TABLE, existentes)
+            hotel_analytics.refresh_rooms(db, anteriores)
+            hotel_inventory.sync_rooms(db, objs)
+            hotel_rates.invalidate(db)
+        return ids
+
+    @classmethod
+    def _from_row(cls, row):
+        return _mapper(cls, tuple(row.keys()))(row)
+
+    @classmethod
+    def get_many(cls, db: Database, ids):
+        return _get_many(db, cls, ids)
+
+    @classmethod
+    def iter_all(cls, db: Database, after_id=None, page_size=500, order_by=None, descending=False, **filtros):
+        return iter_table(db, cls._TABLE, cls._PK, after_id, page_size, order_by, descending, filtros, cls)
+
     @staticmethod
     def get(db: Database, id_habitacion):
-        row = db.conn.execute("SELECT * FROM habitacion WHERE id_habitacion = ?", (id_habitacion,)).fetchone()
+        # lectura a través del caché del catálogo (ver CatalogCache)
+        row = db.catalog.get(('habitacion', id_habitacion), lambda: db.fetchone(Habitacion._SQL_GET, (id_habitacion,)))
         if not row:
             return None
-        return Habitacion(row['numero'], row['tipo'], row['precio'], row['estado'], row['id_habitacion'])
+        return Habitacion._from_row(row)
 
     def __repr__(self):
         return f"<Habitacion id={self.id} numero={self.numero} precio={self.precio}>"
 
 
+SQL.add("habitacion.tipo_precio",
+        "SELECT id_habitacion, tipo, precio FROM habitacion WHERE id_habitacion IN (SELECT value FROM json_each(?))")
+
+
+def _tipo_precio(db: Database, ids):
+    # de la base y no del caché: dentro de batch() se ve lo ya escrito en la transacción
+    return {r[0]: (r[1] or '', r[2] or 0.0)
+            for r in db.fetchall(SQL["habitacion.tipo_precio"], (json.dumps(list(set(ids))),))}
+
+
 class ServicioAdicional:
+    __slots__ = ('id', 'nombre_servicio', 'descripcion', 'costo')
+    _TABLE = 'servicio_adicional'
+    _PK = 'id_servicio'
+    _CACHE_TABLE = 'servicio_adicional'
+    _SQL_INSERT = SQL.add("servicio_adicional.insert", "INSERT INTO servicio_adicional (nombre_servicio, descripcion, costo) VALUES (?,?,?)")
+    _SQL_UPDATE = SQL.add("servicio_adicional.update", "UPDATE servicio_adicional SET nombre_servicio=?, descripcion=?, costo=? WHERE id_servicio=?")
+    _SQL_GET = SQL.add("servicio_adicional.get", "SELECT * FROM servicio_adicional WHERE id_servicio = ?")
+
     def __init__(self, nombre_servicio, descripcion=None, costo=0.0, id_servicio=None):
         self.id = id_servicio
         self.nombre_servicio = nombre_servicio
         self.descripcion = descripcion
         self.costo = float(costo)
 
+    def _values(self):
+        return (self.nombre_servicio, self.descripcion, self.costo)
+
     def save(self, db: Database):
-        if self.id is None:
-            cur = db.conn.execute(
-                "INSERT INTO servicio_adicional (nombre_servicio, descripcion, costo) VALUES (?,?,?)",
-                (self.nombre_servicio, self.descripcion, self.costo)
-            )
-            db.conn.commit()
-            self.id = cur.lastrowid
-        else:
-            db.conn.execute(
-                "UPDATE servicio_adicional SET nombre_servicio=?, descripcion=?, costo=? WHERE id_servicio=?",
-                (self.nombre_servicio, self.descripcion, self.costo, self.id)
-            )
-            db.conn.commit()
+        with db.batch():
+            if self.id is None:
+                cur = db.conn.execute(self._SQL_INSERT, self._values())
+                self.id = cur.lastrowid
+                hotel_changes.log_models(db, [self], 'insert')
+            else:
+                db.conn.execute(self._SQL_UPDATE, self._values() + (self.id,))
+                hotel_changes.log_models(db, [self], 'update')
+                hotel_folio.refresh_catalog(db, self._TABLE, [self.id])
+            _invalidate_catalog(db, [self])
         return self.id
 
+    @classmethod
+    def save_many(cls, db: Database, objs):
+        objs = list(objs)
+        existentes = [o.id for o in objs if o.id is not None]
+        with db.batch():
+            ids = _save_many(db, objs, cls._SQL_INSERT, cls._SQL_UPDATE)
+            hotel_folio.refresh_catalog(db, cls._TABLE, existentes)
+        return ids
+
+    @classmethod
+    def _from_row(cls, row):
+        return _mapper(cls, tuple(row.keys()))(row)
+
+    @classmethod
+    def get_many(cls, db: Database, ids):
+        return _get_many(db, cls, ids)
+
+    @classmethod
+    def iter_all(cls, db: Database, after_id=None, page_size=500, order_by=None, descending=False, **filtros):
+        return iter_table(db, cls._TABLE, cls._PK, after_id, page_size, order_by, descending, filtros, cls)
+
     @staticmethod
     def get(db: Database, id_servicio):
-        row = db.conn.execute("SELECT * FROM servicio_adicional WHERE id_servicio = ?", (id_servicio,)).fetchone()
+        # lectura a través del caché del catálogo (ver CatalogCache)
+        row = db.catalog.get(('servicio_adicional', id_servicio), lambda: db.fetchone(ServicioAdicional._SQL_GET, (id_servicio,)))
         if not row:
             return None
-        return ServicioAdicional(row['nombre_servicio'], row['descripcion'], row['costo'], row['id_servicio'])
+        return ServicioAdicional._from_row(row)
 
     def __repr__(self):
         return f"<Servicio id={self.id} nombre={self.nombre_servicio} costo={self.costo}>"
 
 
+SQL.add("factura.insert", "INSERT INTO factura (fecha_emision, monto_total, id_reserva) VALUES (?,?,?)")
+
+
+def _nights(fecha_ingreso, fecha_salida):
+    d1 = datetime.fromisoformat(fecha_ingreso).date()
+    d2 = datetime.fromisoformat(fecha_salida).date()
+    ndays = (d2 - d1).days
+    return max(0, ndays)
+
+
+def _total_estadia(db: Database, precio, tipo, fecha_ingreso, fecha_salida, cargos, usar_tarifas=False):
+    """Habitación por noche + cargos [(costo, cantidad)], en Decimal; cantidad 0 o NULL cuenta como 1."""
+    if usar_tarifas:
+        total = hotel_rates.rate_table(db).stay_price(tipo, fecha_ingreso, fecha_salida, precio)
+    else:
+        noches = Decimal(str(_nights(_fecha_iso(fecha_ingreso), _fecha_iso(fecha_salida))))
+        total = Decimal(str(precio or 0.0)) * noches
+    for costo, cantidad in cargos:
+        total += Decimal(str(costo or 0.0)) * Decimal(str(cantidad or 1))
+    return float(total)  # devolvemos float para insertar en BD; para mostrar usar Decimal si quieres
+
+
+def price_quote(db: Database, id_habitacion, fecha_ingreso, fecha_salida, servicios=(), usar_tarifas=False):
+    """
+    Cotiza una estadía: precio de la habitación por noche + servicios [(id_servicio, cantidad)].
+    Usa solo el caché del catálogo, así que con el caché caliente no hace consultas SQL;
+    un cambio de precio hecho por otro proceso puede tardar hasta el TTL del caché en verse.
+    Lo que se cobra (calculate_total, facturas, folio) lee los precios de la base.
+    Con usar_tarifas=True las noches se cobran según las tarifas del tipo (ver hotel_rates.RateTable);
+    folio y facturas siguen usando el precio plano de la habitación.
+    """
+    hab = Habitacion.get(db, id_habitacion)
+    if hab is None:
+        raise ValueError("Habitación no encontrada")
+    cargos = []
+    for id_servicio, cantidad in servicios:
+        servicio = ServicioAdicional.get(db, id_servicio)
+        if servicio is not None:
+            cargos.append((servicio.costo, cantidad))
+    return _total_estadia(db, hab.precio, hab.tipo, fecha_ingreso, fecha_salida, cargos, usar_tarifas)
+
+
 class Reserva:
+    __slots__ = ('id', 'fecha_ingreso', 'fecha_salida', 'estado', 'id_huesped', 'id_habitacion', 'id_empleado')
+    _TABLE = 'reserva'
+    _PK = 'id_reserva'
+    _SQL_INSERT = SQL.add("reserva.insert", "INSERT INTO reserva (fecha_ingreso, fecha_salida, estado, id_huesped, id_habitacion, id_empleado) VALUES (?,?,?,?,?,?)")
+    _SQL_UPDATE = SQL.add("reserva.update", "UPDATE reserva SET fecha_ingreso=?, fecha_salida=?, estado=?, id_huesped=?, id_habitacion=?, id_empleado=? WHERE id_reserva=?")
+    _SQL_GET = SQL.add("reserva.get", "SELECT * FROM reserva WHERE id_reserva = ?")
+    _SQL_ADD_SERVICE = SQL.add("reserva_servicio.insert",
+                               "INSERT INTO reserva_servicio (id_reserva, id_servicio, cantidad) VALUES (?,?,?)")
+    _SQL_SERVICES = SQL.add("reserva.services", """
+        SELECT rs.cantidad, s.id_servicio, s.nombre_servicio, s.descripcion, s.costo
+        FROM reserva_servicio rs
+        JOIN servicio_adicional s ON rs.id_servicio = s.id_servicio
+        WHERE rs.id_reserva = ?
+    """)
+    _SQL_CARGOS = SQL.add("reserva.cargos_servicio", """
+        SELECT s.costo, rs.cantidad
+        FROM reserva_servicio rs
+        JOIN servicio_adicional s ON s.id_servicio = rs.id_servicio
+        WHERE rs.id_reserva = ?
+    """)
+
     def __init__(self, fecha_ingreso, fecha_salida, estado, id_huesped, id_habitacion, id_empleado=None, id_reserva=None):
         self.id = id_reserva
         # aceptar date o string 'YYYY-MM-DD' -> normalizamos a 'YYYY-MM-DD'
@@ -261,97 +1420,450 @@ class Reserva:
         self.id_habitacion = id_habitacion
         self.id_empleado = id_empleado
 
+    def _values(self):
+        return (self.fecha_ingreso, self.fecha_salida, self.estado, self.id_huesped, self.id_habitacion, self.id_empleado)
+
+    def _check_dates(self):
+        for valor in (self.fecha_ingreso, self.fecha_salida):
+            try:
+                valida = date.fromisoformat(valor).isoformat() == valor
+            except (TypeError, ValueError):
+                valida = False
+            if not valida:
+                raise ValueError(f"Fecha inválida: {valor!r} (formato YYYY-MM-DD)")
+        if self.fecha_salida <= self.fecha_ingreso:
+            raise ValueError(f"La fecha de salida ({self.fecha_salida}) debe ser posterior a la de ingreso "
+                             f"({self.fecha_ingreso})")
+
+    def _check_available(self, db: Database):
+        self._check_dates()
+        if self.estado == ESTADO_CANCELADA:
+            return
+        if not is_room_available(db, self.id_habitacion, self.fecha_ingreso, self.fecha_salida, excluir_reserva=self.id):
+            raise ConflictError(f"Habitación {self.id_habitacion} no disponible entre {self.fecha_ingreso} y {self.fecha_salida}")
+
     def save(self, db: Database):
-        if self.id is None:
-            cur = db.conn.execute(
-                "INSERT INTO reserva (fecha_ingreso, fecha_salida, estado, id_huesped, id_habitacion, id_empleado) VALUES (?,?,?,?,?,?)",
-                (self.fecha_ingreso, self.fecha_salida, self.estado, self.id_huesped, self.id_habitacion, self.id_empleado)
-            )
-            db.conn.commit()
-            self.id = cur.lastrowid
-        else:
-            db.conn.execute(
-                "UPDATE reserva SET fecha_ingreso=?, fecha_salida=?, estado=?, id_huesped=?, id_habitacion=?, id_empleado=? WHERE id_reserva=?",
-                (self.fecha_ingreso, self.fecha_salida, self.estado, self.id_huesped, self.id_habitacion, self.id_empleado, self.id)
-            )
-            db.conn.commit()
+        # verificación de disponibilidad y escritura en la misma transacción
+        with db.batch():
+            db.begin_immediate()
+            self._check_available(db)
+            anterior = Reserva.get(db, self.id) if self.id is not None else None
+            if self.id is None:
+                cur = db.conn.execute(self._SQL_INSERT, self._values())
+                self.id = cur.lastrowid
+                hotel_changes.log_models(db, [self], 'insert')
+            else:
+                db.conn.execute(self._SQL_UPDATE, self._values() + (self.id,))
+                hotel_changes.log_models(db, [self], 'update')
+            hotel_analytics.update_daily_summary(db, quitar=[anterior] if anterior else [], agregar=[self])
+            hotel_folio.update_room_charges(db, [self])
+            hotel_inventory.sync_stays(db, quitar=[anterior] if anterior else [], agregar=[self])
         return self.id
 
+    @classmethod
+    def save_many(cls, db: Database, objs):
+        objs = list(objs)
+        with db.batch():
+            db.begin_immediate()
+            # cada reserva se valida contra la BD y contra las anteriores del mismo lote
+            por_habitacion = {}
+            for o in objs:
+                o._check_available(db)
+                if o.estado == ESTADO_CANCELADA:
+                    continue
+                for ingreso, salida in por_habitacion.get(o.id_habitacion, ()):
+                    if ingreso < o.fecha_salida and o.fecha_ingreso < salida:
+                        raise ConflictError(f"Reservas solapadas en el lote para la habitación {o.id_habitacion}")
+                por_habitacion.setdefault(o.id_habitacion, []).append((o.fecha_ingreso, o.fecha_salida))
+            anteriores = [a for a in Reserva.get_many(db, [o.id for o in objs if o.id is not None]) if a]
+            ids = _save_many(db, objs, cls._SQL_INSERT, cls._SQL_UPDATE)
+            hotel_analytics.update_daily_summary(db, quitar=anteriores, agregar=objs)
+            hotel_folio.update_room_charges(db, objs)
+            hotel_inventory.sync_stays(db, quitar=anteriores, agregar=objs)
+            return ids
+
     def add_service(self, db: Database, id_servicio, cantidad=1):
         if self.id is None:
             raise ValueError("Guarda la reserva antes de asignar servicios.")
-        db.conn.execute(
-            "INSERT INTO reserva_servicio (id_reserva, id_servicio, cantidad) VALUES (?,?,?)",
-            (self.id, id_servicio, cantidad)
-        )
-        db.conn.commit()
-
-    def services(self, db: Database):
-        q = """
-        SELECT rs.cantidad, s.id_servicio, s.nombre_servicio, s.descripcion, s.costo
-        FROM reserva_servicio rs
-        JOIN servicio_adicional s ON rs.id_servicio = s.id_servicio
-        WHERE rs.id_reserva = ?
-        """
-        rows = db.conn.execute(q, (self.id,)).fetchall()
-        return [dict(row) for row in rows]
+        with db.batch():
+            db.conn.execute(self._SQL_ADD_SERVICE, (self.id, id_servicio, cantidad))
+            hotel_folio.add_charges(db, [(self.id, id_servicio, cantidad)])
+            hotel_changes.log_services(db, [(self.id, id_servicio, cantidad)])
+
+    def services(self, db: Database, archivo=False):
+        filas = db.fetchall(self._SQL_SERVICES, (self.id,))
+        if not filas and archivo:
+            filas = hotel_archive.query_partitions(db, """
+                SELECT rs.cantidad, s.id_servicio, s.nombre_servicio, s.descripcion, s.costo
+                FROM {e}.reserva_servicio rs
+                JOIN main.servicio_adicional s ON rs.id_servicio = s.id_servicio
+                WHERE rs.id_reserva = ?
+            """, (self.id,), solo_archivo=True, primero=True)
+        return [dict(row) for row in filas]
 
     def nights(self):
-        d1 = datetime.fromisoformat(self.fecha_ingreso).date()
-        d2 = datetime.fromisoformat(self.fecha_salida).date()
-        ndays = (d2 - d1).days
-        return max(0, ndays)
-
-    def calculate_total(self, db: Database):
-        # precio habitación
-        row = db.conn.execute("SELECT precio FROM habitacion WHERE id_habitacion = ?", (self.id_habitacion,)).fetchone()
-        if not row:
+        return _nights(self.fecha_ingreso, self.fecha_salida)
+
+    def balance(self, db: Database):
+        """
+        Cargos acumulados de la reserva (igual a calculate_total) leídos del folio: una fila por clave.
+        Como calculate_total, no sirve para reservas archivadas.
+        """
+        row = db.fetchone(SQL["folio.get"], (self.id,))
+        if row is None:
+            return self.calculate_total(db)
+        return float(Decimal(row[0]) + Decimal(row[1]))
+
+    def calculate_total(self, db: Database, usar_tarifas=False):
+        # lo que se cobra lee precio y costos de la base (dentro de batch(), con lo ya escrito
+        # en la transacción), no del caché del catálogo
+        hab = db.fetchone(Habitacion._SQL_GET, (self.id_habitacion,))
+        if hab is None:
             raise ValueError("Habitación no encontrada")
-        precio = Decimal(str(row['precio'] or 0.0))
-        noches = Decimal(str(self.nights()))
-        total_habitacion = precio * noches
-
-        # servicios
-        servicio_rows = db.conn.execute("""
-            SELECT s.costo, rs.cantidad
-            FROM reserva_servicio rs
-            JOIN servicio_adicional s ON rs.id_servicio = s.id_servicio
-            WHERE rs.id_reserva = ?
-        """, (self.id,)).fetchall()
-
-        total_servicios = Decimal('0.0')
-        for r in servicio_rows:
-            costo = Decimal(str(r['costo'] or 0.0))
-            cantidad = Decimal(str(r['cantidad'] or 1))
-            total_servicios += costo * cantidad
-
-        total = total_habitacion + total_servicios
-        return float(total)  # devolvemos float para insertar en BD; para mostrar usar Decimal si quieres
+        cargos = [(r['costo'], r['cantidad']) for r in db.fetchall(self._SQL_CARGOS, (self.id,))]
+        if not cargos and self.id is not None and db.fetchone(self._SQL_GET, (self.id,)) is None:
+            # archivada: sus servicios ya no están en la base, el total sería solo el de la habitación
+            raise ValueError(f"Reserva {self.id} archivada: su total está en hotel_archive.find_facturas(archivo=True)")
+        return _total_estadia(db, hab['precio'], hab['tipo'], self.fecha_ingreso, self.fecha_salida, cargos,
+                              usar_tarifas)
 
     def generate_invoice(self, db: Database):
         if self.id is None:
             raise ValueError("Reserva no registrada")
-        monto = self.calculate_total(db)
-        fecha_emision = date.today().isoformat()
-        cur = db.conn.execute(
-            "INSERT INTO factura (fecha_emision, monto_total, id_reserva) VALUES (?,?,?)",
-            (fecha_emision, monto, self.id)
-        )
-        db.conn.commit()
+        with db.batch():
+            monto = self.calculate_total(db)
+            fecha_emision = date.today().isoformat()
+            cur = db.conn.execute(SQL["factura.insert"], (fecha_emision, monto, self.id))
+            hotel_analytics.update_daily_summary(db, facturas=[(fecha_emision, self.id, self.id_habitacion, monto)])
+            hotel_changes.log_invoices(db, [(cur.lastrowid, fecha_emision, monto, self.id)])
         return cur.lastrowid
 
+    @classmethod
+    def _from_row(cls, row):
+        return _mapper(cls, tuple(row.keys()))(row)
+
+    @classmethod
+    def get_many(cls, db: Database, ids):
+        return _get_many(db, cls, ids)
+
+    @classmethod
+    def iter_all(cls, db: Database, after_id=None, page_size=500, order_by=None, descending=False, **filtros):
+        return iter_table(db, cls._TABLE, cls._PK, after_id, page_size, order_by, descending, filtros, cls)
+
     @staticmethod
-    def get(db: Database, id_reserva):
-        row = db.conn.execute("SELECT * FROM reserva WHERE id_reserva = ?", (id_reserva,)).fetchone()
+    def get(db: Database, id_reserva, archivo=False):
+        # con archivo=True, si no está en la base se busca en los archivos anuales
+        row = db.fetchone(Reserva._SQL_GET, (id_reserva,))
+        if not row and archivo:
+            filas = hotel_archive.query_partitions(db, "SELECT * FROM {e}.reserva WHERE id_reserva = ?",
+                                                   (id_reserva,), solo_archivo=True, primero=True)
+            row = filas[0] if filas else None
         if not row:
             return None
-        return Reserva(row['fecha_ingreso'], row['fecha_salida'], row['estado'], row['id_huesped'], row['id_habitacion'], row['id_empleado'], row['id_reserva'])
+        return Reserva._from_row(row)
 
     def __repr__(self):
         return f"<Reserva id={self.id} huesped={self.id_huesped} habitacion={self.id_habitacion} {self.fecha_ingreso}->{self.fecha_salida}>"
 
 
 
+# -------------------------
+# Disponibilidad de habitaciones
+# -------------------------
+ESTADO_CANCELADA = 'cancelada'
+
+# Una reserva [ingreso, salida) choca con [desde, hasta) si ingreso < hasta y salida > desde.
+# La condición se evalúa tal cual, sin suponer nada de lo ya guardado (las bases anteriores
+# pueden tener estadías solapadas o con salida <= ingreso). idx_reserva_habitacion_fechas
+# cubre la búsqueda: rango por habitación + ingreso, y salida y estado se leen del índice.
+_SQL_CHOQUE = """
+    SELECT 1 FROM reserva r
+    WHERE r.id_habitacion = {habitacion} AND r.fecha_ingreso < :hasta AND r.fecha_salida > :desde
+      AND r.estado IS NOT 'cancelada' {excluir}
+"""
+
+
+def _fecha_iso(d):
+    return d if isinstance(d, str) else d.isoformat()
+
+
+def _fecha(iso):
+    return datetime.fromisoformat(iso).date()
+
+
+SQL.add("reserva.choque", _SQL_CHOQUE.format(
+    habitacion=":id_habitacion", excluir="AND r.id_reserva IS NOT :excluir") + "LIMIT 1")
+
+
+def is_room_available(db: Database, id_habitacion, desde, hasta, excluir_reserva=None):
+    return db.fetchone(SQL["reserva.choque"], {"id_habitacion": id_habitacion, "desde": _fecha_iso(desde),
+                                               "hasta": _fecha_iso(hasta), "excluir": excluir_reserva}) is None
+
+
+def find_available_rooms(db: Database, tipo, desde, hasta):
+    """
+    Habitaciones libres para todas las noches entre desde y hasta (hasta = día de salida).
+    tipo=None devuelve todos los tipos.
+    """
+    params = {"tipo": tipo, "desde": _fecha_iso(desde), "hasta": _fecha_iso(hasta)}
+    return list(_query_models(db, Habitacion, _sql_disponibles(tipo is not None), params))
+
+
+def _sql_disponibles(por_tipo):
+    return f"""
+        SELECT h.* FROM habitacion h
+        WHERE {"h.tipo = :tipo AND" if por_tipo else ""}
+          NOT EXISTS ({_SQL_CHOQUE.format(habitacion="h.id_habitacion", excluir="")})
+        ORDER BY h.numero
+    """
+
+
+# -------------------------
+# Facturación masiva
+# -------------------------
+# Una sola consulta para todas las reservas: los servicios se agrupan por (reserva, costo)
+# sumando cantidades (enteros exactos), así el total en Decimal es idéntico al de
+# Reserva.calculate_total sin traer cada fila de reserva_servicio. Misma regla de cantidad:
+# NULL o 0 cuenta como 1 (`cantidad or 1`). check_totals.py verifica la paridad.
+_SQL_TOTALES = """
+    SELECT r.id_reserva, r.fecha_ingreso, r.fecha_salida, h.id_habitacion, h.precio,
+           s.costo, SUM(COALESCE(NULLIF(rs.cantidad, 0), 1)) AS cantidad
+    FROM reserva r
+    LEFT JOIN habitacion h ON h.id_habitacion = r.id_habitacion
+    LEFT JOIN reserva_servicio rs ON rs.id_reserva = r.id_reserva
+    LEFT JOIN servicio_adicional s ON s.id_servicio = rs.id_servicio
+    WHERE {filtro}
+    GROUP BY r.id_reserva, s.costo
+    ORDER BY r.id_reserva
+"""
+
+
+# Al facturar por rango se dejan fuera las reservas canceladas y las ya facturadas
+# (idx_factura_reserva); con ids explícitos se factura exactamente lo pedido.
+_FILTRO_PENDIENTES = """
+    AND r.estado IS NOT 'cancelada'
+    AND NOT EXISTS (SELECT 1 FROM factura f WHERE f.id_reserva = r.id_reserva)
+"""
+
+
+def _filtro_reservas(reservation_ids, desde, hasta, pendientes=False):
+    if reservation_ids is not None:
+        return "r.id_reserva IN (SELECT value FROM json_each(:ids))", {"ids": json.dumps(list(reservation_ids))}
+    if desde is None or hasta is None:
+        raise ValueError("Indique reservation_ids o un rango desde/hasta")
+    # rango por fecha de salida (check-out), ambos extremos incluidos
+    filtro = "r.fecha_salida BETWEEN :desde AND :hasta" + (_FILTRO_PENDIENTES if pendientes else "")
+    return filtro, {"desde": _fecha_iso(desde), "hasta": _fecha_iso(hasta)}
+
+
+def calculate_totals(db: Database, reservation_ids=None, desde=None, hasta=None):
+    """
+    Versión masiva de Reserva.calculate_total: {id_reserva: total} para las reservas
+    indicadas por id o cuyo check-out cae en [desde, hasta].
+    """
+    return _totales(db, *_filtro_reservas(reservation_ids, desde, hasta))
+
+
+def _totales(db: Database, filtro, params):
+    totales = {}
+    actual = None
+    for row in db.conn.execute(_SQL_TOTALES.format(filtro=filtro), params):
+        if row['id_reserva'] != actual:
+            if actual is not None:
+                totales[actual] = float(total)
+            actual = row['id_reserva']
+            if row['id_habitacion'] is None:
+                raise ValueError(f"Habitación no encontrada (reserva {actual})")
+            precio = Decimal(str(row['precio'] or 0.0))
+            total = precio * Decimal(str(_nights(row['fecha_ingreso'], row['fecha_salida'])))
+        costo = Decimal(str(row['costo'] or 0.0))
+        total += costo * Decimal(str(row['cantidad']))
+    if actual is not None:
+        totales[actual] = float(total)
+    return totales
+
+
+def generate_invoices(db: Database, reservation_ids=None, desde=None, hasta=None):
+    """
+    Genera las facturas de muchas reservas en una sola transacción. Por rango
+    [desde, hasta] solo factura las reservas no canceladas y aún sin factura.
+    Devuelve {id_reserva: id_factura}.
+    """
+    with db.batch():
+        db.begin_immediate()
+        totales = _totales(db, *_filtro_reservas(reservation_ids, desde, hasta, pendientes=True))
+        fecha_emision = date.today().isoformat()
+        ids = _insert_many(db, SQL["factura.insert"],
+                           [(fecha_emision, monto, id_reserva) for id_reserva, monto in totales.items()])
+        reservas = Reserva.get_many(db, list(totales))
+        hotel_analytics.update_daily_summary(
+            db, facturas=[(fecha_emision, r.id, r.id_habitacion, totales[r.id]) for r in reservas])
+        hotel_changes.log_invoices(db, [(id_factura, fecha_emision, monto, id_reserva)
+                                        for (id_reserva, monto), id_factura in zip(totales.items(), ids)])
+    return dict(zip(totales, ids))
+
+
+# -------------------------
+# Cierre de mes en paralelo
+# -------------------------
+# El cálculo en Decimal y el armado del documento de cada factura usan CPU; con
+# generate_invoices_parallel se reparte entre procesos por tramos de id_reserva.
+# Cada proceso abre su propia conexión de solo lectura y devuelve montos y documentos;
+# el proceso principal escribe todas las facturas en una sola transacción.
+_SQL_SHARD_RESERVAS = """
+    SELECT r.id_reserva, r.fecha_ingreso, r.fecha_salida, h.id_habitacion, h.numero, h.tipo, h.precio,
+           g.nombre, g.documento, g.direccion
+    FROM reserva r
+    LEFT JOIN habitacion h ON h.id_habitacion = r.id_habitacion
+    LEFT JOIN huesped g ON g.id_huesped = r.id_huesped
+    WHERE r.id_reserva IN (SELECT value FROM json_each(:ids))
+    ORDER BY r.id_reserva
+"""
+
+# mismas reglas que _SQL_TOTALES (cantidad NULL o 0 = 1, servicio inexistente = 0), agrupado por servicio
+_SQL_SHARD_LINEAS = """
+    SELECT rs.id_reserva, s.nombre_servicio, s.costo, SUM(COALESCE(NULLIF(rs.cantidad, 0), 1)) AS cantidad
+    FROM reserva_servicio rs
+    LEFT JOIN servicio_adicional s ON s.id_servicio = rs.id_servicio
+    WHERE rs.id_reserva IN (SELECT value FROM json_each(:ids))
+    GROUP BY rs.id_reserva, rs.id_servicio
+    ORDER BY rs.id_reserva
+"""
+
+SHARD_MINIMO = 500  # reservas por tramo; bajo esto el costo de repartir supera al cálculo
+
+_CONEXION_WORKER = None
+
+
+def _iniciar_worker(path):
+    global _CONEXION_WORKER
+    _CONEXION_WORKER = sqlite3.connect(f"file:{os.path.abspath(path)}?mode=ro", uri=True,
+                                       timeout=ConnectionPool.BUSY_TIMEOUT)
+
+
+def _centavos(valor):
+    return f"{valor.quantize(Decimal('0.01')):,.2f}"
+
+
+def render_invoice(datos, lineas, fecha_emision):
+    """Documento de texto de una factura; datos es la fila de _SQL_SHARD_RESERVAS."""
+    (id_reserva, ingreso, salida, _id_hab, numero, tipo, precio, nombre, documento, direccion) = datos
+    noches = _nights(ingreso, salida)
+    precio = Decimal(str(precio or 0.0))
+    partes = [
+        f"FACTURA - Reserva #{id_reserva}    Emisión: {fecha_emision}",
+        f"Huésped: {nombre or ''} ({documento or 's/d'})",
+        f"Dirección: {direccion or ''}",
+        "",
+        f"Habitación {numero} ({tipo or ''})  {ingreso} -> {salida}",
+        f"  {noches} noches x {_centavos(precio)} = {_centavos(precio * noches)}",
+    ]
+    total = precio * noches
+    for nombre_servicio, costo, cantidad in lineas:
+        costo = Decimal(str(costo or 0.0))
+        importe = costo * Decimal(str(cantidad))
+        total += importe
+        partes.append(f"  {nombre_servicio or 'servicio'}: {cantidad} x {_centavos(costo)} = {_centavos(importe)}")
+    partes.append(f"TOTAL: {_centavos(total)}")
+    return "\n".join(partes) + "\n"
+
+
+def _facturar_shard(ids, fecha_emision, renderizar):
+    """
+    Trabajo de un proceso: [(id_reserva, id_habitacion, monto, documento o None)] de las reservas ids.
+    El total se calcula en Decimal igual que Reserva.calculate_total.
+    """
+    conn = _CONEXION_WORKER
+    params = {"ids": json.dumps(ids)}
+    lineas = {}
+    for id_reserva, nombre_servicio, costo, cantidad in conn.execute(_SQL_SHARD_LINEAS, params):
+        lineas.setdefault(id_reserva, []).append((nombre_servicio, costo, cantidad))
+    resultado = []
+    for datos in conn.execute(_SQL_SHARD_RESERVAS, params):
+        id_reserva, ingreso, salida, id_habitacion, precio = datos[0], datos[1], datos[2], datos[3], datos[6]
+        if id_habitacion is None:
+            raise ValueError(f"Habitación no encontrada (reserva {id_reserva})")
+        propias = lineas.get(id_reserva, ())
+        total = Decimal(str(precio or 0.0)) * Decimal(str(_nights(ingreso, salida)))
+        for _nombre, costo, cantidad in propias:
+            total += Decimal(str(costo or 0.0)) * Decimal(str(cantidad))
+        documento = render_invoice(datos, propias, fecha_emision) if renderizar else None
+        resultado.append((id_reserva, id_habitacion, float(total), documento))
+    return resultado
+
+
+def _shards(ids, workers):
+    # unos 4 tramos por proceso para repartir bien la carga, sin bajar de SHARD_MINIMO
+    tamano = max(SHARD_MINIMO, -(-len(ids) // (workers * 4)))
+    return [ids[i:i + tamano] for i in range(0, len(ids), tamano)]
+
+
+SQL.add("factura.reservas_facturadas",
+        "SELECT DISTINCT id_reserva FROM factura WHERE id_reserva IN (SELECT value FROM json_each(?))")
+
+
+def generate_invoices_parallel(db: Database, reservation_ids=None, desde=None, hasta=None, workers=None,
+                               archivo=None):
+    """
+    Como generate_invoices, con el cálculo repartido en `workers` procesos (por defecto, uno por CPU).
+    Si se indica archivo, se escriben ahí los documentos de las facturas en JSONL
+    ({"id_factura", "id_reserva", "monto_total", "documento"} por línea).
+    Los procesos leen de la base en disco, así que no sirve con ':memory:'.
+    Devuelve {id_reserva: id_factura}.
+    """
+    if db.pool.memoria:
+        raise ValueError("La facturación en paralelo necesita una base en archivo")
+    filtro, params = _filtro_reservas(reservation_ids, desde, hasta, pendientes=True)
+    ids = [r[0] for r in db.fetchall(f"SELECT r.id_reserva FROM reserva r WHERE {filtro} ORDER BY 1", params)]
+    if not ids:
+        return {}
+    workers = workers or os.cpu_count() or 1
+    fecha_emision = date.today().isoformat()
+    renderizar = archivo is not None
+    # sin fork: el proceso tiene hilos (lectores, escritor POS) y conexiones SQLite abiertas,
+    # que un hijo forkeado heredaría a medio usar
+    metodos = multiprocessing.get_all_start_methods()
+    contexto = multiprocessing.get_context("forkserver" if "forkserver" in metodos else "spawn")
+    with ProcessPoolExecutor(max_workers=workers, mp_context=contexto, initializer=_iniciar_worker,
+                             initargs=(db.pool.path,)) as pool:
+        tramos = pool.map(_facturar_shard, _shards(ids, workers), repeat(fecha_emision), repeat(renderizar))
+        resultado = [fila for tramo in tramos for fila in tramo]
+
+    with db.batch():
+        db.begin_immediate()
+        if reservation_ids is None:
+            # otra conexión pudo facturar parte del rango mientras calculaban los procesos
+            facturadas = {r[0] for r in db.fetchall(SQL["factura.reservas_facturadas"], (json.dumps(ids),))}
+            resultado = [fila for fila in resultado if fila[0] not in facturadas]
+        id_facturas = _insert_many(db, SQL["factura.insert"],
+                                   [(fecha_emision, monto, id_reserva) for id_reserva, _h, monto, _d in resultado])
+        hotel_analytics.update_daily_summary(
+            db, facturas=[(fecha_emision, id_r, id_hab, monto) for id_r, id_hab, monto, _d in resultado])
+        hotel_changes.log_invoices(db, [(id_factura, fecha_emision, monto, id_reserva)
+                                        for (id_reserva, _h, monto, _d), id_factura in zip(resultado, id_facturas)])
+    if renderizar:
+        # una sola escritura secuencial: 50.000 archivos sueltos costaban más que todo el cálculo
+        with open(archivo, "w", encoding="utf-8") as f:
+            f.writelines(json.dumps({"id_factura": id_factura, "id_reserva": id_reserva, "monto_total": monto,
+                                     "documento": documento}, ensure_ascii=False) + "\n"
+                         for (id_reserva, _h, monto, documento), id_factura in zip(resultado, id_facturas))
+    return {fila[0]: id_factura for fila, id_factura in zip(resultado, id_facturas)}
+
+
+# -------------------------
+# Subsistemas
+# -------------------------
+# Cada subsistema (calendario de inventario, tarifas, registro de cambios, ...) vive en su
+# propio módulo: importa de aquí lo que necesita y los modelos lo llaman por el nombre del
+# módulo. Se importan al final, con todo lo anterior ya definido, así funciona cualquier
+# orden de importación.
+import hotel_analytics  # noqa: E402
+import hotel_archive  # noqa: E402
+import hotel_changes  # noqa: E402
+import hotel_folio  # noqa: E402
+import hotel_inventory  # noqa: E402
+import hotel_rates  # noqa: E402
+
 
 def menu():
     db = Database("hotel.db")
@@ -367,6 +1879,7 @@ def menu():
         4. Gestionar Servicios Adicionales
         5. Gestionar Reservas
         6. Generar Factura
+        7. Reporte de ocupación
         0. Salir
         """)
         opcion = input("Seleccione una opción: ")
@@ -383,6 +1896,8 @@ def menu():
             menu_reserva(db)
         elif opcion == "6":
             menu_factura(db)
+        elif opcion == "7":
+            menu_reportes(db)
         elif opcion == "0":
             print("Saliendo del sistema...")
             db.close()
@@ -400,6 +1915,7 @@ def menu_huesped(db):
         --- Gestión de Huéspedes ---
         1. Agregar huésped
         2. Ver huéspedes
+        3. Buscar huésped (documento o nombre)
         0. Volver
         """)
         op = input("Elija una opción: ")
@@ -411,12 +1927,17 @@ def menu_huesped(db):
             nacionalidad = input("Nacionalidad: ")
             direccion = input("Dirección: ")
             h = Huesped(nombre, documento, fecha_nacimiento, nacionalidad, direccion)
-            h.save(db)
-            print("✅ Huésped agregado con ID:", h.id)
+            try:
+                h.save(db)
+                print("✅ Huésped agregado con ID:", h.id)
+            except ValueError as e:
+                print("❌", e)
         elif op == "2":
-            rows = db.conn.execute("SELECT * FROM huesped").fetchall()
-            for r in rows:
+            for r in iter_table(db, 'huesped', 'id_huesped'):
                 print(dict(r))
+        elif op == "3":
+            for h in Huesped.search(db, input("Buscar: ")):
+                print(model_to_dict(h))
         elif op == "0":
             break
 
@@ -439,8 +1960,7 @@ def menu_empleado(db):
             e.save(db)
             print("✅ Empleado agregado con ID:", e.id)
         elif op == "2":
-            rows = db.conn.execute("SELECT * FROM empleado").fetchall()
-            for r in rows:
+            for r in iter_table(db, 'empleado', 'id_empleado'):
                 print(dict(r))
         elif op == "0":
             break
@@ -452,6 +1972,7 @@ def menu_habitacion(db):
         --- Gestión de Habitaciones ---
         1. Agregar habitación
         2. Ver habitaciones
+        3. Ver disponibilidad por fechas
         0. Volver
         """)
         op = input("Elija una opción: ")
@@ -465,9 +1986,14 @@ def menu_habitacion(db):
             hab.save(db)
             print("✅ Habitación agregada con ID:", hab.id)
         elif op == "2":
-            rows = db.conn.execute("SELECT * FROM habitacion").fetchall()
-            for r in rows:
+            for r in iter_table(db, 'habitacion', 'id_habitacion'):
                 print(dict(r))
+        elif op == "3":
+            tipo = input("Tipo (vacío = todos): ") or None
+            desde = input("Fecha ingreso (YYYY-MM-DD): ")
+            hasta = input("Fecha salida (YYYY-MM-DD): ")
+            for hab in find_available_rooms(db, tipo, desde, hasta):
+                print(hab)
         elif op == "0":
             break
 
@@ -490,8 +2016,7 @@ def menu_servicio(db):
             s.save(db)
             print("✅ Servicio agregado con ID:", s.id)
         elif op == "2":
-            rows = db.conn.execute("SELECT * FROM servicio_adicional").fetchall()
-            for r in rows:
+            for r in iter_table(db, 'servicio_adicional', 'id_servicio'):
                 print(dict(r))
         elif op == "0":
             break
@@ -516,8 +2041,11 @@ def menu_reserva(db):
             fecha_salida = input("Fecha salida (YYYY-MM-DD): ")
             estado = "confirmada"
             r = Reserva(fecha_ingreso, fecha_salida, estado, id_huesped, id_habitacion, id_empleado)
-            r.save(db)
-            print("✅ Reserva creada con ID:", r.id)
+            try:
+                r.save(db)
+                print("✅ Reserva creada con ID:", r.id)
+            except ValueError as e:
+                print("❌", e)
         elif op == "2":
             id_reserva = int(input("ID de la reserva: "))
             id_servicio = int(input("ID del servicio: "))
@@ -529,8 +2057,7 @@ def menu_reserva(db):
             else:
                 print("❌ Reserva no encontrada.")
         elif op == "3":
-            rows = db.conn.execute("SELECT * FROM reserva").fetchall()
-            for r in rows:
+            for r in iter_table(db, 'reserva', 'id_reserva'):
                 print(dict(r))
         elif op == "0":
             break
@@ -542,6 +2069,8 @@ def menu_factura(db):
         --- Generación de Facturas ---
         1. Generar factura de reserva
         2. Ver facturas
+        3. Facturar check-outs de un rango de fechas
+        4. Archivar estadías facturadas anteriores a una fecha
         0. Volver
         """)
         op = input("Elija una opción: ")
@@ -555,15 +2084,34 @@ def menu_factura(db):
             else:
                 print("❌ Reserva no encontrada.")
         elif op == "2":
-            rows = db.conn.execute("SELECT * FROM factura").fetchall()
-            for r in rows:
+            for r in iter_table(db, 'factura', 'id_factura'):
                 print(dict(r))
+        elif op == "3":
+            desde = input("Salidas desde (YYYY-MM-DD): ")
+            hasta = input("Salidas hasta (YYYY-MM-DD): ")
+            facturas = generate_invoices(db, desde=desde, hasta=hasta)
+            print(f"✅ {len(facturas)} facturas generadas.")
+        elif op == "4":
+            antes_de = input("Check-out anterior a (YYYY-MM-DD): ")
+            for anio, n in hotel_archive.archive_stays(db, antes_de).items():
+                print(f"✅ {n} estadías archivadas en el archivo {anio}.")
         elif op == "0":
             break
 
 
+def menu_reportes(db):
+    desde = input("Desde (YYYY-MM-DD): ")
+    hasta = input("Hasta, sin incluir (YYYY-MM-DD): ")
+    for tipo, ind in hotel_analytics.occupancy_summary(db, desde, hasta).items():
+        print(f"{tipo or '(sin tipo)'}: ocupación {ind['ocupacion']:.1%}  ADR {ind['adr']:.2f}  "
+              f"RevPAR {ind['revpar']:.2f}  noches {ind['noches_vendidas']}")
+
+
 # -------------------------------
 # Iniciar programa
 # -------------------------------
 if __name__ == "__main__":
-    menu()
+    # los subsistemas importan hotel_app: el menú corre desde ese módulo (y no desde
+    # __main__) para que todos usen las mismas clases y el mismo registro SQL
+    import hotel_app
+    hotel_app.menu()
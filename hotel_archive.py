@@ -0,0 +1,213 @@
+#!/usr/bin/env python3
+"""
+hotel_archive.py
+Archivo de estadías cerradas: las reservas terminadas y facturadas pasan a un archivo
+SQLite por año de check-out, y las búsquedas con archivo=True las leen desde ahí.
+"""
+
+import json
+import os
+from contextlib import contextmanager
+from datetime import date, datetime
+
+import hotel_changes
+import hotel_inventory
+from hotel_app import SQL, Database, Reserva, _fecha_iso
+
+# archive_stays mueve las estadías terminadas y facturadas con check-out anterior al corte
+# (reserva con sus líneas de servicio, facturas y folio) a un archivo SQLite por año de
+# check-out, junto a la base: hotel_archivo_2024.db. Los catálogos (huésped, habitación,
+# servicio, empleado) se quedan en la base, así que las filas archivadas siguen apuntando
+# a filas que existen; los ids son AUTOINCREMENT y no se reutilizan. ocupacion_diaria no
+# cambia. Las lecturas normales solo ven la base; Reserva.get, Reserva.services,
+# find_reservas y find_facturas buscan además en los archivos con archivo=True, adjuntando
+# cada archivo (ATTACH) solo mientras se consulta, a la conexión de lectura del hilo: ATTACH
+# y DETACH no se permiten con una transacción abierta, y la de escritura puede tenerla.
+ARCHIVO_TABLAS = ("reserva", "reserva_servicio", "factura", "folio")  # padres primero
+_ARCHIVO_INDICES = (
+    "CREATE UNIQUE INDEX IF NOT EXISTS archivo.archivo_reserva_pk ON reserva(id_reserva)",
+    "CREATE INDEX IF NOT EXISTS archivo.archivo_reserva_huesped ON reserva(id_huesped)",
+    "CREATE INDEX IF NOT EXISTS archivo.archivo_reserva_salida ON reserva(fecha_salida)",
+    "CREATE UNIQUE INDEX IF NOT EXISTS archivo.archivo_reserva_servicio_pk ON reserva_servicio(id)",
+    "CREATE INDEX IF NOT EXISTS archivo.archivo_reserva_servicio_reserva ON reserva_servicio(id_reserva)",
+    "CREATE UNIQUE INDEX IF NOT EXISTS archivo.archivo_factura_pk ON factura(id_factura)",
+    "CREATE INDEX IF NOT EXISTS archivo.archivo_factura_reserva ON factura(id_reserva)",
+    "CREATE UNIQUE INDEX IF NOT EXISTS archivo.archivo_folio_pk ON folio(id_reserva)",
+)
+_SQL_ARCHIVABLES = """
+    SELECT r.id_reserva, substr(r.fecha_salida, 1, 4) AS anio
+    FROM reserva r
+    WHERE r.fecha_salida < ? AND r.estado IS NOT 'cancelada'
+      AND EXISTS (SELECT 1 FROM factura f WHERE f.id_reserva = r.id_reserva)
+    ORDER BY r.id_reserva
+"""
+SQL.add("archivo.registrar", """
+    INSERT INTO archivo (anio, ruta, reservas, actualizado) VALUES (?,?,?,?)
+    ON CONFLICT(anio) DO UPDATE SET reservas = reservas + excluded.reservas, actualizado = excluded.actualizado
+""")
+
+
+def archive_partitions(db: Database, anios=None):
+    """[(anio, ruta absoluta)] de los archivos anuales registrados (o solo de los años indicados)."""
+    if db.pool.memoria or db.fetchone("SELECT 1 FROM sqlite_master WHERE name = 'archivo'") is None:
+        return []
+    base = os.path.dirname(os.path.abspath(db.pool.path))
+    return [(anio, os.path.join(base, ruta)) for anio, ruta in db.fetchall("SELECT anio, ruta FROM archivo ORDER BY anio")
+            if anios is None or anio in anios]
+
+
+@contextmanager
+def _adjuntar(conn, ruta, escritura=False):
+    if escritura:
+        conn.execute("ATTACH DATABASE ? AS archivo", (ruta,))
+    else:
+        conn.execute("ATTACH DATABASE ? AS archivo", (f"file:{ruta}?mode=ro",))
+    try:
+        yield conn
+    finally:
+        conn.execute("DETACH DATABASE archivo")
+
+
+def query_partitions(db: Database, sql, params=(), archivo=False, anios=None, solo_archivo=False, primero=False):
+    """
+    Ejecuta sql (con {e} en lugar del esquema) sobre la base y, con archivo=True, sobre
+    cada archivo anual; devuelve todas las filas. Con primero=True se detiene en la
+    primera partición que devuelve filas.
+    """
+    filas = []
+    if not solo_archivo:
+        filas = db.fetchall(sql.format(e="main"), params)
+        if filas and primero:
+            return filas
+    if not (archivo or solo_archivo):
+        return filas
+    # los archivos solo cambian en archive_stays, fuera de toda transacción: la conexión de
+    # lectura ya ve lo mismo que la de escritura
+    conn = db.pool.reader()
+    for _anio, ruta in archive_partitions(db, anios):
+        if not os.path.exists(ruta):
+            continue
+        with _adjuntar(conn, ruta):
+            filas += conn.execute(sql.format(e="archivo"), params).fetchall()
+        if filas and primero:
+            break
+    return filas
+
+
+def _columnas_tabla(conn, esquema, tabla):
+    return [r[1] for r in conn.execute(f"PRAGMA {esquema}.table_info({tabla})")]
+
+
+def _preparar_archivo(conn):
+    # mismas columnas que la base (sin claves foráneas hacia los catálogos, que quedan en
+    # otro archivo); las columnas agregadas por migraciones posteriores se suman aquí
+    for tabla in ARCHIVO_TABLAS:
+        conn.execute(f"CREATE TABLE IF NOT EXISTS archivo.{tabla} AS SELECT * FROM main.{tabla} WHERE 0")
+        existentes = set(_columnas_tabla(conn, "archivo", tabla))
+        for columna in _columnas_tabla(conn, "main", tabla):
+            if columna not in existentes:
+                conn.execute(f'ALTER TABLE archivo.{tabla} ADD COLUMN "{columna}"')
+    for sql in _ARCHIVO_INDICES:
+        conn.execute(sql)
+
+
+def archive_stays(db: Database, antes_de, lote=5000, vacuum=False):
+    """
+    Mueve a los archivos anuales las estadías facturadas, no canceladas, con check-out
+    anterior a antes_de (que no puede ser posterior a hoy). Cada lote se copia al archivo
+    (INSERT OR IGNORE, un commit) y después se borra de la base (otro commit): si el proceso
+    se corta entre ambos, volver a ejecutar termina el trabajo sin duplicar filas.
+    Con vacuum=True se compacta la base al final. No puede llamarse dentro de db.batch().
+    Devuelve {anio: reservas archivadas}.
+    """
+    if db.pool.memoria:
+        raise ValueError("El archivo de estadías necesita una base en disco")
+    antes_de = _fecha_iso(antes_de)
+    if antes_de > date.today().isoformat():
+        raise ValueError("El corte del archivo no puede ser posterior a hoy")
+    por_anio = {}
+    for id_reserva, anio in db.fetchall(_SQL_ARCHIVABLES, (antes_de,)):
+        por_anio.setdefault(int(anio), []).append(id_reserva)
+
+    nombre = os.path.splitext(os.path.basename(db.pool.path))[0]
+    base = os.path.dirname(os.path.abspath(db.pool.path))
+    conn = db.pool.writer
+    movidas = {}
+    with db.pool.write_lock:
+        if conn.in_transaction:
+            raise ValueError("archive_stays no puede ejecutarse dentro de una transacción (db.batch())")
+        for anio, ids in sorted(por_anio.items()):
+            ruta = f"{nombre}_archivo_{anio}.db"
+            with _adjuntar(conn, os.path.join(base, ruta), escritura=True):
+                with db.batch():
+                    _preparar_archivo(conn)
+                for desde in range(0, len(ids), lote):
+                    trozo = json.dumps(ids[desde:desde + lote])
+                    with db.batch():
+                        for tabla in ARCHIVO_TABLAS:
+                            columnas = ", ".join(f'"{c}"' for c in _columnas_tabla(conn, "main", tabla))
+                            conn.execute(f"""
+                                INSERT OR IGNORE INTO archivo.{tabla} ({columnas})
+                                SELECT {columnas} FROM main.{tabla}
+                                WHERE id_reserva IN (SELECT value FROM json_each(?))
+                            """, (trozo,))
+                    with db.batch():
+                        reservas = Reserva.get_many(db, ids[desde:desde + lote])
+                        for tabla in reversed(ARCHIVO_TABLAS):
+                            conn.execute(f"DELETE FROM main.{tabla} WHERE id_reserva IN (SELECT value FROM json_each(?))",
+                                         (trozo,))
+                        conn.execute(SQL["archivo.registrar"],
+                                     (anio, ruta, len(reservas), datetime.now().isoformat(timespec="seconds")))
+                        hotel_inventory.sync_stays(db, quitar=reservas)
+                        hotel_changes.log_changes(db, [(Reserva._TABLE, r.id, 'archivar', {"anio": anio}) for r in reservas])
+            movidas[anio] = len(ids)
+        if vacuum and movidas:
+            conn.execute("VACUUM")
+    return movidas
+
+
+# {e} es el esquema (main o archivo, ver query_partitions); {filtro} lo arma cada función
+SQL_FIND_RESERVAS = "SELECT * FROM {e}.reserva WHERE {filtro}"
+SQL_FIND_FACTURAS = "SELECT * FROM {e}.factura WHERE {filtro}"
+
+
+def find_reservas(db: Database, id_huesped=None, desde=None, hasta=None, archivo=False):
+    """
+    Reservas de un huésped y/o con check-out en [desde, hasta], ordenadas por id.
+    Con archivo=True incluye las archivadas (solo de los años que cubre el rango).
+    """
+    condiciones, params = ["1"], []
+    if id_huesped is not None:
+        condiciones.append("id_huesped = ?")
+        params.append(id_huesped)
+    if desde is not None:
+        condiciones.append("fecha_salida >= ?")
+        params.append(_fecha_iso(desde))
+    if hasta is not None:
+        condiciones.append("fecha_salida <= ?")
+        params.append(_fecha_iso(hasta))
+    anios = None
+    if desde is not None or hasta is not None:
+        primero = int(_fecha_iso(desde)[:4]) if desde is not None else 1
+        ultimo = int(_fecha_iso(hasta)[:4]) if hasta is not None else 9999
+        anios = range(primero, ultimo + 1)
+    sql = SQL_FIND_RESERVAS.format(e="{e}", filtro=" AND ".join(condiciones))
+    filas = query_partitions(db, sql, params, archivo, anios)
+    return sorted((Reserva._from_row(r) for r in filas), key=lambda r: r.id)
+
+
+def find_facturas(db: Database, id_reserva=None, desde=None, hasta=None, archivo=False):
+    """Facturas (dicts) de una reserva y/o emitidas en [desde, hasta]; con archivo=True incluye las archivadas."""
+    condiciones, params = ["1"], []
+    if id_reserva is not None:
+        condiciones.append("id_reserva = ?")
+        params.append(id_reserva)
+    if desde is not None:
+        condiciones.append("fecha_emision >= ?")
+        params.append(_fecha_iso(desde))
+    if hasta is not None:
+        condiciones.append("fecha_emision <= ?")
+        params.append(_fecha_iso(hasta))
+    sql = SQL_FIND_FACTURAS.format(e="{e}", filtro=" AND ".join(condiciones))
+    filas = query_partitions(db, sql, params, archivo)
+    return sorted((dict(r) for r in filas), key=lambda f: f['id_factura'])
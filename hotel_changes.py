@@ -0,0 +1,106 @@
+#!/usr/bin/env python3
+"""
+hotel_changes.py
+Registro de cambios de los modelos (change data capture) para consumidores externos:
+cada escritura agrega sus cambios a la tabla cambio en la misma transacción, y
+changes_since los entrega en orden de commit.
+"""
+
+import json
+from datetime import datetime
+
+from hotel_app import SQL, Database, model_to_dict
+
+# Cada save()/save_many, add_service/add_services, generate_invoice(s) y archive_stays
+# agrega sus cambios a la tabla cambio en la misma transacción: si hay rollback, el cambio
+# tampoco queda. Las escrituras están serializadas (un solo escritor), así que seq crece en
+# orden de commit y un consumidor que lee "seq > último visto" no se salta nada.
+# Operaciones: 'insert'/'update' (datos = fila completa, se puede tratar como upsert),
+# 'agregar' (línea de servicio, id = id_reserva), 'archivar' (reserva movida al archivo).
+# compact_changes borra los insert/update reemplazados por uno más nuevo de la misma fila
+# y, si se pide, lo que todos los consumidores registrados ya procesaron.
+_SQL_CAMBIO = SQL.add("cambio.insert", "INSERT INTO cambio (tabla, id, operacion, datos, fecha) VALUES (?,?,?,?,?)")
+SQL.add("cambio.desde", "SELECT seq, tabla, id, operacion, datos, fecha FROM cambio WHERE seq > ? ORDER BY seq LIMIT ?")
+SQL.add("cambio.desde_tablas", """
+    SELECT seq, tabla, id, operacion, datos, fecha FROM cambio
+    WHERE seq > ? AND tabla IN (SELECT value FROM json_each(?)) ORDER BY seq LIMIT ?
+""")
+SQL.add("cambio_consumidor.get", "SELECT seq FROM cambio_consumidor WHERE consumidor = ?")
+SQL.add("cambio_consumidor.upsert", """
+    INSERT INTO cambio_consumidor (consumidor, seq) VALUES (?, ?)
+    ON CONFLICT(consumidor) DO UPDATE SET seq = MAX(seq, excluded.seq)
+""")
+_SQL_COMPACTAR_REEMPLAZADOS = """
+    DELETE FROM cambio
+    WHERE seq <= ? AND operacion IN ('insert', 'update')
+      AND seq NOT IN (SELECT MAX(seq) FROM cambio WHERE operacion IN ('insert', 'update') GROUP BY tabla, id)
+"""
+
+
+def log_changes(db: Database, cambios):
+    """Agrega [(tabla, id, operacion, datos)] al registro; se llama dentro de la transacción del cambio."""
+    fecha = datetime.now().isoformat(timespec="seconds")
+    db.conn.executemany(_SQL_CAMBIO, [(tabla, id_, operacion, json.dumps(datos, ensure_ascii=False), fecha)
+                                      for tabla, id_, operacion, datos in cambios])
+
+
+def log_models(db: Database, objs, operacion):
+    """Registra objs (modelos guardados) con su fila completa; operacion = 'insert' o 'update'."""
+    log_changes(db, [(o._TABLE, o.id, operacion, model_to_dict(o)) for o in objs])
+
+
+def log_services(db: Database, lineas):
+    """Registra las líneas de servicio [(id_reserva, id_servicio, cantidad)] agregadas."""
+    log_changes(db, [("reserva_servicio", id_reserva, "agregar", {"id_servicio": id_servicio, "cantidad": cantidad})
+                      for id_reserva, id_servicio, cantidad in lineas])
+
+
+def log_invoices(db: Database, facturas):
+    """Registra las facturas [(id_factura, fecha_emision, monto, id_reserva)] emitidas."""
+    log_changes(db, [("factura", id_factura, "insert",
+                       {"id": id_factura, "fecha_emision": fecha, "monto_total": monto, "id_reserva": id_reserva})
+                      for id_factura, fecha, monto, id_reserva in facturas])
+
+
+def changes_since(db: Database, seq=0, limit=500, tablas=None):
+    """
+    Cambios posteriores a seq, en orden: [{"seq", "tabla", "id", "operacion", "datos", "fecha"}].
+    El consumidor guarda el último seq recibido y lo pasa en la siguiente llamada.
+    """
+    if tablas is None:
+        filas = db.fetchall(SQL["cambio.desde"], (seq, limit))
+    else:
+        filas = db.fetchall(SQL["cambio.desde_tablas"], (seq, json.dumps(list(tablas)), limit))
+    return [{"seq": r[0], "tabla": r[1], "id": r[2], "operacion": r[3],
+             "datos": json.loads(r[4]) if r[4] is not None else None, "fecha": r[5]} for r in filas]
+
+
+def commit_offset(db: Database, consumidor, seq):
+    """Registra que consumidor ya procesó los cambios hasta seq (nunca retrocede)."""
+    with db.batch():
+        db.conn.execute(SQL["cambio_consumidor.upsert"], (consumidor, seq))
+
+
+def consumer_offset(db: Database, consumidor):
+    """Último seq confirmado por consumidor (0 si no está registrado)."""
+    row = db.fetchone(SQL["cambio_consumidor.get"], (consumidor,))
+    return row[0] if row else 0
+
+
+def compact_changes(db: Database, descartar_procesados=False):
+    """
+    Compacta el registro hasta el menor seq confirmado por los consumidores registrados
+    (o todo, si no hay ninguno): borra los insert/update de una fila que tienen uno más
+    nuevo. Con descartar_procesados=True borra además todo lo que ya procesaron todos
+    los consumidores; un consumidor nuevo debe partir entonces de las tablas.
+    Devuelve cuántos cambios borró.
+    """
+    with db.batch():
+        db.begin_immediate()
+        limite, consumidores = db.fetchone("SELECT MIN(seq), COUNT(*) FROM cambio_consumidor")
+        if not consumidores:
+            limite = db.fetchone("SELECT COALESCE(MAX(seq), 0) FROM cambio")[0]
+        borrados = db.conn.execute(_SQL_COMPACTAR_REEMPLAZADOS, (limite,)).rowcount
+        if descartar_procesados and consumidores:
+            borrados += db.conn.execute("DELETE FROM cambio WHERE seq <= ?", (limite,)).rowcount
+    return borrados
@@ -0,0 +1,139 @@
+#!/usr/bin/env python3
+"""
+hotel_folio.py
+Folio: saldo acumulado por reserva (cargo de habitación + servicios), mantenido en
+la misma transacción de cada cargo para leer el saldo sin recalcularlo.
+"""
+
+import json
+from decimal import Decimal
+
+import hotel_changes
+from hotel_app import SQL, Database, _nights, _tipo_precio
+
+# folio guarda, por reserva, el cargo de habitación (precio vigente x noches) y la suma
+# de los servicios, como texto Decimal para que el saldo sea exactamente el de
+# calculate_total. Reserva.save/save_many reescriben el cargo de habitación, add_service
+# suma su línea y un cambio de precio del catálogo recalcula las reservas afectadas,
+# todo en la misma transacción. check_folios compara contra un recálculo completo.
+SQL.add("folio.get", "SELECT cargo_habitacion, cargo_servicios FROM folio WHERE id_reserva = ?")
+_SQL_FOLIO_HABITACION = SQL.add("folio.habitacion", """
+    INSERT INTO folio (id_reserva, cargo_habitacion) VALUES (?, ?)
+    ON CONFLICT(id_reserva) DO UPDATE SET cargo_habitacion = excluded.cargo_habitacion
+""")
+_SQL_FOLIO_SERVICIOS = SQL.add("folio.servicios", "UPDATE folio SET cargo_servicios = ? WHERE id_reserva = ?")
+SQL.add("folio.reservas_por_habitacion",
+        "SELECT id_reserva FROM reserva WHERE id_habitacion IN (SELECT value FROM json_each(?))")
+SQL.add("folio.costos_servicio",
+        "SELECT id_servicio, costo FROM servicio_adicional WHERE id_servicio IN (SELECT value FROM json_each(?))")
+SQL.add("folio.reservas_por_servicio_adicional",
+        "SELECT DISTINCT id_reserva FROM reserva_servicio WHERE id_servicio IN (SELECT value FROM json_each(?))")
+_SQL_FOLIO_REEMPLAZAR = """
+    INSERT OR REPLACE INTO folio (id_reserva, cargo_habitacion, cargo_servicios) VALUES (?,?,?)
+"""
+
+
+def _cargo_habitacion(precio, r):
+    return str(Decimal(str(precio or 0.0)) * Decimal(str(r.nights())))
+
+
+def update_room_charges(db: Database, reservas):
+    """Reescribe el cargo de habitación del folio de las reservas guardadas."""
+    with db.batch():
+        # precios de la base, con lo ya escrito en la transacción (no del caché del catálogo)
+        precios = {i: precio for i, (_tipo, precio) in _tipo_precio(db, [r.id_habitacion for r in reservas]).items()}
+        db.conn.executemany(_SQL_FOLIO_HABITACION,
+                            [(r.id, _cargo_habitacion(precios.get(r.id_habitacion), r)) for r in reservas])
+
+
+def add_charges(db: Database, lineas):
+    """Suma al folio las líneas [(id_reserva, id_servicio, cantidad)] recién insertadas."""
+    cargos = {}
+    with db.batch():
+        costos = dict(db.fetchall(SQL["folio.costos_servicio"], (json.dumps(list({l[1] for l in lineas})),)))
+        for id_reserva, id_servicio, cantidad in lineas:
+            if id_servicio not in costos:
+                continue  # igual que calculate_total: un servicio inexistente no suma
+            # cantidad NULL o 0 cuenta como 1, como en calculate_total
+            cargo = Decimal(str(costos[id_servicio] or 0.0)) * Decimal(str(cantidad or 1))
+            cargos[id_reserva] = cargos.get(id_reserva, Decimal(0)) + cargo
+        sin_folio = []
+        for id_reserva, cargo in cargos.items():
+            row = db.fetchone(SQL["folio.get"], (id_reserva,))
+            if row is None:
+                sin_folio.append(id_reserva)
+            else:
+                db.conn.execute(_SQL_FOLIO_SERVICIOS, (str(Decimal(row[1]) + cargo), id_reserva))
+        if sin_folio:
+            rebuild_folios(db, sin_folio)
+
+
+def add_services(db: Database, lineas):
+    """Versión masiva de Reserva.add_service: lineas [(id_reserva, id_servicio, cantidad)] en una transacción."""
+    lineas = [(id_reserva, id_servicio, cantidad) for id_reserva, id_servicio, cantidad in lineas]
+    with db.batch():
+        db.conn.executemany(SQL["reserva_servicio.insert"], lineas)
+        add_charges(db, lineas)
+        hotel_changes.log_services(db, lineas)
+
+
+def refresh_catalog(db: Database, tabla, ids):
+    """Recalcula los folios de las reservas que usan las habitaciones o servicios ids."""
+    if not ids:
+        return
+    with db.batch():
+        afectadas = [r[0] for r in db.fetchall(SQL[f"folio.reservas_por_{tabla}"], (json.dumps(list(ids)),))]
+        if afectadas:
+            rebuild_folios(db, afectadas)
+
+
+def _calcular_folios(db: Database, reservation_ids=None):
+    """{id_reserva: (cargo_habitacion, cargo_servicios)} en Decimal, desde reserva y reserva_servicio."""
+    filtro, params = "1", {}
+    if reservation_ids is not None:
+        filtro, params = "r.id_reserva IN (SELECT value FROM json_each(:ids))", {"ids": json.dumps(list(reservation_ids))}
+    folios = {}
+    for r in db.conn.execute(f"""
+        SELECT r.id_reserva, r.fecha_ingreso, r.fecha_salida, h.precio
+        FROM reserva r LEFT JOIN habitacion h ON h.id_habitacion = r.id_habitacion
+        WHERE {filtro}
+    """, params):
+        noches = Decimal(str(_nights(r['fecha_ingreso'], r['fecha_salida'])))
+        folios[r['id_reserva']] = [Decimal(str(r['precio'] or 0.0)) * noches, Decimal(0)]
+    for r in db.conn.execute(f"""
+        SELECT rs.id_reserva, s.costo, SUM(COALESCE(NULLIF(rs.cantidad, 0), 1)) AS cantidad
+        FROM reserva r
+        JOIN reserva_servicio rs ON rs.id_reserva = r.id_reserva
+        JOIN servicio_adicional s ON s.id_servicio = rs.id_servicio
+        WHERE {filtro}
+        GROUP BY rs.id_reserva, s.costo
+    """, params):
+        folios[r['id_reserva']][1] += Decimal(str(r['costo'] or 0.0)) * Decimal(str(r['cantidad']))
+    return folios
+
+
+def rebuild_folios(db: Database, reservation_ids=None):
+    """Recalcula desde cero los folios de todas las reservas (o de las indicadas); devuelve cuántos."""
+    folios = _calcular_folios(db, reservation_ids)
+    with db.batch():
+        if reservation_ids is None:
+            db.conn.execute("DELETE FROM folio")
+        db.conn.executemany(_SQL_FOLIO_REEMPLAZAR,
+                            [(i, str(hab), str(serv)) for i, (hab, serv) in folios.items()])
+    return len(folios)
+
+
+def check_folios(db: Database, reservation_ids=None):
+    """
+    Verifica los folios contra un recálculo completo.
+    Devuelve [(id_reserva, saldo guardado o None, saldo esperado)] de los que no coinciden.
+    """
+    esperados = _calcular_folios(db, reservation_ids)
+    guardados = {r[0]: Decimal(r[1]) + Decimal(r[2])
+                 for r in db.fetchall("SELECT id_reserva, cargo_habitacion, cargo_servicios FROM folio")}
+    diferencias = []
+    for id_reserva, (hab, serv) in sorted(esperados.items()):
+        guardado = guardados.get(id_reserva)
+        if guardado != hab + serv:
+            diferencias.append((id_reserva, float(guardado) if guardado is not None else None, float(hab + serv)))
+    return diferencias
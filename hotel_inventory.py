@@ -0,0 +1,139 @@
+#!/usr/bin/env python3
+"""
+hotel_inventory.py
+Calendario de inventario en memoria (bitmaps por noche) para las búsquedas de
+habitaciones libres en muchas noches y muchas habitaciones a la vez.
+"""
+
+import threading
+from functools import partial
+
+from hotel_app import ESTADO_CANCELADA, Database, _fecha, _fecha_iso
+
+# Cada habitación tiene una posición de bit; por cada noche se guarda un int de Python
+# con los bits de las habitaciones ocupadas esa noche. "Libres de X a Y" es el OR de
+# las noches del rango negado y con AND contra la máscara del tipo; contar libres por
+# noche es un popcount (int.bit_count). Con 500 habitaciones y 18 meses son ~550 enteros
+# de 64 bytes. Se mantiene al día con Reserva.save/save_many y Habitacion.save (después
+# del commit); otro proceso que escriba en la misma base no lo actualiza: usar rebuild().
+class InventoryCalendar:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._reset()
+
+    def _reset(self):
+        self._noches = {}       # ordinal de la noche -> bits de habitaciones ocupadas
+        self._bit = {}          # id_habitacion -> posición de bit
+        self._ids = []          # posición de bit -> id_habitacion
+        self._tipo = {}         # id_habitacion -> tipo
+        self._mascaras = {}     # tipo -> bits de las habitaciones de ese tipo
+        self._todas = 0
+
+    def rebuild(self, db: Database):
+        """Reconstruye el calendario desde habitacion y reserva."""
+        habitaciones = db.fetchall("SELECT id_habitacion, tipo FROM habitacion ORDER BY numero")
+        estadias = db.fetchall("SELECT id_habitacion, fecha_ingreso, fecha_salida FROM reserva "
+                               "WHERE estado IS NOT 'cancelada'")
+        with self._lock:
+            self._reset()
+            for id_habitacion, tipo in habitaciones:
+                self._set_room(id_habitacion, tipo)
+            noches = self._noches
+            for id_habitacion, ingreso, salida in estadias:
+                bit = self._bit.get(id_habitacion)
+                if bit is None:
+                    continue
+                marca = 1 << bit
+                for dia in range(_fecha(ingreso).toordinal(), _fecha(salida).toordinal()):
+                    noches[dia] = noches.get(dia, 0) | marca
+        return self
+
+    def _set_room(self, id_habitacion, tipo):
+        tipo = tipo or ''
+        bit = self._bit.get(id_habitacion)
+        if bit is None:
+            bit = self._bit[id_habitacion] = len(self._ids)
+            self._ids.append(id_habitacion)
+            self._todas |= 1 << bit
+        else:
+            anterior = self._tipo[id_habitacion]
+            self._mascaras[anterior] &= ~(1 << bit)
+        self._tipo[id_habitacion] = tipo
+        self._mascaras[tipo] = self._mascaras.get(tipo, 0) | (1 << bit)
+
+    def set_rooms(self, habitaciones):
+        """Registra habitaciones nuevas o cambios de tipo: [(id_habitacion, tipo)]."""
+        with self._lock:
+            for id_habitacion, tipo in habitaciones:
+                self._set_room(id_habitacion, tipo)
+
+    def apply(self, quitar=(), agregar=()):
+        """Libera las estadías quitar y ocupa las de agregar: [(id_habitacion, ingreso, salida)]."""
+        with self._lock:
+            noches = self._noches
+            for estadias, ocupar in ((quitar, False), (agregar, True)):
+                for id_habitacion, ingreso, salida in estadias:
+                    bit = self._bit.get(id_habitacion)
+                    if bit is None:
+                        continue
+                    marca = 1 << bit
+                    for dia in range(_fecha(ingreso).toordinal(), _fecha(salida).toordinal()):
+                        noches[dia] = (noches.get(dia, 0) | marca) if ocupar else (noches.get(dia, 0) & ~marca)
+
+    def _ocupadas(self, desde, hasta):
+        noches = self._noches
+        ocupadas = 0
+        for dia in range(_fecha(_fecha_iso(desde)).toordinal(), _fecha(_fecha_iso(hasta)).toordinal()):
+            ocupadas |= noches.get(dia, 0)
+        return ocupadas
+
+    def free_rooms(self, desde, hasta, tipo=None):
+        """ids de habitación libres todas las noches de desde a hasta (día de salida)."""
+        with self._lock:
+            libres = (self._todas if tipo is None else self._mascaras.get(tipo, 0)) & ~self._ocupadas(desde, hasta)
+            ids = []
+            while libres:
+                bajo = libres & -libres
+                ids.append(self._ids[bajo.bit_length() - 1])
+                libres ^= bajo
+            return ids
+
+    def find_block(self, tipo, cantidad, desde, hasta):
+        """cantidad habitaciones de tipo libres todo el rango (ventas a grupos), o None si no alcanzan."""
+        libres = self.free_rooms(desde, hasta, tipo)
+        return libres[:cantidad] if len(libres) >= cantidad else None
+
+    def free_count_by_tipo(self, desde, hasta):
+        """{tipo: [habitaciones libres en cada noche de desde a hasta]}."""
+        inicio, fin = _fecha(_fecha_iso(desde)).toordinal(), _fecha(_fecha_iso(hasta)).toordinal()
+        with self._lock:
+            ocupadas = [self._noches.get(dia, 0) for dia in range(inicio, fin)]
+            return {tipo: [(mascara & ~o).bit_count() for o in ocupadas]
+                    for tipo, mascara in sorted(self._mascaras.items())}
+
+
+def inventory_calendar(db: Database):
+    """Calendario de inventario de db, construido desde la base la primera vez."""
+    if db.inventario is None:
+        # con el lock de escritura tomado ningún commit queda entre la lectura y la asignación
+        with db.pool.write_lock:
+            if db.inventario is None:
+                db.inventario = InventoryCalendar().rebuild(db)
+    return db.inventario
+
+
+def _estadias(reservas):
+    # copia de los datos al momento del commit; las reservas canceladas no ocupan noches
+    return [(r.id_habitacion, r.fecha_ingreso, r.fecha_salida) for r in reservas if r.estado != ESTADO_CANCELADA]
+
+
+def sync_stays(db: Database, quitar=(), agregar=()):
+    """Libera las reservas quitar y ocupa las de agregar en el calendario de db, al hacer commit."""
+    if db.inventario is not None:
+        db.after_commit(partial(db.inventario.apply, _estadias(quitar), _estadias(agregar)))
+
+
+def sync_rooms(db: Database, habitaciones):
+    """Registra en el calendario de db las habitaciones nuevas o con otro tipo, al hacer commit."""
+    if db.inventario is not None:
+        db.after_commit(partial(db.inventario.set_rooms, [(h.id, h.tipo) for h in habitaciones]))
@@ -0,0 +1,380 @@
+#!/usr/bin/env python3
+"""
+hotel_io.py
+Importación y exportación masiva en CSV o JSONL (una fila JSON por línea) para
+cargar reservas desde channel managers y enviar facturas a contabilidad.
+Todo el flujo es con generadores: el archivo se lee fila a fila, se valida contra
+los modelos de hotel_app.py y se escribe por lotes con executemany, así la memoria
+usada es la de un lote aunque el archivo pese varios GB.
+"""
+
+import argparse
+import csv
+import json
+import sqlite3
+import sys
+import time
+from datetime import date
+from itertools import islice
+
+from hotel_app import SQL, Database, Huesped, Reserva
+
+FORMATOS = ('csv', 'jsonl')
+TAMANO_LOTE = 5000
+
+
+# -------------------------
+# Informe de carga
+# -------------------------
+class InformeCarga:
+    """Contadores y throughput de una importación o exportación."""
+    MAX_ERRORES = 100  # se guardan los primeros errores; el resto solo se cuenta
+
+    def __init__(self, entidad):
+        self.entidad = entidad
+        self.leidas = 0
+        self.escritas = 0
+        self.rechazadas = 0
+        self.errores = []
+        self._inicio = time.perf_counter()
+        self.segundos = 0.0
+
+    def rechazar(self, linea, motivo):
+        self.rechazadas += 1
+        if len(self.errores) < self.MAX_ERRORES:
+            self.errores.append((linea, motivo))
+
+    def avance(self):
+        self.segundos = time.perf_counter() - self._inicio
+
+    @property
+    def filas_por_seg(self):
+        return self.leidas / self.segundos if self.segundos else 0.0
+
+    def as_dict(self):
+        return {"entidad": self.entidad, "leidas": self.leidas, "escritas": self.escritas,
+                "rechazadas": self.rechazadas, "segundos": self.segundos,
+                "filas_por_seg": self.filas_por_seg, "errores": self.errores}
+
+    def __str__(self):
+        return (f"{self.entidad}: {self.leidas} leídas, {self.escritas} escritas, {self.rechazadas} rechazadas "
+                f"en {self.segundos:.1f}s ({self.filas_por_seg:,.0f} filas/s)")
+
+
+# -------------------------
+# Lectura y escritura por streaming
+# -------------------------
+def _formato(ruta, formato=None):
+    formato = formato or ruta.rsplit('.', 1)[-1].lower()
+    if formato not in FORMATOS:
+        raise ValueError(f"Formato no soportado: {formato} (use {', '.join(FORMATOS)})")
+    return formato
+
+
+def leer_filas(ruta, informe, formato=None):
+    """Genera (número de línea, dict) sin cargar el archivo; las líneas ilegibles se rechazan."""
+    formato = _formato(ruta, formato)
+    with open(ruta, newline='', encoding='utf-8-sig') as f:
+        if formato == 'csv':
+            lector = csv.DictReader(f)
+            for fila in lector:
+                informe.leidas += 1
+                yield lector.line_num, fila
+        else:
+            for n, linea in enumerate(f, 1):
+                if not linea.strip():
+                    continue
+                informe.leidas += 1
+                try:
+                    fila = json.loads(linea)
+                except json.JSONDecodeError as e:
+                    informe.rechazar(n, f"JSON inválido: {e}")
+                    continue
+                if not isinstance(fila, dict):
+                    informe.rechazar(n, "se esperaba un objeto JSON")
+                    continue
+                yield n, fila
+
+
+def escribir_filas(ruta, columnas, filas, informe, formato=None):
+    """Escribe tuplas en CSV (con encabezado) o JSONL a medida que llegan."""
+    formato = _formato(ruta, formato)
+    with open(ruta, 'w', newline='', encoding='utf-8') as f:
+        if formato == 'csv':
+            escritor = csv.writer(f)
+            escritor.writerow(columnas)
+            for lote in _lotes(filas, TAMANO_LOTE):
+                escritor.writerows(lote)
+                informe.escritas += len(lote)
+        else:
+            for lote in _lotes(filas, TAMANO_LOTE):
+                f.writelines(json.dumps(dict(zip(columnas, fila)), ensure_ascii=False) + "\n" for fila in lote)
+                informe.escritas += len(lote)
+    informe.leidas = informe.escritas
+    informe.avance()
+    return informe
+
+
+def _lotes(iterable, tamano):
+    it = iter(iterable)
+    while lote := list(islice(it, tamano)):
+        yield lote
+
+
+def _validar(filas, convertir, informe):
+    """Aplica convertir(fila) a cada fila; las que fallan quedan en el informe con su línea."""
+    for n, fila in filas:
+        try:
+            yield n, convertir(fila)
+        except (ValueError, TypeError) as e:
+            informe.rechazar(n, str(e))
+
+
+# -------------------------
+# Conversión fila -> modelo
+# -------------------------
+def _texto(fila, campo):
+    valor = fila.get(campo)
+    if valor is None:
+        return None
+    valor = str(valor).strip()
+    return valor or None
+
+
+def _entero(fila, campo):
+    valor = _texto(fila, campo)
+    return int(valor) if valor is not None else None
+
+
+def _fecha_valida(fila, campo, obligatoria=True):
+    valor = _texto(fila, campo)
+    if valor is None:
+        if obligatoria:
+            raise ValueError(f"falta {campo}")
+        return None
+    try:
+        return date.fromisoformat(valor).isoformat()
+    except ValueError:
+        raise ValueError(f"{campo} inválida: {valor!r} (formato YYYY-MM-DD)") from None
+
+
+def _huesped_desde_fila(fila):
+    nombre = _texto(fila, 'nombre')
+    if nombre is None:
+        raise ValueError("falta nombre")
+    return Huesped(nombre, _texto(fila, 'documento'), _fecha_valida(fila, 'fecha_nacimiento', False),
+                   _texto(fila, 'nacionalidad'), _texto(fila, 'direccion'))
+
+
+def _reserva_desde_fila(fila):
+    """Reserva sin claves resueltas: devuelve (reserva, documento, numero de habitación)."""
+    ingreso = _fecha_valida(fila, 'fecha_ingreso')
+    salida = _fecha_valida(fila, 'fecha_salida')
+    if salida <= ingreso:
+        raise ValueError(f"fecha_salida {salida} no es posterior a fecha_ingreso {ingreso}")
+    documento = _texto(fila, 'documento')
+    numero = _entero(fila, 'numero')
+    r = Reserva(ingreso, salida, _texto(fila, 'estado') or 'confirmada', _entero(fila, 'id_huesped'),
+                _entero(fila, 'id_habitacion'), _entero(fila, 'id_empleado'))
+    if documento is None and r.id_huesped is None:
+        raise ValueError("falta documento (o id_huesped)")
+    if numero is None and r.id_habitacion is None:
+        raise ValueError("falta numero de habitación (o id_habitacion)")
+    return r, documento, numero
+
+
+# -------------------------
+# Resolución de claves foráneas
+# -------------------------
+# Las habitaciones son pocas: numero -> id_habitacion se carga entero al empezar.
+# Los huéspedes pueden ser millones: documento -> id_huesped se resuelve por lote
+# con una sola consulta, así el mapa en memoria nunca pasa del tamaño del lote.
+_SQL_IDS_POR_DOCUMENTO = SQL.add("huesped.ids_por_documento", """
+    SELECT documento, id_huesped FROM huesped
+    WHERE documento IN (SELECT value FROM json_each(?)) AND documento <> ''
+""")
+
+
+def _ids_por_documento(db: Database, documentos):
+    if not documentos:
+        return {}
+    return dict(db.fetchall(_SQL_IDS_POR_DOCUMENTO, (json.dumps(list(documentos)),)))
+
+
+def _habitaciones_por_numero(db: Database):
+    return dict(db.fetchall("SELECT numero, id_habitacion FROM habitacion"))
+
+
+# -------------------------
+# Importación
+# -------------------------
+def import_huespedes(db: Database, ruta, tamano_lote=TAMANO_LOTE, formato=None, progreso=None):
+    """
+    Carga huéspedes (columnas: nombre, documento, fecha_nacimiento, nacionalidad, direccion).
+    Un documento que ya existe actualiza al huésped; si se repite en el archivo, gana la última fila.
+    progreso(informe) se llama después de cada lote.
+    """
+    informe = InformeCarga('huesped')
+    validas = _validar(leer_filas(ruta, informe, formato), _huesped_desde_fila, informe)
+    for lote in _lotes(validas, tamano_lote):
+        por_documento = {}
+        sin_documento = []
+        for _n, h in lote:
+            if h.documento:
+                por_documento[h.documento] = h
+            else:
+                sin_documento.append(h)
+        for documento, id_huesped in _ids_por_documento(db, por_documento).items():
+            por_documento[documento].id = id_huesped
+        objs = sin_documento + list(por_documento.values())
+        Huesped.save_many(db, objs)
+        informe.escritas += len(objs)
+        informe.avance()
+        if progreso:
+            progreso(informe)
+    informe.avance()
+    return informe
+
+
+def import_reservas(db: Database, ruta, tamano_lote=2000, formato=None, progreso=None):
+    """
+    Carga reservas (columnas: fecha_ingreso, fecha_salida, estado, documento, numero, id_empleado).
+    El huésped se busca por documento y la habitación por número (o id_huesped / id_habitacion).
+    Cada lote se guarda con Reserva.save_many (disponibilidad y resumen diario incluidos);
+    si el lote choca con otra reserva o con una clave foránea inexistente se reintenta fila a
+    fila y solo se rechazan las que fallan.
+    """
+    informe = InformeCarga('reserva')
+    habitaciones = _habitaciones_por_numero(db)
+    validas = _validar(leer_filas(ruta, informe, formato), _reserva_desde_fila, informe)
+    for lote in _lotes(validas, tamano_lote):
+        huespedes = _ids_por_documento(db, {documento for _n, (_r, documento, _num) in lote if documento})
+        resueltas = []
+        for n, (r, documento, numero) in lote:
+            if documento is not None:
+                r.id_huesped = huespedes.get(documento)
+                if r.id_huesped is None:
+                    informe.rechazar(n, f"no existe huésped con documento {documento}")
+                    continue
+            if numero is not None:
+                r.id_habitacion = habitaciones.get(numero)
+                if r.id_habitacion is None:
+                    informe.rechazar(n, f"no existe la habitación {numero}")
+                    continue
+            resueltas.append((n, r))
+        try:
+            Reserva.save_many(db, [r for _n, r in resueltas])
+            informe.escritas += len(resueltas)
+        except (ValueError, sqlite3.IntegrityError):
+            # el lote hizo rollback: los ids asignados antes del error no existen
+            for _n, r in resueltas:
+                r.id = None
+            for n, r in resueltas:
+                try:
+                    r.save(db)
+                    informe.escritas += 1
+                except ValueError as e:
+                    informe.rechazar(n, str(e))
+                except sqlite3.IntegrityError as e:
+                    # clave foránea inexistente (p. ej. id_empleado)
+                    informe.rechazar(n, f"referencia inválida: {e}")
+        informe.avance()
+        if progreso:
+            progreso(informe)
+    informe.avance()
+    return informe
+
+
+# -------------------------
+# Exportación
+# -------------------------
+# Las reservas se exportan con documento y número de habitación, las mismas columnas
+# que lee import_reservas (id_reserva se ignora al importar).
+_SQL_EXPORT_RESERVAS = """
+    SELECT r.id_reserva, r.fecha_ingreso, r.fecha_salida, r.estado, h.documento, hab.numero, r.id_empleado
+    FROM reserva r
+    LEFT JOIN huesped h ON h.id_huesped = r.id_huesped
+    LEFT JOIN habitacion hab ON hab.id_habitacion = r.id_habitacion
+    WHERE {filtro}
+    ORDER BY r.id_reserva
+"""
+
+_SQL_EXPORT_FACTURAS = """
+    SELECT f.id_factura, f.fecha_emision, f.monto_total, f.id_reserva, r.fecha_ingreso, r.fecha_salida,
+           hab.numero, h.documento, h.nombre, h.direccion
+    FROM factura f
+    LEFT JOIN reserva r ON r.id_reserva = f.id_reserva
+    LEFT JOIN huesped h ON h.id_huesped = r.id_huesped
+    LEFT JOIN habitacion hab ON hab.id_habitacion = r.id_habitacion
+    WHERE {filtro}
+    ORDER BY f.id_factura
+"""
+
+# Las variantes por rango se registran en SQL para que check_plans revise sus planes
+_SQL_EXPORT_RESERVAS_RANGO = SQL.add("export.reservas_por_salida",
+                                     _SQL_EXPORT_RESERVAS.format(filtro="r.fecha_salida BETWEEN ? AND ?"))
+_SQL_EXPORT_FACTURAS_RANGO = SQL.add("export.facturas_por_emision",
+                                     _SQL_EXPORT_FACTURAS.format(filtro="f.fecha_emision BETWEEN ? AND ?"))
+
+
+def _exportar(db: Database, entidad, sql, sql_rango, ruta, desde, hasta, formato):
+    # el cursor de SQLite entrega las filas a medida que se leen (sin fetchall)
+    cur = db.conn.cursor()
+    cur.row_factory = None
+    if desde is not None or hasta is not None:
+        # un extremo sin indicar queda abierto: '' y '9999-12-31' acotan cualquier fecha ISO
+        cur.execute(sql_rango, ('' if desde is None else str(desde), '9999-12-31' if hasta is None else str(hasta)))
+    else:
+        cur.execute(sql.format(filtro="1"))
+    columnas = [d[0] for d in cur.description]
+    return escribir_filas(ruta, columnas, cur, InformeCarga(entidad), formato)
+
+
+def export_reservas(db: Database, ruta, desde=None, hasta=None, formato=None):
+    """Exporta reservas (todas o con check-out en [desde, hasta]; un extremo puede omitirse)."""
+    return _exportar(db, 'reserva', _SQL_EXPORT_RESERVAS, _SQL_EXPORT_RESERVAS_RANGO, ruta, desde, hasta, formato)
+
+
+def export_facturas(db: Database, ruta, desde=None, hasta=None, formato=None):
+    """Exporta facturas (todas o emitidas en [desde, hasta], un extremo puede omitirse) con los datos del huésped."""
+    return _exportar(db, 'factura', _SQL_EXPORT_FACTURAS, _SQL_EXPORT_FACTURAS_RANGO, ruta, desde, hasta, formato)
+
+
+IMPORTADORES = {"huespedes": import_huespedes, "reservas": import_reservas}
+EXPORTADORES = {"reservas": export_reservas, "facturas": export_facturas}
+
+
+def _mostrar_avance(informe):
+    print(f"\r{informe}", end="", file=sys.stderr, flush=True)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Importación/exportación CSV o JSONL del sistema hotelero")
+    parser.add_argument("--db", default="hotel.db")
+    parser.add_argument("--formato", choices=FORMATOS, help="por defecto, según la extensión del archivo")
+    sub = parser.add_subparsers(dest="accion", required=True)
+    imp = sub.add_parser("importar")
+    imp.add_argument("entidad", choices=sorted(IMPORTADORES))
+    imp.add_argument("archivo")
+    imp.add_argument("--lote", type=int, default=TAMANO_LOTE)
+    exp = sub.add_parser("exportar")
+    exp.add_argument("entidad", choices=sorted(EXPORTADORES))
+    exp.add_argument("archivo")
+    exp.add_argument("--desde")
+    exp.add_argument("--hasta")
+    args = parser.parse_args()
+
+    db = Database(args.db)
+    db.create_tables()
+    try:
+        if args.accion == "importar":
+            informe = IMPORTADORES[args.entidad](db, args.archivo, args.lote, args.formato, _mostrar_avance)
+        else:
+            informe = EXPORTADORES[args.entidad](db, args.archivo, args.desde, args.hasta, args.formato)
+    finally:
+        db.close()
+    print(f"\r{informe}", file=sys.stderr)
+    for linea, motivo in informe.errores:
+        print(f"  línea {linea}: {motivo}", file=sys.stderr)
+    if informe.rechazadas > len(informe.errores):
+        print(f"  ... y {informe.rechazadas - len(informe.errores)} más", file=sys.stderr)
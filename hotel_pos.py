@@ -0,0 +1,258 @@
+#!/usr/bin/env python3
+"""
+hotel_pos.py
+Cola de escritura diferida para los cargos que envían los puntos de venta
+(restaurant, bar, spa). post() no espera a SQLite: anota el cargo en un journal
+local (archivo de solo agregado) y lo deja en una cola; un hilo escritor los guarda
+por lotes (hasta max_lote cargos o max_espera segundos) en una sola transacción.
+Al reiniciar, los cargos del journal que no alcanzaron a guardarse se reaplican.
+"""
+
+import json
+import os
+import queue
+import sqlite3
+import sys
+import threading
+import time
+from collections import deque
+
+import hotel_folio
+from hotel_app import SQL, Database
+
+_FIN = object()
+
+SQL.add("cola_cargos.ultimo", "SELECT ultimo_seq FROM cola_cargos WHERE journal = ?")
+_SQL_CONFIRMAR = SQL.add("cola_cargos.confirmar", """
+    INSERT INTO cola_cargos (journal, ultimo_seq) VALUES (?, ?)
+    ON CONFLICT(journal) DO UPDATE SET ultimo_seq = excluded.ultimo_seq
+""")
+
+
+def _validar_cargo(id_reserva, id_servicio, cantidad):
+    for nombre, valor in (("id_reserva", id_reserva), ("id_servicio", id_servicio)):
+        if not isinstance(valor, int) or isinstance(valor, bool):
+            raise ValueError(f"{nombre} debe ser un entero: {valor!r}")
+    if cantidad is not None and (not isinstance(cantidad, int) or isinstance(cantidad, bool) or cantidad < 0):
+        raise ValueError(f"cantidad debe ser un entero no negativo: {cantidad!r}")
+
+
+def _bloqueada(error):
+    # SQLITE_BUSY / SQLITE_LOCKED: otra conexión tiene el lock; cualquier otro error no se arregla esperando
+    return "locked" in str(error) or "busy" in str(error)
+
+
+class ChargeQueue:
+    """
+    Cola de cargos con group commit y journal.
+    - Cada cargo recibe un número de secuencia y se escribe en el journal antes de encolarse;
+      con fsync=True además se fuerza a disco (sobrevive a un corte de luz, no solo a una caída
+      del proceso), a costa de un fsync por cargo.
+    - El número del último cargo guardado queda en cola_cargos en la misma transacción que el
+      lote, así reaplicar el journal nunca duplica cargos.
+    - Un cargo que no se puede guardar (reserva inexistente, dato inválido) se descarta y
+      queda en `rechazados`, sin frenar al resto del lote.
+    - Con la base bloqueada por otro proceso el lote se reintenta con espera creciente, hasta
+      MAX_REINTENTOS veces. Si aun así no se guarda, o la base falla de otra forma, el escritor
+      se detiene y queda el error en `error`: post() y flush() lo informan y los cargos
+      pendientes siguen en el journal para reaplicarse al reiniciar.
+    """
+    MAX_JOURNAL = 1 << 20  # bytes; con la cola vacía y todo guardado, el journal se vacía
+    MUESTRAS = 2000        # latencias guardadas para los percentiles
+    MAX_REINTENTOS = 20
+    ESPERA_MAXIMA = 2.0    # segundos entre reintentos
+
+    def __init__(self, db: Database, journal, max_lote=500, max_espera=0.05, fsync=False):
+        self.db = db
+        self.journal = os.path.abspath(journal)
+        self.max_lote = max_lote
+        self.max_espera = max_espera
+        self.fsync = fsync
+        self._cola = queue.Queue()
+        self._lock = threading.Lock()
+        self._confirmado_cond = threading.Condition()
+        self.confirmado = 0
+        self.lotes = 0
+        self.reaplicados = 0
+        self.rechazados = deque(maxlen=100)
+        self.error = None
+        self._commits = deque(maxlen=self.MUESTRAS)
+        self._esperas = deque(maxlen=self.MUESTRAS)
+
+        row = db.fetchone(SQL["cola_cargos.ultimo"], (self.journal,))
+        self.confirmado = row[0] if row else 0
+        self._seq = self.confirmado
+        self._archivo = open(self.journal, "a+b")
+        self._replay()
+        self._hilo = threading.Thread(target=self._run, name="pos-writer", daemon=True)
+        self._hilo.start()
+
+    # Journal
+    def _replay(self):
+        self._archivo.seek(0)
+        valido = 0
+        for linea in self._archivo:
+            try:
+                evento = json.loads(linea)
+            except (json.JSONDecodeError, UnicodeDecodeError):
+                break
+            if not linea.endswith(b"\n"):
+                break
+            valido += len(linea)
+            self._seq = max(self._seq, evento["seq"])
+            if evento["seq"] > self.confirmado:
+                self._cola.put((evento["seq"], evento["id_reserva"], evento["id_servicio"], evento["cantidad"],
+                                time.perf_counter()))
+                self.reaplicados += 1
+        # una última línea a medio escribir (caída durante post) nunca se confirmó al caller:
+        # se corta para que los cargos nuevos no queden pegados a ella
+        self._archivo.truncate(valido)
+        self._archivo.seek(valido)
+
+    def post(self, id_reserva, id_servicio, cantidad=1):
+        """Registra un cargo sin esperar a la base; devuelve su número de secuencia."""
+        _validar_cargo(id_reserva, id_servicio, cantidad)
+        if self.error is not None:
+            raise RuntimeError(f"Cola de cargos detenida: {self.error}")
+        with self._lock:
+            self._seq += 1
+            seq = self._seq
+            self._archivo.write(json.dumps({"seq": seq, "id_reserva": id_reserva, "id_servicio": id_servicio,
+                                            "cantidad": cantidad}).encode() + b"\n")
+            self._archivo.flush()
+            if self.fsync:
+                os.fsync(self._archivo.fileno())
+            # dentro del lock: la cola queda en el mismo orden que el journal
+            self._cola.put((seq, id_reserva, id_servicio, cantidad, time.perf_counter()))
+        return seq
+
+    # Escritor
+    def _run(self):
+        fin = False
+        while not fin:
+            evento = self._cola.get()
+            if evento is _FIN:
+                break
+            lote = [evento]
+            limite = time.monotonic() + self.max_espera
+            while len(lote) < self.max_lote:
+                restante = limite - time.monotonic()
+                if restante <= 0:
+                    break
+                try:
+                    evento = self._cola.get(timeout=restante)
+                except queue.Empty:
+                    break
+                if evento is _FIN:
+                    fin = True
+                    break
+                lote.append(evento)
+            if not self._commit(lote):
+                break
+
+    def _guardar(self, lote):
+        with self.db.batch():
+            hotel_folio.add_services(self.db, [(r, s, c) for _seq, r, s, c, _t in lote])
+            self.db.conn.execute(_SQL_CONFIRMAR, (self.journal, lote[-1][0]))
+
+    def _guardar_uno_a_uno(self, pendientes):
+        # algún cargo no se puede guardar: se guardan de a uno y se descartan los que fallan
+        while pendientes:
+            evento = pendientes[0]
+            try:
+                self._guardar([evento])
+            except sqlite3.OperationalError:
+                raise
+            except Exception as e:
+                with self.db.batch():
+                    self.db.conn.execute(_SQL_CONFIRMAR, (self.journal, evento[0]))
+                self.rechazados.append((evento[:4], f"{type(e).__name__}: {e}"))
+            pendientes.pop(0)
+
+    def _commit(self, lote):
+        """Guarda el lote; devuelve False si el escritor tuvo que detenerse."""
+        t0 = time.perf_counter()
+        pendientes = list(lote)
+        reintentos = 0
+        while pendientes:
+            try:
+                try:
+                    self._guardar(pendientes)
+                    pendientes = []
+                except sqlite3.OperationalError:
+                    raise
+                except Exception:
+                    self._guardar_uno_a_uno(pendientes)
+            except sqlite3.OperationalError as e:
+                # base bloqueada por otro proceso: se reintenta lo que falta (sigue en el journal)
+                reintentos += 1
+                if not _bloqueada(e) or reintentos > self.MAX_REINTENTOS:
+                    return self._detener(e)
+                espera = min(self.ESPERA_MAXIMA, 0.05 * 2 ** (reintentos - 1))
+                print(f"pos-writer: {e}; reintento {reintentos}/{self.MAX_REINTENTOS} en {espera:.2f} s",
+                      file=sys.stderr)
+                time.sleep(espera)
+            except Exception as e:
+                return self._detener(e)
+        ahora = time.perf_counter()
+        self._commits.append(ahora - t0)
+        self._esperas.extend(ahora - evento[4] for evento in lote)
+        self.lotes += 1
+        with self._confirmado_cond:
+            self.confirmado = lote[-1][0]
+            self._confirmado_cond.notify_all()
+        self._compactar()
+        return True
+
+    def _detener(self, error):
+        print(f"pos-writer detenido: {type(error).__name__}: {error} (los cargos pendientes quedan en el journal)",
+              file=sys.stderr)
+        with self._confirmado_cond:
+            self.error = error
+            self._confirmado_cond.notify_all()
+        return False
+
+    def _compactar(self):
+        with self._lock:
+            if self._seq == self.confirmado and self._archivo.tell() > self.MAX_JOURNAL:
+                self._archivo.truncate(0)
+                self._archivo.seek(0)
+
+    # Control
+    def flush(self, timeout=None):
+        """Espera a que todos los cargos registrados hasta ahora estén guardados."""
+        with self._lock:
+            objetivo = self._seq
+        with self._confirmado_cond:
+            listo = self._confirmado_cond.wait_for(
+                lambda: self.confirmado >= objetivo or self.error is not None, timeout)
+            if self.confirmado < objetivo and self.error is not None:
+                raise RuntimeError(f"Cola de cargos detenida: {self.error}")
+            return listo
+
+    def close(self):
+        self._cola.put(_FIN)
+        self._hilo.join()
+        with self._lock:
+            if self._seq == self.confirmado:
+                self._archivo.truncate(0)
+            self._archivo.close()
+
+    def metrics(self):
+        def percentil(valores, p):
+            valores = sorted(valores)
+            return valores[min(len(valores) - 1, int(len(valores) * p / 100))] * 1000 if valores else 0.0
+
+        commits, esperas = list(self._commits), list(self._esperas)
+        return {
+            "profundidad": self._cola.qsize(),
+            "pendientes": self._seq - self.confirmado,
+            "ultimo_seq_guardado": self.confirmado,
+            "lotes": self.lotes,
+            "reaplicados": self.reaplicados,
+            "rechazados": len(self.rechazados),
+            "commit_p50_ms": percentil(commits, 50),
+            "commit_p99_ms": percentil(commits, 99),
+            "espera_p50_ms": percentil(esperas, 50),
+            "espera_p99_ms": percentil(esperas, 99),
+        }
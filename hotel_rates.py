@@ -0,0 +1,140 @@
+#!/usr/bin/env python3
+"""
+hotel_rates.py
+Tarifas dinámicas por tipo de habitación: temporadas, fines de semana y descuentos
+por duración, con tablas de sumas prefijas para cotizar cualquier estadía en O(1).
+"""
+
+from array import array
+from decimal import Decimal
+from functools import partial
+from itertools import accumulate
+
+from hotel_app import SQL, Database, _fecha, _fecha_iso
+
+# Por cada tipo de habitación se pinta una tabla diaria (centavos por noche) con las
+# reglas de tarifa, de menor a mayor prioridad, y se guardan sus sumas prefijas: el precio
+# de cualquier estadía es P[salida] - P[ingreso], O(1) sin importar las noches. Una segunda
+# suma prefija cuenta las noches con tarifa; las demás se cobran al precio plano
+# (el de la habitación, o el menor del tipo al cotizar por tipo). Después se aplica el
+# descuento por duración. Precios con a lo más dos decimales.
+SQL.add("tarifa.insert", """
+    INSERT INTO tarifa (tipo, desde, hasta, precio, dias_semana, prioridad) VALUES (?,?,?,?,?,?)
+""")
+SQL.add("tarifa_estadia.upsert", """
+    INSERT INTO tarifa_estadia (tipo, noches_minimas, descuento) VALUES (?,?,?)
+    ON CONFLICT(tipo, noches_minimas) DO UPDATE SET descuento = excluded.descuento
+""")
+
+_CENTAVO = Decimal("0.01")
+
+
+class RateTable:
+    def __init__(self):
+        self._tablas = {}       # tipo -> (ordinal del primer día, centavos acumulados, noches con tarifa acumuladas)
+        self._descuentos = {}   # tipo -> [(noches_minimas, descuento)] de mayor a menor
+        self._precio_base = {}  # tipo -> menor precio plano de sus habitaciones
+
+    def rebuild(self, db: Database):
+        """Reconstruye las tablas desde tarifa, tarifa_estadia y habitacion."""
+        reglas = {}
+        for tipo, desde, hasta, precio, dias in db.fetchall(
+                "SELECT tipo, desde, hasta, precio, dias_semana FROM tarifa ORDER BY prioridad, id_tarifa"):
+            reglas.setdefault(tipo, []).append(
+                (_fecha(desde).toordinal(), _fecha(hasta).toordinal(), round(precio * 100), dias))
+        tablas = {}
+        for tipo, lista in reglas.items():
+            inicio = min(r[0] for r in lista)
+            diario = [None] * max(0, max(r[1] for r in lista) - inicio)
+            for desde, hasta, centavos, dias in lista:
+                for dia in range(max(desde, inicio), hasta):
+                    # el ordinal 1 (1 de enero del año 1) es lunes
+                    if dias is None or str((dia - 1) % 7) in dias:
+                        diario[dia - inicio] = centavos
+            tablas[tipo] = (inicio,
+                            array('q', accumulate((c or 0 for c in diario), initial=0)),
+                            array('l', accumulate((c is not None for c in diario), initial=0)))
+        descuentos = {}
+        for tipo, noches_minimas, descuento in db.fetchall(
+                "SELECT tipo, noches_minimas, descuento FROM tarifa_estadia ORDER BY noches_minimas DESC"):
+            descuentos.setdefault(tipo, []).append((noches_minimas, Decimal(str(descuento))))
+        precio_base = {r[0]: r[1] for r in db.fetchall(
+            "SELECT COALESCE(tipo, ''), MIN(precio) FROM habitacion GROUP BY 1")}
+        # asignación de una vez: las cotizaciones concurrentes ven las tablas viejas o las nuevas
+        self._tablas, self._descuentos, self._precio_base = tablas, descuentos, precio_base
+        return self
+
+    def stay_price(self, tipo, desde, hasta, precio_base):
+        """Cargo de habitación (Decimal) de tipo de desde a hasta (día de salida)."""
+        inicio = _fecha(_fecha_iso(desde)).toordinal()
+        fin = _fecha(_fecha_iso(hasta)).toordinal()
+        noches = max(0, fin - inicio)
+        centavos = con_tarifa = 0
+        tabla = self._tablas.get(tipo or '')
+        if tabla is not None and noches:
+            base, acumulado, cubiertas = tabla
+            largo = len(acumulado) - 1
+            i, j = min(max(inicio - base, 0), largo), min(max(fin - base, 0), largo)
+            centavos, con_tarifa = acumulado[j] - acumulado[i], cubiertas[j] - cubiertas[i]
+        total = Decimal(centavos) / 100 + Decimal(str(precio_base or 0.0)) * (noches - con_tarifa)
+        for noches_minimas, descuento in self._descuentos.get(tipo or '', ()):
+            if noches >= noches_minimas:
+                total = (total * (100 - descuento) / 100).quantize(_CENTAVO)
+                break
+        return total
+
+    def quote(self, tipos, desde, hasta):
+        """
+        Cotización por tipo para una búsqueda: {tipo: cargo de habitación de desde a hasta}.
+        Tipos sin habitaciones ni tarifas quedan en None.
+        """
+        cotizacion = {}
+        for tipo in tipos:
+            if tipo not in self._precio_base and tipo not in self._tablas:
+                cotizacion[tipo] = None
+                continue
+            cotizacion[tipo] = float(self.stay_price(tipo, desde, hasta, self._precio_base.get(tipo)))
+        return cotizacion
+
+
+def rate_table(db: Database):
+    """Tabla de tarifas de db, construida desde la base la primera vez."""
+    if db.tarifas is None:
+        with db.pool.write_lock:
+            if db.tarifas is None:
+                db.tarifas = RateTable().rebuild(db)
+    return db.tarifas
+
+
+def quote(db: Database, tipos, desde, hasta):
+    """Cotiza de una vez varios tipos de habitación (ver RateTable.quote)."""
+    return rate_table(db).quote(tipos, desde, hasta)
+
+
+def invalidate(db: Database):
+    """Descarta la tabla de tarifas de db al hacer commit; se reconstruye en el siguiente uso."""
+    if db.tarifas is not None:
+        db.after_commit(partial(setattr, db, 'tarifas', None))
+
+
+def add_rate(db: Database, tipo, desde, hasta, precio, dias_semana=None, prioridad=0):
+    """Agrega una regla de tarifa para las noches de desde a hasta (sin incluir); devuelve su id."""
+    desde, hasta = _fecha_iso(desde), _fecha_iso(hasta)
+    if hasta <= desde:
+        raise ValueError("La tarifa debe cubrir al menos una noche")
+    if dias_semana is not None and not set(str(dias_semana)) <= set("0123456"):
+        raise ValueError("dias_semana: dígitos de 0 (lunes) a 6 (domingo)")
+    with db.batch():
+        cur = db.conn.execute(SQL["tarifa.insert"], (tipo, desde, hasta, float(precio),
+                                                     None if dias_semana is None else str(dias_semana), prioridad))
+        invalidate(db)
+    return cur.lastrowid
+
+
+def set_stay_discount(db: Database, tipo, noches_minimas, descuento):
+    """Descuento (porcentaje) sobre el cargo de habitación de estadías de noches_minimas o más."""
+    if not 0 <= descuento < 100:
+        raise ValueError("El descuento es un porcentaje entre 0 y 100")
+    with db.batch():
+        db.conn.execute(SQL["tarifa_estadia.upsert"], (tipo, int(noches_minimas), float(descuento)))
+        invalidate(db)